@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the Conta Linha line classifier.
+Measures the lines/sec of the comment classification for the extensions with the
+most lines in a directory, optionally comparing it with another version of
+contalinha.py (for example one exported with `git show <rev>:contalinha.py`).
+When a baseline is given, every sampled line is also classified by both versions
+and any difference in the results is reported, so classifier optimizations can be
+checked for parity on real code.
+With --walk, the directory traversal is measured instead: the os.walk loop with a
+relpath and a getsize per file that the scan used before, against the os.scandir
+walker of the measured version, in both traversal orders.
+With --suite, a deterministic synthetic tree is generated (file count, depth,
+extension mix, comment density, block-comment-heavy files, a huge single file and
+binary blobs are configurable) and process_line, process_file and
+contar_arquivos_e_linhas are timed separately, reporting files/s, lines/s and MB/s
+per extension. --json saves the results and --compare checks them against an
+earlier JSON, failing when a rate regressed more than --tolerance.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib.util
+from collections import defaultdict
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_module(path, name):
+    """Load a contalinha.py version from its path."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def collect_lines(directory, top, max_lines):
+    """Read the lines of the `top` extensions with the most lines in the directory."""
+    lines_by_ext = defaultdict(list)
+    for root, _, files in os.walk(directory):
+        for name in files:
+            ext = os.path.splitext(name)[1].lower() or "(sem extensão)"
+            if len(lines_by_ext[ext]) >= max_lines:
+                continue
+            try:
+                with open(os.path.join(root, name), 'r', encoding='latin-1') as f:
+                    lines_by_ext[ext].extend(f)
+            except OSError as e:
+                print(f"Skipping {name}: {e}")
+    ranked = sorted(lines_by_ext, key=lambda ext: len(lines_by_ext[ext]), reverse=True)
+    return {ext: lines_by_ext[ext][:max_lines] for ext in ranked[:top]}
+
+def line_classifier(module, ext):
+    """Return a classify(line, state) callable for the given version."""
+    if hasattr(module, 'get_scanner'):
+        return module.get_scanner(ext).classify
+    return lambda line, state: module.process_line(line, ext, state)
+
+def count_mismatches(current, baseline, ext, lines):
+    """Number of lines whose classification differs between the two versions."""
+    classify_current = line_classifier(current, ext)
+    classify_baseline = line_classifier(baseline, ext)
+    state_current = state_baseline = None
+    mismatches = 0
+    for line in lines:
+        result_current = classify_current(line, state_current)
+        result_baseline = classify_baseline(line, state_baseline)
+        if result_current != result_baseline:
+            mismatches += 1
+        state_current = result_current[2]
+        state_baseline = result_baseline[2]
+    return mismatches
+
+def classify_lines(module, ext, lines):
+    """Classify every line the way process_file does in the given version."""
+    state = None
+    if hasattr(module, 'get_scanner'):
+        classify = module.get_scanner(ext).classify
+        for line in lines:
+            state = classify(line, state)[2]
+    else:
+        process_line = module.process_line
+        for line in lines:
+            state = process_line(line, ext, state)[2]
+
+def lines_per_second(module, ext, lines, repeat):
+    """Best lines/sec out of `repeat` runs."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        classify_lines(module, ext, lines)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best if best > 0 else float('inf')
+
+def walk_files_per_second(walk, repeat):
+    """Best files/sec of a walk callable (which returns the number of files) out of `repeat` runs."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        files = walk()
+        best = min(best, time.perf_counter() - start)
+    return files, files / best if best > 0 else float('inf')
+
+def os_walk_files(directory):
+    """The former traversal: os.walk, then a relpath and a getsize for every file."""
+    files = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            os.path.relpath(path, directory)
+            try:
+                os.path.getsize(path)
+            except OSError:
+                pass
+            files += 1
+    return files
+
+def scandir_files(module, directory, order):
+    """The os.scandir walker of the given version, taking the size from the DirEntry stat."""
+    files = 0
+    for entry, _ in module._percorrer(directory, order):
+        try:
+            entry.stat()
+        except OSError:
+            pass
+        files += 1
+    return files
+
+def benchmark_walk(module, directory, repeat):
+    """Print the files/sec of each traversal of the directory."""
+    print(f"{'Traversal':<28}{'Files':>12}{'Files/s':>14}{'Speedup':>10}")
+    files, baseline_rate = walk_files_per_second(lambda: os_walk_files(directory), repeat)
+    print(f"{'os.walk + relpath + getsize':<28}{files:>12,}{baseline_rate:>14,.0f}{1:>9.2f}x")
+    for order in module.ORDENS_PERCURSO:
+        files, rate = walk_files_per_second(lambda: scandir_files(module, directory, order), repeat)
+        print(f"{'scandir (' + order + ')':<28}{files:>12,}{rate:>14,.0f}{rate / baseline_rate:>9.2f}x")
+
+DEFAULT_MIX = ".py:30,.js:15,.java:10,.c:10,.html:8,.css:7,.sql:5,.sh:5,.md:5,.txt:5"
+BINARY_EXTENSIONS = ('.png', '.jar', '.bin')
+CODE_WORDS = ('value', 'count', 'total', 'result', 'item', 'index', 'buffer', 'config', 'node', 'path')
+COMMENT_WORDS = ('TODO', 'check', 'the', 'limits', 'before', 'calling', 'this', 'handler', 'again', 'note')
+
+def parse_mix(text):
+    """Parse an extension mix like ".py:30,.js:15" into (extensions, weights)."""
+    extensions, weights = [], []
+    for item in text.split(','):
+        ext, _, weight = item.strip().partition(':')
+        extensions.append(ext.lower() if ext.startswith('.') else '.' + ext.lower())
+        weights.append(float(weight or 1))
+    return extensions, weights
+
+def comment_markers(module, ext):
+    """The line marker and (start, end) block pair the given version knows for the extension."""
+    syntax = module.COMMENT_SYNTAX.get(ext, {'line': ['#'], 'block': []})
+    line = syntax['line'][0] if syntax['line'] else None
+    block = syntax['block'][0] if syntax['block'] else None
+    return line, block
+
+def code_line(rng):
+    """One indented line of synthetic code."""
+    indent = ' ' * (4 * rng.randrange(4))
+    return f"{indent}{rng.choice(CODE_WORDS)}_{rng.randrange(100)} = {rng.choice(CODE_WORDS)}({rng.randrange(1000)});\n"
+
+def comment_text(rng):
+    """A few words of synthetic comment text."""
+    return ' '.join(rng.choice(COMMENT_WORDS) for _ in range(rng.randrange(2, 9)))
+
+def source_lines(rng, ext, markers, lines, comment_density, block_density):
+    """Yield the lines of a synthetic source file with the given comment densities."""
+    line_marker, block = markers
+    if line_marker is None and block is None:
+        comment_density = block_density = 0
+    elif line_marker is None:
+        block_density, comment_density = block_density + comment_density, 0
+    elif block is None:
+        comment_density, block_density = comment_density + block_density, 0
+    written = 0
+    while written < lines:
+        roll = rng.random()
+        if roll < 0.1:
+            yield "\n"
+            written += 1
+        elif roll < 0.1 + comment_density:
+            code = code_line(rng).rstrip('\n;') + ' ' if rng.random() < 0.2 else ''
+            yield f"{code}{line_marker} {comment_text(rng)}\n"
+            written += 1
+        elif roll < 0.1 + comment_density + block_density:
+            start, end = block
+            body = rng.randrange(1, 8)
+            if body == 1:
+                yield f"{start} {comment_text(rng)} {end}\n"
+            else:
+                yield f"{start} {comment_text(rng)}\n"
+                for _ in range(body - 2):
+                    yield f" * {comment_text(rng)}\n"
+                yield f" {comment_text(rng)} {end}\n"
+            written += body
+        else:
+            yield code_line(rng)
+            written += 1
+
+def generate_corpus(module, root, files=2000, depth=4, mix=DEFAULT_MIX, seed=0, mean_lines=200,
+                    comment_density=0.2, block_heavy=0.05, huge_mb=20, binaries=20):
+    """
+    Write a deterministic synthetic tree under root and return the manifest of its files.
+    The same arguments always produce the same tree. Each manifest entry is
+    (relative path, extension, bytes, lines), with lines None for binary blobs.
+    """
+    rng = random.Random(seed)
+    extensions, weights = parse_mix(mix)
+    directories, level = [''], ['']
+    for number in range(1, depth + 1):
+        level = [os.path.join(parent, f"d{number}_{i}") for parent in level for i in range(3)]
+        directories += level
+    manifest = []
+
+    def write(relative, ext, data, lines):
+        path = os.path.join(root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        manifest.append((relative, ext, len(data), lines))
+
+    for number in range(files):
+        ext = rng.choices(extensions, weights)[0]
+        heavy = rng.random() < block_heavy
+        block_density = 0.6 if heavy else 0.05
+        lines = max(1, int(rng.expovariate(1 / mean_lines)))
+        text = ''.join(source_lines(rng, ext, comment_markers(module, ext), lines, comment_density, block_density))
+        name = f"{'heavy' if heavy else 'file'}{number}{ext}"
+        write(os.path.join(rng.choice(directories), name), ext, text.encode('utf-8'), text.count('\n'))
+
+    if huge_mb > 0:
+        chunks, size, target = [], 0, huge_mb * 1024 * 1024
+        lines = source_lines(rng, '.py', comment_markers(module, '.py'), float('inf'), comment_density, 0.05)
+        while size < target:
+            line = next(lines)
+            chunks.append(line)
+            size += len(line)
+        text = ''.join(chunks)
+        write(os.path.join('huge', 'huge.py'), '.py', text.encode('utf-8'), text.count('\n'))
+
+    for number in range(binaries):
+        ext = BINARY_EXTENSIONS[number % len(BINARY_EXTENSIONS)]
+        body = rng.randbytes(rng.randrange(16, 512) * 1024)
+        header = b'\x89PNG\r\n\x1a\n' if ext == '.png' else b'PK\x03\x04' if ext == '.jar' else b''
+        write(os.path.join('blobs', f"blob{number}{ext}"), ext, header + body, None)
+    return manifest
+
+def best_time(function, repeat):
+    """Best wall time of `function()` out of `repeat` runs, with the result of the last run."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def rates(seconds, files=None, lines=None, size=None):
+    """A result entry with the raw counts and their files/s, lines/s and MB/s."""
+    entry = {'seconds': seconds}
+    for key, count, scale in (('files', files, 1), ('lines', lines, 1), ('mb', size, 1024 * 1024)):
+        if count is not None:
+            entry[key] = count if scale == 1 else round(count / scale, 3)
+            entry[key + '_per_s'] = count / scale / seconds if seconds > 0 else float('inf')
+    return entry
+
+def time_process_line(module, root, manifest, max_lines, repeat):
+    """lines/s of process_line, per extension, over the lines of the generated text files."""
+    results = {}
+    for ext in sorted({ext for _, ext, _, lines in manifest if lines is not None}):
+        lines = []
+        for relative, file_ext, _, file_lines in manifest:
+            if file_ext == ext and file_lines is not None and len(lines) < max_lines:
+                with open(os.path.join(root, relative), 'r', encoding='latin-1') as f:
+                    lines.extend(f)
+        lines = lines[:max_lines]
+        process_line = module.process_line
+
+        def classify():
+            state = None
+            for line in lines:
+                state = process_line(line, ext, state)[2]
+
+        seconds, _ = best_time(classify, repeat)
+        results[ext] = rates(seconds, lines=len(lines), size=sum(len(line) for line in lines))
+    return results
+
+def time_process_file(module, root, manifest, repeat):
+    """files/s, lines/s and MB/s of process_file, per extension (binary blobs included)."""
+    by_ext = defaultdict(list)
+    for relative, ext, size, _ in manifest:
+        by_ext[ext].append((os.path.join(root, relative), size))
+    results = {}
+    for ext, paths in sorted(by_ext.items()):
+        def process():
+            lines = 0
+            for path, _ in paths:
+                counts = module.process_file(path, ext)
+                lines += counts[0] if counts else 0
+            return lines
+
+        seconds, lines = best_time(process, repeat)
+        results[ext] = rates(seconds, files=len(paths), lines=lines, size=sum(size for _, size in paths))
+    return results
+
+def time_scan(module, root, jobs, repeat):
+    """files/s, lines/s and MB/s of a whole contar_arquivos_e_linhas scan, with the per-extension counts."""
+    arguments = (root, jobs) if jobs > 1 else (root,)
+    seconds, totals = best_time(lambda: module.contar_arquivos_e_linhas(*arguments), repeat)
+    files, lines, kbytes = totals[0], totals[1], totals[2]
+    files_by_ext, lines_by_ext, kbytes_by_ext = totals[4], totals[5], totals[6]
+    result = rates(seconds, files=files, lines=lines, size=kbytes * 1024)
+    result['jobs'] = jobs
+    result['extensions'] = {ext: {'files': files_by_ext[ext], 'lines': lines_by_ext.get(ext, 0),
+                                  'mb': round(kbytes_by_ext.get(ext, 0) / 1024, 3)}
+                            for ext in sorted(files_by_ext)}
+    return result
+
+def print_table(title, results):
+    """Print the per-extension rates of one stage."""
+    print(f"\n{title}")
+    print(f"{'Extension':<16}{'Files':>10}{'Lines':>12}{'MB':>10}{'Files/s':>12}{'Lines/s':>14}{'MB/s':>10}")
+    for ext, entry in results.items():
+        files = f"{entry['files']:>10,}" if 'files' in entry else f"{'':>10}"
+        files_rate = f"{entry['files_per_s']:>12,.0f}" if 'files' in entry else f"{'':>12}"
+        print(f"{ext:<16}{files}{entry['lines']:>12,}{entry['mb']:>10,.2f}"
+              f"{files_rate}{entry['lines_per_s']:>14,.0f}{entry['mb_per_s']:>10,.1f}")
+
+def compare_results(current, previous, tolerance):
+    """Print every rate that changed against an earlier run; return how many regressed beyond the tolerance."""
+    regressions = 0
+    print(f"\n{'Stage':<14}{'Extension':<16}{'Rate':<14}{'Previous':>14}{'Current':>14}{'Change':>9}")
+    for stage in ('process_line', 'process_file', 'scan'):
+        entries = current.get(stage, {})
+        old_entries = previous.get(stage, {})
+        if stage == 'scan':
+            entries, old_entries = {'(all)': entries}, {'(all)': old_entries}
+        for ext, entry in entries.items():
+            for rate in ('files_per_s', 'lines_per_s', 'mb_per_s'):
+                old = old_entries.get(ext, {}).get(rate)
+                new = entry.get(rate)
+                if not old or new is None:
+                    continue
+                change = new / old - 1
+                flag = ''
+                if change < -tolerance:
+                    regressions += 1
+                    flag = '  REGRESSION'
+                print(f"{stage:<14}{ext:<16}{rate:<14}{old:>14,.0f}{new:>14,.0f}{change:>+8.1%}{flag}")
+    return regressions
+
+def benchmark_suite(module, args):
+    """Generate the synthetic tree, time the three stages and save or compare the results."""
+    root = args.directory or tempfile.mkdtemp(prefix="contalinha-bench-")
+    if args.directory and os.path.exists(root) and os.listdir(root):
+        print(f"{root} is not empty; the synthetic tree is generated into an empty or missing directory")
+        return 2
+    options = {'files': args.files, 'depth': args.depth, 'mix': args.mix, 'seed': args.seed,
+               'mean_lines': args.mean_lines, 'comment_density': args.comment_density,
+               'block_heavy': args.block_heavy, 'huge_mb': args.huge_mb, 'binaries': args.binaries}
+    try:
+        start = time.perf_counter()
+        manifest = generate_corpus(module, root, **options)
+        total_size = sum(size for _, _, size, _ in manifest)
+        print(f"Generated {len(manifest):,} files ({total_size / 1024 / 1024:,.1f} MB) in {root} "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        results = {
+            'meta': {'module': os.path.abspath(args.current), 'python': platform.python_version(),
+                     'platform': platform.platform(), 'cpus': os.cpu_count(), 'repeat': args.repeat,
+                     'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'corpus': options},
+            'process_line': time_process_line(module, root, manifest, args.max_lines, args.repeat),
+            'process_file': time_process_file(module, root, manifest, args.repeat),
+            'scan': time_scan(module, root, args.jobs, args.repeat),
+        }
+    finally:
+        if not args.directory:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print_table("process_line", results['process_line'])
+    print_table("process_file", results['process_file'])
+    scan = results['scan']
+    print_table(f"contar_arquivos_e_linhas (jobs={scan['jobs']}, {scan['seconds']:.2f}s)", {'(all)': scan})
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.json}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        if previous.get('meta', {}).get('corpus') != options:
+            print(f"\nWarning: {args.compare} was measured on a different synthetic corpus")
+        regressions = compare_results(results, previous, args.tolerance)
+        if regressions:
+            print(f"\n{regressions} rates regressed more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Conta Linha line classifier")
+    parser.add_argument("directory", nargs="?",
+                        help="Directory whose files are used as the sample (with --suite, where the synthetic tree "
+                             "is generated and kept; a temporary directory is used when omitted)")
+    parser.add_argument("--current", default=os.path.join(SCRIPT_DIR, "contalinha.py"),
+                        help="contalinha.py version being measured (default: the one next to this script)")
+    parser.add_argument("--baseline", help="Another contalinha.py version to compare against")
+    parser.add_argument("--top", type=int, default=10, help="Number of extensions to measure (default: 10)")
+    parser.add_argument("--max-lines", type=int, default=200000, help="Maximum lines sampled per extension")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best one is kept")
+    parser.add_argument("--walk", action="store_true", help="Measure the directory traversal instead of the classifier")
+    suite = parser.add_argument_group("synthetic suite")
+    suite.add_argument("--suite", action="store_true",
+                       help="Generate a synthetic tree and time process_line, process_file and contar_arquivos_e_linhas")
+    suite.add_argument("--files", type=int, default=2000, help="Number of source files (default: 2000)")
+    suite.add_argument("--depth", type=int, default=4, help="Directory depth (default: 4)")
+    suite.add_argument("--mix", default=DEFAULT_MIX, help=f"Extension weights (default: {DEFAULT_MIX})")
+    suite.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same tree")
+    suite.add_argument("--mean-lines", type=int, default=200, help="Mean lines per source file (default: 200)")
+    suite.add_argument("--comment-density", type=float, default=0.2, help="Share of line comments (default: 0.2)")
+    suite.add_argument("--block-heavy", type=float, default=0.05,
+                       help="Share of files made mostly of block comments (default: 0.05)")
+    suite.add_argument("--huge-mb", type=int, default=20, help="Size of the single huge file, 0 for none (default: 20)")
+    suite.add_argument("--binaries", type=int, default=20, help="Number of binary blobs (default: 20)")
+    suite.add_argument("-j", "--jobs", type=int, default=1, help="Processes of the contar_arquivos_e_linhas scan")
+    suite.add_argument("--json", help="Save the results to this JSON file")
+    suite.add_argument("--compare", help="Compare with the results of an earlier --json run")
+    suite.add_argument("--tolerance", type=float, default=0.1,
+                       help="Slowdown accepted by --compare before a rate counts as a regression (default: 0.1)")
+    args = parser.parse_args()
+
+    current = load_module(args.current, "contalinha_current")
+    if args.suite:
+        return benchmark_suite(current, args)
+    if not args.directory:
+        parser.error("a directory is required unless --suite is given")
+    if args.walk:
+        benchmark_walk(current, args.directory, args.repeat)
+        return 0
+    baseline = load_module(args.baseline, "contalinha_baseline") if args.baseline else None
+    samples = collect_lines(args.directory, args.top, args.max_lines)
+
+    header = f"{'Extension':<16}{'Lines':>10}{'Current (lines/s)':>20}"
+    if baseline:
+        header += f"{'Baseline (lines/s)':>20}{'Speedup':>10}{'Mismatches':>12}"
+    print(header)
+    total_mismatches = 0
+    for ext, lines in samples.items():
+        current_rate = lines_per_second(current, ext, lines, args.repeat)
+        row = f"{ext:<16}{len(lines):>10,}{current_rate:>20,.0f}"
+        if baseline:
+            baseline_rate = lines_per_second(baseline, ext, lines, args.repeat)
+            mismatches = count_mismatches(current, baseline, ext, lines)
+            total_mismatches += mismatches
+            row += f"{baseline_rate:>20,.0f}{current_rate / baseline_rate:>9.2f}x{mismatches:>12,}"
+        print(row)
+
+    if total_mismatches:
+        print(f"\n{total_mismatches:,} lines classified differently from the baseline")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,293 +3,272 @@ from tkinter import filedialog, ttk, messagebox
 import os
 import csv
 import datetime
-import re
-from collections import defaultdict
+from array import array
 import threading
+import queue
+import multiprocessing
+import time
+import bisect
+
+# The counting engine (comment rules, binary detection, walk, process pool and cache) is the one
+# of the command line version, imported from contalinha.py next to this script
+import contalinha
 
 VERSION = "1.0"
 BUILD_DATE = "May 13, 2025"
 
-COMMENT_SYNTAX = {
-    '.py': {'line': ['#'], 'block': [('"""', '"""'), ("'''", "'''")]},
-    '.js': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.ts': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.jsx': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.tsx': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.html': {'line': [], 'block': [('<!--', '-->')]},
-    '.htm': {'line': [], 'block': [('<!--', '-->')]},
-    '.xml': {'line': [], 'block': [('<!--', '-->')]},
-    '.svg': {'line': [], 'block': [('<!--', '-->')]},
-    '.css': {'line': [], 'block': [('/*', '*/')]},
-    '.scss': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.sass': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.less': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.c': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.cpp': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.h': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.hpp': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.cs': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.java': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.kt': {'line': ['//'], 'block': []},
-    '.sh': {'line': ['#'], 'block': []},
-    '.bash': {'line': ['#'], 'block': []},
-    '.zsh': {'line': ['#'], 'block': []},
-    '.ps1': {'line': ['#'], 'block': [('<#', '#>')]},
-    '.rb': {'line': ['#'], 'block': [('=begin', '=end')]},
-    '.pl': {'line': ['#'], 'block': [('=pod', '=cut')]},
-    '.pm': {'line': ['#'], 'block': [('=pod', '=cut')]},
-    '.php': {'line': ['//','#'], 'block': [('/*', '*/')]},
-    '.sql': {'line': ['--'], 'block': [('/*', '*/')]},
-    '.lisp': {'line': [';'], 'block': []},
-    '.clj': {'line': [';'], 'block': []},
-    '.hs': {'line': ['--'], 'block': [('{-', '-}')]},
-    '.lua': {'line': ['//'], 'block': [('--[[', ']]')]},
-    '.go': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.rs': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.cob': {'line': ['*'], 'block': []},
-    '.cbl': {'line': ['*'], 'block': []},
-    '.cpy': {'line': ['*'], 'block': []},
-    '.esf': {'line': ['*'], 'block': []},
-    '.cics': {'line': ['*'], 'block': []},
-    '.cicis': {'line': ['*'], 'block': []},
-    '.jcl': {'line': ['*'], 'block': []},
-    '.asm': {'line': [';'], 'block': []},
-    '.s': {'line': [';', '#'], 'block': []},
-    '.pas': {'line': ['//'], 'block': [('{', '}'), ('(*', '*)')]},
-    '.f': {'line': ['!', 'C'], 'block': []},
-    '.f90': {'line': ['!'], 'block': []},
-    '.yml': {'line': ['#'], 'block': []},
-    '.yaml': {'line': ['#'], 'block': []},
-    '.md': {'line': [], 'block': []},  # Special handling for markdown
-    '.r': {'line': ['#'], 'block': []},
-    '.swift': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.dart': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.groovy': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.scala': {'line': ['//'], 'block': [('/*', '*/')]},
-    '.erl': {'line': ['%'], 'block': []},
-    '.ex': {'line': ['#'], 'block': []},
-    '.exs': {'line': ['#'], 'block': []},
-    '.jl': {'line': ['#'], 'block': [('#=', '=#')]},
-    'Dockerfile': {'line': ['#'], 'block': []},
-    'Makefile': {'line': ['#'], 'block': []},
-    '.mk': {'line': ['#'], 'block': []},
-    '.bat': {'line': ['REM', '::'], 'block': []},
-    '.cmd': {'line': ['REM', '::'], 'block': []},
-    '.asp': {'line': ["'", 'Rem'], 'block': []},
-}
-
-LINE_COMMENT_PATTERNS = [
-    r'^\s*#',        # Python, Shell, Ruby
-    r'^\s*//',       # C-like, Java, JS, Go
-    r'^\s*;',        # Lisp, Assembly
-    r'^\s*--',       # SQL, Ada, Haskell
-    r'^\s*\*',       # Dentro de /* ... */ blocos ou COBOL
-    r'^\s*REM\s',    # Batch files (case insensitive)
-    r'^\s*::',       # Batch files alternative
-    r'^\s*%',        # Erlang
-    r'^\s*!'         # Fortran
-]
-
-BLOCK_COMMENT_PATTERNS = [
-    (r'/\*', r'\*/'),         # C, Java, JavaScript
-    (r'\(\*', r'\*\)'),       # Pascal, OCaml
-    (r'"""', r'"""'),         # Python
-    (r"'''", r"'''"),         # Python
-    (r'<!--', r'-->'),        # HTML, XML
-    (r'{-', r'-}'),           # Haskell
-    (r'=begin', r'=end'),     # Ruby
-    (r'=pod', r'=cut'),       # Perl
-    (r'<#', r'#>'),           # PowerShell
-    (r'#=', r'=#'),           # Julia
-]
-
 latest_results_data = None
 first_run = True  # Flag to track if this is the first run
 progress = None  # Progress bar widget
 processing = False  # Flag to indicate if processing is in progress
 stop_flag = False # Flag to stop processing
 
-def process_line(line, file_ext, in_block_comment=None):
-    if not line.strip():
-        return True, False, in_block_comment
+# The worker thread never touches widgets: it publishes progress and results on this queue, which
+# the main loop polls every PROGRESS_INTERVAL seconds (10 Hz). Progress is published at most as often.
+progress_queue = queue.Queue()
+PROGRESS_INTERVAL = 0.1
+
+# Per-extension table model, the source of truth for details_tree: a typed row per extension
+# (file type, files, lines, size in KB, % of files, blank, comment, code and billable lines), the
+# display order, and the tree item at each position with the values it shows, so only changed
+# positions are rewritten
+DETAIL_COLUMNS = ("file_type", "files", "total_lines", "size_kb", "percent_files", "blank_lines", "comment_lines", "code_lines", "billable_lines")
+extension_rows = {}
+extension_order = []
+detail_items = []
+detail_values = {}
+details_sort = None  # (column index, reverse) chosen by clicking a header
+# Per-extension (files, lines, bytes, blank lines, comment lines) received while the scan runs
+live_stats = {}
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".contalinha-ui-cache.sqlite")
+
+class FileDetails(contalinha.FileDetails):
+    """The engine's compact per-file details plus the queries of the file browser: the files of an
+    extension and the files whose path contains a text. Reads like the old list of detail tuples."""
     
-    if in_block_comment:
-        end_marker = in_block_comment
-        if end_marker in line:
-            code_after = line.split(end_marker, 1)[1].strip()
-            return False, not bool(code_after), None
-        return False, True, in_block_comment
+    # Rechecking a previous match costs about as much as searching 20 files with bytes.find
+    NARROW_RATIO = 20
     
-    syntax = COMMENT_SYNTAX.get(file_ext.lower(), None)
+    def __init__(self):
+        super().__init__()
+        self.extension_index = None  # Extension code -> array of file indices, built on first use
+        # (file count, lowercased name buffer, lowercased directories with '/' separators), built on
+        # first use, and the (query, indices) of the last path search, which narrower queries refine
+        self.search_index = None
+        self.last_match = None
     
-    if syntax:
-        for marker in syntax['line']:
-            if line.strip().startswith(marker):
-                return False, True, None
-        
-        for start, end in syntax['block']:
-            if start in line:
-                if end in line.split(start, 1)[1]:
-                    parts = line.split(start, 1)
-                    before = parts[0].strip()
-                    after_parts = parts[1].split(end, 1)
-                    after = after_parts[1].strip() if len(after_parts) > 0 else ""
-                    return False, not (before or after), None
-                return False, True, end
-    else:
-        for pattern in LINE_COMMENT_PATTERNS:
-            if re.match(pattern, line, re.IGNORECASE):
-                return False, True, None
-        
-        for start_pattern, end_pattern in BLOCK_COMMENT_PATTERNS:
-            start_match = re.search(start_pattern, line)
-            if start_match:
-                end_match = re.search(end_pattern, line[start_match.end():])
-                if end_match:
-                    before = line[:start_match.start()].strip()
-                    after = line[start_match.end() + end_match.end():].strip()
-                    return False, not (before or after), None
-                return False, True, end_pattern
-    
-    return False, False, None
-
-def process_file(file_path, file_ext):
-    total_lines = 0
-    blank_lines = 0
-    comment_lines = 0
-    in_block_comment = None
+    def sort_key(self, column):
+        """Function from a file index to its sort value in the column"""
+        return self._chave(column)
     
-    try:
-        with open(file_path, 'r', encoding='latin-1') as f:
-            for line_content in f: 
-                total_lines += 1
-                is_blank, is_comment, in_block_comment = process_line(line_content, file_ext, in_block_comment)
-                
-                if is_blank:
-                    blank_lines += 1
-                elif is_comment:
-                    comment_lines += 1
-    except Exception as e:
-        print(f"Erro ao processar {file_path}: {str(e)}")
+    def sort(self, column, reverse=False):
+        """Stable sort of every column by one of COLUNAS"""
+        super().sort(column, reverse)
+        self.extension_index = None
+        self.search_index = None
+        self.last_match = None
     
-    return total_lines, blank_lines, comment_lines
-
-def count_files_in_directory(directory):
-    """Count total number of files in directory for progress bar"""
-    total_files = 0
-    for _, _, files in os.walk(directory):
-        total_files += len(files)
-    return total_files
-
-def contar_arquivos_e_linhas(diretorio):
-    global progress, processing, stop_flag
+    def extension_rows(self, extensao):
+        """Indices of the files of an extension, in file order, from an index built once"""
+        if self.extension_index is None or sum(map(len, self.extension_index.values())) != len(self):
+            self.extension_index = {code: array('q') for code in range(len(self._extensoes))}
+            for i, code in enumerate(self._extensao):
+                self.extension_index[code].append(i)
+        code = self._codigos_extensao.get(extensao)
+        return self.extension_index[code] if code is not None else array('q')
     
-    # First count total files for progress bar
-    total_files = count_files_in_directory(diretorio)
-    if progress:
-        progress['maximum'] = total_files
-        progress['value'] = 0
+    def search_keys(self):
+        """Lowercased name buffer and directories, with '/' as the separator on every platform,
+        kept until files are added or sorted"""
+        if self.search_index is None or self.search_index[0] != len(self):
+            directories = self._diretorios if os.sep == '/' else [directory.replace(os.sep, '/') for directory in self._diretorios]
+            self.search_index = (len(self), bytes(self._nomes).lower(),
+                                 [directory.encode('utf-8', 'surrogateescape').lower() for directory in directories])
+            self.last_match = None
+        return self.search_index[1], self.search_index[2]
     
-    # If running in the main thread, update the UI
-    if hasattr(app, 'update'):
-        app.update()
+    def matching_rows(self, text, rows=None):
+        """Indices of the files whose path contains text (ignoring ASCII case), in file order.
+        Both '/' and os.sep separate directories in text. A query that contains the previous one
+        only rechecks the previous matches, when they are few; otherwise file names are searched
+        with bytes.find over the name buffer and directories once each, so only files in a
+        matching directory are visited one by one. rows restricts the result."""
+        if os.sep != '/':
+            text = text.replace(os.sep, '/')
+        needle = text.encode('utf-8', 'surrogateescape').lower()
+        names, directories = self.search_keys()
+        name_ends = self._fim_nome
+        
+        last = self.last_match
+        if last is not None and last[0] in needle and len(last[1]) * self.NARROW_RATIO <= len(self):
+            # Every path holding needle also holds the previous query
+            codes = self._diretorio
+            found = array('q', (i for i in last[1]
+                                if needle in directories[codes[i]] + names[name_ends[i - 1] if i else 0:name_ends[i]]))
+        else:
+            found = array('q', sorted(self.search_all(needle, names, directories)))
+        self.last_match = (needle, found)
+        if rows is not None:
+            found = array('q', sorted(set(found).intersection(rows)))
+        return found
     
+    def search_all(self, needle, names, directories):
+        """Set of the indices of the files whose lowercased path contains needle"""
+        # A match may also span the directory and the name, split at the last separator of needle
+        split = needle.rfind(b'/') + 1
+        head, tail = needle[:split], needle[split:]
+        whole = {code for code, directory in enumerate(directories) if needle in directory}
+        spanning = {code for code, directory in enumerate(directories) if split and directory.endswith(head)} - whole
+        
+        found = set()
+        name_ends = self._fim_nome
+        if not split:
+            position = names.find(needle)
+            while position >= 0:
+                i = bisect.bisect_right(name_ends, position)
+                if position + len(needle) <= name_ends[i]:
+                    found.add(i)
+                    position = names.find(needle, name_ends[i])
+                else:  # The match runs into the next name
+                    position = names.find(needle, position + 1)
+        if whole or spanning:
+            for i, code in enumerate(self._diretorio):
+                if code in whole:
+                    found.add(i)
+                elif code in spanning and names.startswith(tail, name_ends[i - 1] if i else 0, name_ends[i]):
+                    found.add(i)
+        return found
+
+def publish_progress(records, walk_progress):
+    """Pass the scan records through, publishing the progress and the changed per-extension totals
+    at most every PROGRESS_INTERVAL, so the scan does not wait on the UI. Ends early once stop_flag is set."""
     processed_files = 0
-    overall_total_arquivos = 0
-    overall_total_linhas = 0
-    overall_total_tamanho = 0
-    
-    detalhes_arquivos = []
-    
-    extensoes_nao_reconhecidas = set()
-    arquivos_nao_reconhecidos = 0
-    linhas_nao_reconhecidas = 0
-    
-    arquivos_por_extensao = defaultdict(int)
-    linhas_por_extensao = defaultdict(int)
-    linhas_branco_por_extensao = defaultdict(int)
-    linhas_comentario_por_extensao = defaultdict(int)
-    tamanho_por_extensao = defaultdict(float)
-    
-    for raiz, _, arquivos in os.walk(diretorio):
-        for arquivo in arquivos:
-            # Check stop flag
-            if stop_flag:
-                break
-                
-            extensao = os.path.splitext(arquivo)[1].lower()
-            if not extensao:
-                extensao = "(sem extensão)"
-            
-            caminho_completo = os.path.join(raiz, arquivo)
-            overall_total_arquivos += 1
-            arquivos_por_extensao[extensao] += 1
-            
-            if extensao.lower() not in COMMENT_SYNTAX:
-                extensoes_nao_reconhecidas.add(extensao)
-                arquivos_nao_reconhecidos += 1
-            
-            try:
-                linhas, linhas_branco, linhas_comentario = process_file(caminho_completo, extensao)
-                
-                overall_total_linhas += linhas
-                
-                if extensao.lower() not in COMMENT_SYNTAX:
-                    linhas_nao_reconhecidas += linhas
-                
-                linhas_por_extensao[extensao] += linhas
-                linhas_branco_por_extensao[extensao] += linhas_branco
-                linhas_comentario_por_extensao[extensao] += linhas_comentario
-                
-                tamanho = os.path.getsize(caminho_completo) / 1024
-                overall_total_tamanho += tamanho
-                tamanho_por_extensao[extensao] += tamanho
-                
-                caminho_relativo = os.path.relpath(caminho_completo, diretorio)
-                billable_lines_file = linhas - linhas_branco
-                detalhes_arquivos.append((caminho_relativo, extensao, round(tamanho, 2), linhas, linhas_branco, linhas_comentario, billable_lines_file))
-            except FileNotFoundError:
-                print(f"Arquivo não encontrado: {caminho_completo}")
-            except Exception as e:
-                print(f"Erro ao processar arquivo {caminho_completo}: {str(e)}")
-            
-            # Update progress bar
-            processed_files += 1
-            if progress and hasattr(app, 'update'):
-                progress['value'] = processed_files
-                app.update()
+    total_lines = 0
+    next_report = 0
+    totals = {}  # Per-extension [files, lines, bytes, blank lines, comment lines]
+    changed_extensions = set()  # Extensions whose totals changed since the last progress message
+    for record in records:
+        yield record
+        
+        total = totals.get(record.extensao)
+        if total is None:
+            total = totals[record.extensao] = [0, 0, 0, 0, 0]
+        total[0] += 1
+        total[1] += record.linhas
+        if record.tamanho >= 0:
+            total[2] += record.tamanho
+        total[3] += record.linhas_branco
+        total[4] += record.linhas_comentario
+        changed_extensions.add(record.extensao)
+        processed_files += 1
+        total_lines += record.linhas
+        
+        now = time.perf_counter()
+        if now >= next_report:
+            next_report = now + PROGRESS_INTERVAL
+            rows = {extensao: tuple(totals[extensao]) for extensao in changed_extensions}
+            changed_extensions.clear()
+            progress_queue.put(('progress', processed_files, walk_progress.estimativa(), walk_progress.concluido,
+                                total_lines, rows))
+        
         if stop_flag:
             break
-    return (overall_total_arquivos, overall_total_linhas, overall_total_tamanho, detalhes_arquivos, 
-            arquivos_por_extensao, linhas_por_extensao, tamanho_por_extensao,
-            linhas_branco_por_extensao, linhas_comentario_por_extensao,
-            extensoes_nao_reconhecidas, arquivos_nao_reconhecidos, linhas_nao_reconhecidas)
 
-def start_processing_in_thread(directory):
-    """Start the processing in a separate thread to keep UI responsive"""
-    global latest_results_data, processing, first_run, stop_flag
-    
+def contar_arquivos_e_linhas(diretorio, jobs=1, cache=None, walk_order='depth', excludes=None, on_file=None):
+    """Scan the directory with the contalinha engine, returning its 12 result values with the details
+    in a FileDetails. When on_file is given it receives each file detail as soon as the file is done
+    and the returned details stay empty, so memory only grows with the number of extensions."""
+    # The walk runs together with the scan, so the progress bar total is an estimate that grows
+    # while files are found and becomes exact once the walk is done
+    walk_progress = contalinha.WalkProgress()
+    records = contalinha.iter_file_stats(diretorio, jobs, cache, walk_order, excludes, progresso=walk_progress)
     try:
-        processing = True
-        process_button.config(state=tk.DISABLED)
-        stop_button.config(state=tk.NORMAL)
-        stop_flag = False
-        
-        # Update progress bar while processing
-        if progress:
-            progress.pack(pady=5, fill="x", expand=False, before=summary_label)
-            progress['value'] = 0
+        return contalinha.reduce_file_stats(publish_progress(records, walk_progress), on_file, FileDetails())
+    finally:
+        # Stops the pool; when the scan was stopped early, cached files not reached are kept
+        records.close()
+
+def start_processing_in_thread(directory, jobs=1, use_cache=False, excludes=None, stream_path=None):
+    """Run the scan in the worker thread. The results, or the error, go to progress_queue so that
+    only the main thread updates the widgets"""
+    stream_file = None
+    try:
+        # When streaming, file rows go to the CSV as they finish instead of being kept in memory
+        on_file = None
+        if stream_path:
+            stream_file = open(stream_path, 'w', newline='', encoding='utf-8')
+            stream_writer = csv.writer(stream_file)
+            stream_writer.writerow(DETAILS_CSV_HEADER)
+            on_file = lambda detail: stream_writer.writerow(file_csv_row(detail))
         
         # Process the files
-        latest_results_data = contar_arquivos_e_linhas(directory)
+        cache = contalinha.ScanCache(CACHE_PATH) if use_cache else None
+        result_data = contar_arquivos_e_linhas(directory, jobs, cache, excludes=excludes, on_file=on_file)
         
-        # Update UI in the main thread
-        app.after(0, lambda: display_results_and_cleanup(latest_results_data))
+        if stream_file:
+            # The per-extension summary is appended after the file rows
+            (_, _, _, _, arquivos_por_ext, linhas_por_ext, tamanho_por_ext,
+             linhas_branco_por_ext, linhas_comentario_por_ext, _, _, _) = result_data
+            stream_writer.writerow([])
+            write_summary_rows(stream_writer, arquivos_por_ext, linhas_por_ext, tamanho_por_ext,
+                               linhas_branco_por_ext, linhas_comentario_por_ext)
+            stream_file.close()
+        if cache:
+            cache_text = f"Cache: {cache.hits:,} of {cache.hits + cache.misses:,} files answered from cache ({cache.hit_rate:.1f}%)"
+        else:
+            cache_text = ""
+        if excludes and (excludes.skipped_dirs or excludes.skipped_files):
+            skipped_text = f"Skipped by exclude rules: {excludes.skipped_dirs:,} directories and {excludes.skipped_files:,} files"
+        else:
+            skipped_text = ""
+        progress_queue.put(('done', result_data, cache_text, skipped_text, stream_path, stop_flag))
     except Exception as e:
-        messagebox.showerror("Error", f"An error occurred during processing: {str(e)}")
-        processing = False
-        process_button.config(state=tk.NORMAL)
-        stop_button.config(state=tk.DISABLED)
+        progress_queue.put(('error', str(e)))
+    finally:
+        if stream_file:
+            stream_file.close()
+
+def poll_progress_queue():
+    """Apply the messages of the worker thread, every PROGRESS_INTERVAL until the scan ends"""
+    global latest_results_data, processing
+    while True:
+        try:
+            message = progress_queue.get_nowait()
+        except queue.Empty:
+            break
+        
+        if message[0] == 'progress':
+            _, processed_files, estimate, exact, lines, rows = message
+            progress['maximum'] = max(estimate, processed_files, 1)
+            progress['value'] = processed_files
+            about = "" if exact else "~"
+            progress_label.config(text=f"Scanned {processed_files:,} of {about}{estimate:,} files ({lines:,} lines)")
+            if rows:
+                live_stats.update(rows)
+                display_live_stats(processed_files)
+        elif message[0] == 'done':
+            _, latest_results_data, cache_text, skipped_text, stream_path, stopped = message
+            cache_label.config(text=cache_text)
+            skipped_label.config(text=skipped_text)
+            # A stopped scan keeps what was counted so far, and it can be saved like a full one
+            summary_label.config(text="Summary (partial: scan stopped)" if stopped else "Summary")
+            display_results_and_cleanup(latest_results_data)
+            file_browser.set_details(latest_results_data[3])
+            file_type_combobox.config(values=[ALL_FILE_TYPES] + sorted(latest_results_data[3].extensions))
+            if stream_path:
+                file_count_label.config(text="File rows were streamed to the CSV")
+                messagebox.showinfo("Save Successful", f"Statistics saved to {stream_path}")
+            return
+        elif message[0] == 'error':
+            processing = False
+            process_button.config(state=tk.NORMAL)
+            stop_button.config(state=tk.DISABLED)
+            progress.pack_forget()
+            progress_label.pack_forget()
+            messagebox.showerror("Error", f"An error occurred during processing: {message[1]}")
+            return
+    app.after(int(PROGRESS_INTERVAL * 1000), poll_progress_queue)
 
 def display_results_and_cleanup(result_data):
     """Display results and clean up after processing is complete"""
@@ -303,6 +282,7 @@ def display_results_and_cleanup(result_data):
     # Hide progress bar when done
     if progress:
         progress.pack_forget()
+        progress_label.pack_forget()
     
     processing = False
     first_run = False
@@ -310,7 +290,7 @@ def display_results_and_cleanup(result_data):
 
 def process_directory():
     """Handler for the Select Directory button"""
-    global latest_results_data, first_run, processing
+    global latest_results_data, first_run, processing, stop_flag
     
     if processing:
         messagebox.showinfo("Processing", "Please wait until the current analysis completes.")
@@ -330,18 +310,52 @@ def process_directory():
             summary_tree.delete(item)
         for item in details_tree.get_children():
             details_tree.delete(item)
+        extension_rows.clear()
+        extension_order.clear()
+        detail_items.clear()
+        detail_values.clear()
     
     directory = filedialog.askdirectory()
     if directory:
         selected_directory_label.config(text=f"Selected Directory: {directory}")
         
-        # Start processing in a separate thread
+        patterns = [pattern.strip() for pattern in exclude_var.get().split(';') if pattern.strip()]
+        excludes = contalinha.ExcludeRules(patterns, default_excludes_var.get(), gitignore_var.get())
+        
+        stream_path = None
+        if stream_var.get():
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d-%H-%M")
+            stream_path = filedialog.asksaveasfilename(
+                defaultextension=".csv",
+                initialfile=f'result_{timestamp}.csv',
+                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            )
+            if not stream_path:
+                return
+        
+        processing = True
+        stop_flag = False
+        live_stats.clear()
+        file_browser.set_details(FileDetails())
+        file_type_var.set(ALL_FILE_TYPES)
+        file_filter_var.set("")
+        summary_label.config(text="Summary")
+        process_button.config(state=tk.DISABLED)
+        stop_button.config(state=tk.NORMAL)
+        progress['maximum'] = 1
+        progress['value'] = 0
+        progress_label.config(text="Scanning...")
+        progress.pack(pady=5, fill="x", expand=False, before=summary_label)
+        progress_label.pack(pady=0, before=summary_label)
+        
+        # Start processing in a separate thread; its progress is polled from the main loop
         processing_thread = threading.Thread(
             target=start_processing_in_thread,
-            args=(directory,),
+            args=(directory, jobs_var.get(), cache_var.get(), excludes, stream_path),
             daemon=True
         )
         processing_thread.start()
+        app.after(int(PROGRESS_INTERVAL * 1000), poll_progress_queue)
     else:
         selected_directory_label.config(text="Selected Directory: None")
         latest_results_data = None
@@ -355,8 +369,6 @@ def display_results(result_data):
 
     for item in summary_tree.get_children():
         summary_tree.delete(item)
-    for item in details_tree.get_children():
-        details_tree.delete(item)
     
     total_linhas_branco = sum(linhas_branco_por_extensao.values())
     total_linhas_comentario = sum(linhas_comentario_por_extensao.values())
@@ -384,68 +396,236 @@ def display_results(result_data):
     populate_details_tree(extensoes_ordenadas, arquivos_por_extensao, linhas_por_extensao, tamanho_por_extensao, linhas_branco_por_extensao, linhas_comentario_por_extensao, total_arquivos)
 
 
-def populate_details_tree(ordered_extensions, arquivos_por_ext, linhas_por_ext, tamanho_por_ext, linhas_branco_por_ext, linhas_comentario_por_ext, total_arquivos_overall):
-    for item in details_tree.get_children():
-        details_tree.delete(item)
-
-    for i, ext in enumerate(ordered_extensions):
-        tag = 'ext_even' if i % 2 == 0 else 'ext_odd'
+def display_live_stats(total_arquivos_overall):
+    """Show the per-extension totals received so far; new extensions are appended, so a sort
+    chosen by the user during the scan is kept"""
+    arquivos_por_ext = {ext: row[0] for ext, row in live_stats.items()}
+    linhas_por_ext = {ext: row[1] for ext, row in live_stats.items()}
+    tamanho_por_ext = {ext: row[2] / 1024 for ext, row in live_stats.items()}
+    linhas_branco_por_ext = {ext: row[3] for ext, row in live_stats.items()}
+    linhas_comentario_por_ext = {ext: row[4] for ext, row in live_stats.items()}
+    populate_details_tree(list(live_stats), arquivos_por_ext, linhas_por_ext, tamanho_por_ext, linhas_branco_por_ext,
+                          linhas_comentario_por_ext, total_arquivos_overall, reorder=False)
+
+def populate_details_tree(ordered_extensions, arquivos_por_ext, linhas_por_ext, tamanho_por_ext, linhas_branco_por_ext, linhas_comentario_por_ext, total_arquivos_overall, reorder=True):
+    """Rebuild the per-extension model and show it. With reorder the rows take the order of
+    ordered_extensions; otherwise known rows keep their place, new ones are appended and a sort
+    chosen by clicking a header is kept."""
+    global details_sort
+    extension_rows.clear()
+    for ext in ordered_extensions:
         porcentagem_arquivos = (arquivos_por_ext[ext] / total_arquivos_overall * 100) if total_arquivos_overall > 0 else 0
         linhas_codigo_ext = linhas_por_ext[ext] - linhas_branco_por_ext[ext] - linhas_comentario_por_ext[ext]
         billable_lines_ext = linhas_por_ext[ext] - linhas_branco_por_ext[ext]
-        
-        details_tree.insert("", tk.END, values=(
-            ext, 
-            f"{arquivos_por_ext[ext]:,}", 
-            f"{linhas_por_ext[ext]:,}", 
-            f"{tamanho_por_ext[ext]:.2f}", 
-            f"{porcentagem_arquivos:.1f}%", 
-            f"{linhas_branco_por_ext[ext]:,}", 
-            f"{linhas_comentario_por_ext[ext]:,}", 
-            f"{linhas_codigo_ext:,}", 
-            f"{billable_lines_ext:,}"
-            ), tags=(tag,))
+        extension_rows[ext] = (ext, arquivos_por_ext[ext], linhas_por_ext[ext], tamanho_por_ext[ext], porcentagem_arquivos,
+                               linhas_branco_por_ext[ext], linhas_comentario_por_ext[ext], linhas_codigo_ext, billable_lines_ext)
+    
+    if reorder:
+        extension_order[:] = ordered_extensions
+        details_sort = None
+    else:
+        known = [ext for ext in extension_order if ext in extension_rows]
+        shown = set(known)
+        extension_order[:] = known + [ext for ext in ordered_extensions if ext not in shown]
+        if details_sort:
+            sort_extension_order()
+    render_details_tree()
+
+def render_details_tree():
+    """Write the model rows into the tree items in display order; a position whose values did not
+    change is not touched, and the row colors stay with the positions"""
+    for i, ext in enumerate(extension_order):
+        ext, files, lines, size_kb, percent, blank, comment, code, billable = extension_rows[ext]
+        values = (ext, f"{files:,}", f"{lines:,}", f"{size_kb:.2f}", f"{percent:.1f}%",
+                  f"{blank:,}", f"{comment:,}", f"{code:,}", f"{billable:,}")
+        if i < len(detail_items):
+            item = detail_items[i]
+            if detail_values[item] != values:
+                details_tree.item(item, values=values)
+        else:
+            tag = 'ext_even' if i % 2 == 0 else 'ext_odd'
+            item = details_tree.insert("", tk.END, values=values, tags=(tag,))
+            detail_items.append(item)
+        detail_values[item] = values
+    for item in detail_items[len(extension_order):]:
+        details_tree.delete(item)
+        del detail_values[item]
+    del detail_items[len(extension_order):]
+
+def sort_extension_order():
+    """Sort the display order by the typed model values of the chosen column"""
+    column, reverse = details_sort
+    if column == 0:  # File type, case-insensitively
+        extension_order.sort(key=lambda ext: ext.lower(), reverse=reverse)
+    else:
+        extension_order.sort(key=lambda ext: extension_rows[ext][column], reverse=reverse)
 
 def sort_column(tree, col, reverse):
-    # Get data from tree
-    l = []
-    for k in tree.get_children(''):
-        col_val = tree.set(k, col)
-        # Attempt to convert to number for sorting, fallback to string
-        try:
-            # Handle formatted numbers (e.g., "1,234", "10.5%")
-            cleaned_val = col_val.replace(',', '').replace('%', '')
-            num_val = float(cleaned_val)
-            l.append((num_val, k))
-        except ValueError:
-            l.append((col_val.lower(), k)) # Sort strings case-insensitively
-
-    try:
-        l.sort(key=lambda t: t[0], reverse=reverse)
-    except TypeError: # Fallback for mixed types if conversion failed unexpectedly
-        l.sort(key=lambda t: str(t[0]), reverse=reverse)
-
-
-    # Rearrange items in sorted positions
-    for index, (val, k) in enumerate(l):
-        tree.move(k, '', index)
-
-    # Reapply alternating row colors
-    children = tree.get_children('')
-    for i, child_id in enumerate(children):
-        tag = 'ext_even' if i % 2 == 0 else 'ext_odd'
-        current_tags = list(tree.item(child_id, 'tags'))
-        # Remove old color tags if they exist
-        if 'ext_even' in current_tags: current_tags.remove('ext_even')
-        if 'ext_odd' in current_tags: current_tags.remove('ext_odd')
-        current_tags.append(tag)
-        tree.item(child_id, tags=tuple(current_tags))
-
-
+    """Sort the per-extension table by a column: one sort of the model, then one render"""
+    global details_sort
+    details_sort = (DETAIL_COLUMNS.index(col), reverse)
+    sort_extension_order()
+    render_details_tree()
+    
     # Update the heading command to toggle reverse sorting
     tree.heading(col, command=lambda c=col: sort_column(tree, c, not reverse))
 
 
+FILE_COLUMNS = ('caminho', 'extensao', 'tamanho', 'linhas', 'linhas_branco', 'linhas_comentario', 'linhas_codigo', 'billable_lines')
+FILE_COLUMN_TITLES = ("Relative Path", "File Type", "Size (KB)", "Total Lines", "Blank Lines", "Comment Lines", "Code Lines", "Billable Lines")
+
+class FileBrowser:
+    """Per-file view over a FileDetails that renders only the visible window of rows. Filters and
+    sorts produce an array of file indices, so no widget is created per file, and scrolling just
+    moves the window and rewrites the values of the same few tree items."""
+    
+    def __init__(self, tree, scrollbar, count_label, height):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.count_label = count_label
+        self.height = height
+        self.details = FileDetails()
+        self.view = range(0)
+        self.offset = 0
+        self.items = []
+        self.extension_filter = ''
+        self.path_filter = ''
+        self.sort_by = None
+        self.sort_reverse = False
+        self.sort_ranks = {}  # Column -> array with the rank of each file in that column
+    
+    def set_details(self, details):
+        """Browse a new scan, unfiltered and in scan order"""
+        self.details = details
+        self.sort_ranks = {}
+        self.extension_filter = ''
+        self.path_filter = ''
+        self.sort_by = None
+        self.sort_reverse = False
+        self.update_headings()
+        self.refresh()
+    
+    def set_filters(self, extension_filter, path_filter):
+        self.extension_filter = extension_filter
+        self.path_filter = path_filter
+        self.refresh()
+    
+    def sort(self, column):
+        """Sort by a column; sorting by the same column again reverses the order"""
+        self.sort_reverse = not self.sort_reverse if column == self.sort_by else False
+        self.sort_by = column
+        self.update_headings()
+        self.refresh()
+    
+    def update_headings(self):
+        for column, title in zip(FILE_COLUMNS, FILE_COLUMN_TITLES):
+            if column == self.sort_by:
+                title += " \u25bc" if self.sort_reverse else " \u25b2"
+            self.tree.heading(column, text=title)
+    
+    def refresh(self):
+        """Rebuild the view from the filters and the sort and show its first rows"""
+        details = self.details
+        view = details.extension_rows(self.extension_filter) if self.extension_filter else range(len(details))
+        if self.path_filter:
+            view = details.matching_rows(self.path_filter, view if self.extension_filter else None)
+        if self.sort_by:
+            view = array('q', sorted(view, key=self.sort_rank(self.sort_by).__getitem__, reverse=self.sort_reverse))
+        self.view = view
+        self.offset = 0
+        self.render()
+    
+    def sort_rank(self, column):
+        """Rank of every file in a column, equal for equal values, computed once per column and scan.
+        Later sorts of any filtered view compare these integers instead of paths or computed counts."""
+        rank = self.sort_ranks.get(column)
+        if rank is None:
+            keys = list(map(self.details.sort_key(column), range(len(self.details))))
+            rank = array('q', bytes(8 * len(keys)))
+            current = -1
+            previous = None
+            for i in sorted(range(len(keys)), key=keys.__getitem__):
+                if current < 0 or keys[i] != previous:
+                    current += 1
+                    previous = keys[i]
+                rank[i] = current
+            self.sort_ranks[column] = rank
+        return rank
+    
+    def render(self):
+        """Write the rows of the visible window into the tree items"""
+        rows = self.view[self.offset:self.offset + self.height]
+        for j, i in enumerate(rows):
+            caminho, extensao, tamanho, linhas, linhas_branco, linhas_comentario, billable_lines = self.details[i]
+            values = (caminho, extensao, f"{tamanho:.2f}", f"{linhas:,}", f"{linhas_branco:,}", f"{linhas_comentario:,}",
+                      f"{linhas - linhas_branco - linhas_comentario:,}", f"{billable_lines:,}")
+            if j < len(self.items):
+                self.tree.item(self.items[j], values=values)
+            else:
+                tag = 'ext_even' if j % 2 == 0 else 'ext_odd'
+                self.items.append(self.tree.insert("", tk.END, values=values, tags=(tag,)))
+        for item in self.items[len(rows):]:
+            self.tree.delete(item)
+        del self.items[len(rows):]
+        
+        total = len(self.view)
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + len(rows)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        self.count_label.config(text=f"{total:,} of {len(self.details):,} files")
+    
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.view) - self.height))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+    
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', count, 'units' or 'pages')"""
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * len(self.view)))
+        elif args[0] == 'scroll':
+            step = self.height if args[2] == 'pages' else 1
+            self.scroll_to(self.offset + int(args[1]) * step)
+    
+    def on_mouse_wheel(self, event):
+        # Linux reports the wheel as buttons 4 and 5, Windows and macOS as a delta
+        self.scroll_to(self.offset + (-3 if event.num == 4 or event.delta > 0 else 3))
+        return "break"
+
+SUMMARY_CSV_HEADER = ["Extensão", "Arquivos", "Linhas", "Tamanho (KB)", "Linhas em Branco", "Linhas de Comentário", "Linhas de Código", "Billable Lines"]
+DETAILS_CSV_HEADER = ["Relative Path", "File Type", "File Size (Kbytes)", "Total of Lines", "Blank Lines", "Comment Lines", "Code Lines", "Billable Lines"]
+
+def write_summary_rows(csvwriter, arquivos_por_extensao, linhas_por_extensao, tamanho_por_extensao,
+                       linhas_branco_por_extensao, linhas_comentario_por_extensao):
+    """Write the per-extension statistics section, ordered by file count"""
+    csvwriter.writerow(["Estatísticas por extensão"]) 
+    csvwriter.writerow(SUMMARY_CSV_HEADER)
+    
+    extensoes_ordenadas = sorted(arquivos_por_extensao.keys(), 
+                                 key=lambda ext: arquivos_por_extensao[ext], 
+                                 reverse=True)
+    for ext in extensoes_ordenadas:
+        linhas_codigo_ext = linhas_por_extensao[ext] - linhas_branco_por_extensao[ext] - linhas_comentario_por_extensao[ext]
+        billable_lines_ext = linhas_por_extensao[ext] - linhas_branco_por_extensao[ext]
+        csvwriter.writerow([
+            ext, 
+            arquivos_por_extensao[ext], 
+            linhas_por_extensao[ext], 
+            round(tamanho_por_extensao[ext], 2),
+            linhas_branco_por_extensao[ext],
+            linhas_comentario_por_extensao[ext],
+            linhas_codigo_ext,
+            billable_lines_ext
+        ])
+
+def file_csv_row(arquivo_detalhe):
+    """CSV row of a file detail tuple"""
+    caminho, ext_detalhe, tamanho_detalhe, linhas_detalhe, linhas_branco_detalhe, linhas_comentario_detalhe, billable_lines_file_detalhe = arquivo_detalhe
+    linhas_codigo_detalhe = linhas_detalhe - linhas_branco_detalhe - linhas_comentario_detalhe
+    return [caminho, ext_detalhe, tamanho_detalhe, linhas_detalhe, linhas_branco_detalhe, linhas_comentario_detalhe, linhas_codigo_detalhe, billable_lines_file_detalhe]
+
 def save_statistics_to_csv():
     global latest_results_data
     if not latest_results_data:
@@ -474,124 +654,204 @@ def save_statistics_to_csv():
         with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
             csvwriter = csv.writer(csvfile)
             
-            csvwriter.writerow(["Estatísticas por extensão"]) 
-            csvwriter.writerow(["Extensão", "Arquivos", "Linhas", "Tamanho (KB)", "Linhas em Branco", "Linhas de Comentário", "Linhas de Código", "Billable Lines"])
-            
-            extensoes_ordenadas = sorted(arquivos_por_extensao.keys(), 
-                                         key=lambda ext: arquivos_por_extensao[ext], 
-                                         reverse=True)
-            for ext in extensoes_ordenadas:
-                linhas_codigo_ext = linhas_por_extensao[ext] - linhas_branco_por_extensao[ext] - linhas_comentario_por_extensao[ext]
-                billable_lines_ext = linhas_por_extensao[ext] - linhas_branco_por_extensao[ext]
-                csvwriter.writerow([
-                    ext, 
-                    arquivos_por_extensao[ext], 
-                    linhas_por_extensao[ext], 
-                    round(tamanho_por_extensao[ext], 2),
-                    linhas_branco_por_extensao[ext],
-                    linhas_comentario_por_extensao[ext],
-                    linhas_codigo_ext,
-                    billable_lines_ext
-                ])
+            write_summary_rows(csvwriter, arquivos_por_extensao, linhas_por_extensao, tamanho_por_extensao,
+                               linhas_branco_por_extensao, linhas_comentario_por_extensao)
             
             csvwriter.writerow([]) 
             
-            csvwriter.writerow(["Relative Path", "File Type", "File Size (Kbytes)", "Total of Lines", "Blank Lines", "Comment Lines", "Code Lines", "Billable Lines"])
+            csvwriter.writerow(DETAILS_CSV_HEADER)
             
-            for arquivo_detalhe in detalhes_arquivos: 
-                caminho, ext_detalhe, tamanho_detalhe, linhas_detalhe, linhas_branco_detalhe, linhas_comentario_detalhe, billable_lines_file_detalhe = arquivo_detalhe
-                linhas_codigo_detalhe = linhas_detalhe - linhas_branco_detalhe - linhas_comentario_detalhe
-                csvwriter.writerow([caminho, ext_detalhe, tamanho_detalhe, linhas_detalhe, linhas_branco_detalhe, linhas_comentario_detalhe, linhas_codigo_detalhe, billable_lines_file_detalhe])
+            detalhes_arquivos.write_csv(csvwriter)
         
         messagebox.showinfo("Save Successful", f"Statistics saved to {filepath}")
     except Exception as e:
         messagebox.showerror("Save Error", f"Could not save file: {str(e)}")
 
+def clear_cache():
+    if processing:
+        messagebox.showinfo("Processing", "Please wait until the current analysis completes.")
+        return
+    try:
+        contalinha.ScanCache(CACHE_PATH).clear()
+        messagebox.showinfo("Cache", "The scan cache was cleared.")
+    except Exception as e:
+        messagebox.showerror("Cache Error", f"Could not clear the cache: {str(e)}")
+
 def stop_processing():
     global stop_flag
     if messagebox.askyesno("Confirmation", "Are you sure you want to stop processing?"):
         stop_flag = True
-        messagebox.showinfo("Info", "Processing will stop after the current file.")
-
-app = tk.Tk()
-app.title("Contalinha UI")
-app.configure(bg='#f0f0f0') 
-
-style = ttk.Style(app)
-style.theme_use("clam") 
-
-style.configure("TButton", padding=6, relief="flat", background="#cccccc", foreground="black", font=('Calibri', 10))
-style.map("TButton", background=[('active', '#b0b0b0')])
-style.configure("TLabel", padding=5, background="#f0f0f0", font=('Calibri', 10))
-style.configure("Treeview.Heading", 
-                background="#e1e1e1", 
-                foreground="black", 
-                relief="flat", 
-                font=('Calibri', 10, 'bold'))
-style.map("Treeview.Heading", background=[('active', '#d1d1d1')])
-
-tree_font = ('Calibri', 10)
-
-instruction_label = ttk.Label(app, text="Select a directory to process:")
-instruction_label.pack(pady=5)
-
-process_button = ttk.Button(app, text="Select Directory", command=process_directory)
-process_button.pack(pady=5)
-
-selected_directory_label = ttk.Label(app, text="Selected Directory: None") 
-selected_directory_label.pack(pady=5)
-
-save_button = ttk.Button(app, text="Save Statistics", command=save_statistics_to_csv, state=tk.DISABLED) 
-save_button.pack(pady=5)
-
-stop_button = ttk.Button(app, text="STOP", command=stop_processing, state=tk.DISABLED)
-stop_button.pack(pady=5)
-
-# Create progress bar
-progress = ttk.Progressbar(app, orient="horizontal", length=400, mode="determinate")
-# The progress bar will be displayed only during processing using grid()
-
-version_label = ttk.Label(app, text=f"Version: {VERSION} - Build Date: {BUILD_DATE}")
-version_label.pack(pady=5)
-
-summary_label = ttk.Label(app, text="Summary", font=('Calibri', 12, 'bold'))
-summary_label.pack(pady=(10,0))
-summary_columns = ("Metric", "Value", "Percentage")
-summary_tree = ttk.Treeview(app, columns=summary_columns, show="headings", height=7) 
-summary_tree.heading("Metric", text="Metric")
-summary_tree.heading("Value", text="Value")
-summary_tree.heading("Percentage", text="Percentage")
-summary_tree.column("Metric", width=150, anchor='w')
-summary_tree.column("Value", width=100, anchor='e')
-summary_tree.column("Percentage", width=100, anchor='e')
-summary_tree.tag_configure('summary', background='#e6f3ff', font=tree_font)
-style.configure('summary.Treeview', font=tree_font, rowheight=25) 
-summary_tree.pack(pady=5, fill="x", expand=False)
-
-details_label = ttk.Label(app, text="Statistics by File Type (click column to sort)", font=('Calibri', 12, 'bold'))
-details_label.pack(pady=(10,0))
-
-details_frame = ttk.Frame(app) 
-details_frame.pack(pady=10, fill="both", expand=True)
-
-details_columns_ids = ("file_type", "files", "total_lines", "size_kb", "percent_files", "blank_lines", "comment_lines", "code_lines", "billable_lines")
-details_columns_text = ("File Type", "Files", "Total Lines", "Size (KB)", "% of Files", "Blank Lines", "Comment Lines", "Code Lines", "Billable Lines")
-
-details_tree = ttk.Treeview(details_frame, columns=details_columns_ids, show="headings")
-
-for col_id, col_text in zip(details_columns_ids, details_columns_text):
-    details_tree.heading(col_id, text=col_text, command=lambda c=col_id: sort_column(details_tree, c, False))
-    details_tree.column(col_id, width=100, anchor='e' if col_id not in ["file_type"] else 'w')
-
-
-details_tree.tag_configure('ext_even', background='white', font=tree_font)
-details_tree.tag_configure('ext_odd', background='#f0f8ff', font=tree_font) 
-style.configure('details.Treeview', font=tree_font, rowheight=25) 
-
-details_scrollbar = ttk.Scrollbar(details_frame, orient="vertical", command=details_tree.yview)
-details_tree.configure(yscrollcommand=details_scrollbar.set)
-
-details_scrollbar.pack(side="right", fill="y")
-details_tree.pack(side="left", fill="both", expand=True)
-
-app.mainloop()
+        messagebox.showinfo("Info", "Processing will stop after the current batch of files.")
+
+ALL_FILE_TYPES = "All file types"
+FILTER_DELAY_MS = 300  # Typing pause before the path filter is applied
+filter_job = None
+
+def apply_file_filters(*_):
+    global filter_job
+    filter_job = None
+    file_type = file_type_var.get()
+    file_browser.set_filters('' if file_type == ALL_FILE_TYPES else file_type, file_filter_var.get().strip())
+
+def schedule_file_filters(*_):
+    """Apply the path filter once typing pauses, instead of on every key"""
+    global filter_job
+    if filter_job is not None:
+        app.after_cancel(filter_job)
+    filter_job = app.after(FILTER_DELAY_MS, apply_file_filters)
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Required by the pool in the PyInstaller build
+
+    app = tk.Tk()
+    app.title("Contalinha UI")
+    app.configure(bg='#f0f0f0') 
+
+    style = ttk.Style(app)
+    style.theme_use("clam") 
+
+    style.configure("TButton", padding=6, relief="flat", background="#cccccc", foreground="black", font=('Calibri', 10))
+    style.map("TButton", background=[('active', '#b0b0b0')])
+    style.configure("TLabel", padding=5, background="#f0f0f0", font=('Calibri', 10))
+    style.configure("Treeview.Heading", 
+                    background="#e1e1e1", 
+                    foreground="black", 
+                    relief="flat", 
+                    font=('Calibri', 10, 'bold'))
+    style.map("Treeview.Heading", background=[('active', '#d1d1d1')])
+
+    tree_font = ('Calibri', 10)
+
+    instruction_label = ttk.Label(app, text="Select a directory to process:")
+    instruction_label.pack(pady=5)
+
+    process_button = ttk.Button(app, text="Select Directory", command=process_directory)
+    process_button.pack(pady=5)
+
+    selected_directory_label = ttk.Label(app, text="Selected Directory: None") 
+    selected_directory_label.pack(pady=5)
+
+    save_button = ttk.Button(app, text="Save Statistics", command=save_statistics_to_csv, state=tk.DISABLED) 
+    save_button.pack(pady=5)
+
+    stop_button = ttk.Button(app, text="STOP", command=stop_processing, state=tk.DISABLED)
+    stop_button.pack(pady=5)
+
+    # Number of worker processes used to scan the directory
+    jobs_frame = ttk.Frame(app)
+    jobs_frame.pack(pady=5)
+    ttk.Label(jobs_frame, text="Worker processes:").pack(side="left")
+    jobs_var = tk.IntVar(value=1)
+    jobs_spinbox = ttk.Spinbox(jobs_frame, from_=1, to=os.cpu_count() or 1, textvariable=jobs_var, width=5, state="readonly")
+    jobs_spinbox.pack(side="left")
+
+    # Incremental cache: unchanged files are answered from the previous scan
+    cache_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(jobs_frame, text="Use scan cache", variable=cache_var).pack(side="left", padx=(10, 0))
+    ttk.Button(jobs_frame, text="Clear Cache", command=clear_cache).pack(side="left", padx=(5, 0))
+    
+    # Streaming: file rows are written to a CSV chosen before the scan instead of kept in memory
+    stream_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(jobs_frame, text="Stream file rows to CSV", variable=stream_var).pack(side="left", padx=(10, 0))
+    cache_label = ttk.Label(app, text="")
+    cache_label.pack(pady=0)
+
+    # Pruning rules: skipped directories are never walked
+    excludes_frame = ttk.Frame(app)
+    excludes_frame.pack(pady=5)
+    default_excludes_var = tk.BooleanVar(value=True)
+    ttk.Checkbutton(excludes_frame, text="Skip .git, node_modules, venv and build outputs",
+                    variable=default_excludes_var).pack(side="left")
+    gitignore_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(excludes_frame, text="Respect .gitignore", variable=gitignore_var).pack(side="left", padx=(10, 0))
+    ttk.Label(excludes_frame, text="Exclude (globs separated by ;):").pack(side="left", padx=(10, 0))
+    exclude_var = tk.StringVar(value="")
+    ttk.Entry(excludes_frame, textvariable=exclude_var, width=25).pack(side="left")
+    skipped_label = ttk.Label(app, text="")
+    skipped_label.pack(pady=0)
+
+    # Create progress bar
+    progress = ttk.Progressbar(app, orient="horizontal", length=400, mode="determinate")
+    # The progress bar will be displayed only during processing using grid()
+    progress_label = ttk.Label(app, text="")
+
+    version_label = ttk.Label(app, text=f"Version: {VERSION} - Build Date: {BUILD_DATE}")
+    version_label.pack(pady=5)
+
+    summary_label = ttk.Label(app, text="Summary", font=('Calibri', 12, 'bold'))
+    summary_label.pack(pady=(10,0))
+    summary_columns = ("Metric", "Value", "Percentage")
+    summary_tree = ttk.Treeview(app, columns=summary_columns, show="headings", height=7) 
+    summary_tree.heading("Metric", text="Metric")
+    summary_tree.heading("Value", text="Value")
+    summary_tree.heading("Percentage", text="Percentage")
+    summary_tree.column("Metric", width=150, anchor='w')
+    summary_tree.column("Value", width=100, anchor='e')
+    summary_tree.column("Percentage", width=100, anchor='e')
+    summary_tree.tag_configure('summary', background='#e6f3ff', font=tree_font)
+    style.configure('summary.Treeview', font=tree_font, rowheight=25) 
+    summary_tree.pack(pady=5, fill="x", expand=False)
+
+    details_label = ttk.Label(app, text="Statistics by File Type (click column to sort)", font=('Calibri', 12, 'bold'))
+    details_label.pack(pady=(10,0))
+
+    details_frame = ttk.Frame(app) 
+    details_frame.pack(pady=10, fill="both", expand=True)
+
+    details_columns_ids = DETAIL_COLUMNS
+    details_columns_text = ("File Type", "Files", "Total Lines", "Size (KB)", "% of Files", "Blank Lines", "Comment Lines", "Code Lines", "Billable Lines")
+
+    details_tree = ttk.Treeview(details_frame, columns=details_columns_ids, show="headings")
+
+    for col_id, col_text in zip(details_columns_ids, details_columns_text):
+        details_tree.heading(col_id, text=col_text, command=lambda c=col_id: sort_column(details_tree, c, False))
+        details_tree.column(col_id, width=100, anchor='e' if col_id not in ["file_type"] else 'w')
+
+
+    details_tree.tag_configure('ext_even', background='white', font=tree_font)
+    details_tree.tag_configure('ext_odd', background='#f0f8ff', font=tree_font) 
+    style.configure('details.Treeview', font=tree_font, rowheight=25) 
+
+    details_scrollbar = ttk.Scrollbar(details_frame, orient="vertical", command=details_tree.yview)
+    details_tree.configure(yscrollcommand=details_scrollbar.set)
+
+    details_scrollbar.pack(side="right", fill="y")
+    details_tree.pack(side="left", fill="both", expand=True)
+
+    # Per-file browser: only the visible rows exist in the tree, the scrollbar drives FileBrowser
+    files_label = ttk.Label(app, text="Files (filter, scroll and click a column to sort)", font=('Calibri', 12, 'bold'))
+    files_label.pack(pady=(10,0))
+
+    files_filter_frame = ttk.Frame(app)
+    files_filter_frame.pack(pady=5)
+    file_type_var = tk.StringVar(value=ALL_FILE_TYPES)
+    file_type_combobox = ttk.Combobox(files_filter_frame, textvariable=file_type_var, values=[ALL_FILE_TYPES],
+                                      state="readonly", width=20)
+    file_type_combobox.pack(side="left")
+    file_type_combobox.bind("<<ComboboxSelected>>", apply_file_filters)
+    ttk.Label(files_filter_frame, text="Path contains:").pack(side="left", padx=(10, 0))
+    file_filter_var = tk.StringVar(value="")
+    file_filter_var.trace_add("write", schedule_file_filters)
+    ttk.Entry(files_filter_frame, textvariable=file_filter_var, width=30).pack(side="left")
+    file_count_label = ttk.Label(files_filter_frame, text="")
+    file_count_label.pack(side="left", padx=(10, 0))
+
+    files_frame = ttk.Frame(app)
+    files_frame.pack(pady=10, fill="x", expand=False)
+    FILE_ROWS = 12
+    files_tree = ttk.Treeview(files_frame, columns=FILE_COLUMNS, show="headings", height=FILE_ROWS)
+    files_scrollbar = ttk.Scrollbar(files_frame, orient="vertical")
+    file_browser = FileBrowser(files_tree, files_scrollbar, file_count_label, FILE_ROWS)
+    files_scrollbar.configure(command=file_browser.yview)
+    for col_id, col_text in zip(FILE_COLUMNS, FILE_COLUMN_TITLES):
+        files_tree.heading(col_id, text=col_text, command=lambda c=col_id: file_browser.sort(c))
+        files_tree.column(col_id, width=300 if col_id == 'caminho' else 90, anchor='w' if col_id in ('caminho', 'extensao') else 'e')
+    files_tree.tag_configure('ext_even', background='white', font=tree_font)
+    files_tree.tag_configure('ext_odd', background='#f0f8ff', font=tree_font)
+    for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+        files_tree.bind(sequence, file_browser.on_mouse_wheel)
+
+    files_scrollbar.pack(side="right", fill="y")
+    files_tree.pack(side="left", fill="x", expand=True)
+
+    app.mainloop()
@@ -1,21 +1,53 @@
+import io
 import os
 import csv
 import datetime
 import re
-from collections import defaultdict
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
+import time
+import heapq
+import hashlib
+import json
+import select
+import struct
+import sqlite3
+import tarfile
+import zipfile
+import zlib
+import http.server
+import urllib.parse
+import concurrent.futures
+import fnmatch
+import ctypes
+import ctypes.util
+import argparse
+import threading
+import subprocess
+import multiprocessing
+from contextlib import closing
+from array import array
+from functools import partial
+from itertools import groupby, islice
+from operator import itemgetter
+from collections import OrderedDict, defaultdict, deque, namedtuple
+try:
+    import lzma
+except ImportError:
+    # Python compilado sem o módulo _lzma; pacotes .xz não podem ser abertos
+    lzma = None
+try:
+    from rich.console import Console
+    from rich.table import Table
+    from rich.panel import Panel
+    from rich.console import Group
+except ImportError:
+    # Só a saída no terminal usa o rich; o contalinha-ui importa o motor de contagem sem ele
+    Console = None
 
 # Valdecir Carvalho - utilitario para contar linhas de codigo fonte para o smart engineering
 
 
-print("""
-VERSÃO DESCONTINUADA! UTILIZE O SCRIPT CONTALINHA-UI.PY
-""")
-
 # Inicializar o console Rich
-console = Console()
+console = Console() if Console is not None else None
 
 # Mapeamento de extensões de arquivo para sintaxe de comentários
 COMMENT_SYNTAX = {
@@ -148,246 +180,3269 @@ BLOCK_COMMENT_PATTERNS = [
     (r'#=', r'=#'),           # Julia
 ]
 
-def process_line(line, file_ext, in_block_comment=None):
+# Bytes que str.strip() remove de um texto latin-1 (além das quebras de linha)
+_ESPACOS = b' \t\x0b\x0c\x1c\x1d\x1e\x1f\x85\xa0'
+_CLASSE_ESPACOS = rb'[ \t\x0b\x0c\x1c-\x1f\x85\xa0]*'
+
+# Troca todo byte por 'x', menos '\n'; com os espaços removidos, cada linha vazia vira um '\n' isolado
+_MARCAR_CONTEUDO = bytes(10 if byte == 10 else 120 for byte in range(256))
+
+def _compilar_candidatos(inicio_linha, em_qualquer_lugar, flags=0):
     """
-    Processa uma linha para determinar se é em branco, comentário ou código.
-    
+    Compila as expressões que localizam, direto nos bytes, as linhas que podem
+    ser comentário ou abrir um bloco de comentário.
+
+    As expressões podem aceitar linhas a mais (que o classificador trata como
+    código), mas nunca deixam de fora uma linha que ele classificaria como comentário.
+    Os marcadores de início de linha são procurados a partir do '\n' anterior, e
+    não com '^', para que todas as alternativas comecem por um literal e a busca
+    avance rápido pelos bytes; a primeira linha do bloco é testada à parte.
+
     Args:
-        line (str): A linha a ser processada
-        file_ext (str): Extensão do arquivo para determinar a sintaxe de comentário
-        in_block_comment (str ou None): Se estiver dentro de um comentário de bloco, contém o marcador de fim
-        
+        inicio_linha (list): Padrões (bytes) aceitos no início da linha, após espaços
+        em_qualquer_lugar (list): Padrões (bytes) aceitos em qualquer posição da linha
+        flags (int): Flags de compilação das expressões
+
     Returns:
-        tuple: (is_blank, is_comment, new_in_block_comment)
+        tuple ou None: (primeira_linha, candidatos), ou None quando não há marcadores
     """
-    # Verifica se a linha está em branco (vazia ou apenas espaços)
-    if not line.strip():
-        return True, False, in_block_comment
-        
-    # Se estamos dentro de um comentário de bloco, verifica se ele termina nesta linha
-    if in_block_comment:
-        end_marker = in_block_comment
-        if end_marker in line:
-            # Verifica se há código após o marcador de fim
-            code_after = line.split(end_marker, 1)[1].strip()
-            return False, not bool(code_after), None
-        return False, True, in_block_comment
-    
-    # Obtém a sintaxe de comentário para este tipo de arquivo
-    syntax = COMMENT_SYNTAX.get(file_ext.lower(), None)
-    
-    if syntax:
+    if not inicio_linha and not em_qualquer_lugar:
+        return None
+    alternativas = list(em_qualquer_lugar)
+    if inicio_linha:
+        inicio_linha = _CLASSE_ESPACOS + b'(?:' + b'|'.join(inicio_linha) + b')'
+        alternativas.insert(0, b'\n' + inicio_linha)
+        primeira_linha = re.compile(inicio_linha, flags)
+    else:
+        primeira_linha = None
+    return primeira_linha, re.compile(b'|'.join(alternativas), flags)
+
+class CommentScanner:
+    """
+    Classificador de linhas compilado uma vez a partir de uma entrada do COMMENT_SYNTAX.
+
+    Attributes:
+        line_markers (tuple): Marcadores de comentário de linha
+        blocks (tuple): Pares (início, fim) de comentário de bloco
+        candidates (tuple ou None): Expressões de linhas candidatas usadas pelo process_file
+    """
+
+    def __init__(self, syntax):
+        self.line_markers = tuple(syntax['line'])
+        self.blocks = tuple(syntax['block'])
+        self.candidates = _compilar_candidatos(
+            [re.escape(marker.encode('latin-1')) for marker in self.line_markers],
+            [re.escape(start.encode('latin-1')) for start, end in self.blocks])
+
+    def classify(self, line, in_block_comment=None):
+        """
+        Classifica uma linha como em branco, comentário ou código.
+
+        Args:
+            line (str): A linha a ser processada
+            in_block_comment (str ou None): Se estiver dentro de um comentário de bloco, contém o marcador de fim
+
+        Returns:
+            tuple: (is_blank, is_comment, new_in_block_comment)
+        """
+        stripped = line.strip()
+        # Verifica se a linha está em branco (vazia ou apenas espaços)
+        if not stripped:
+            return True, False, in_block_comment
+
+        # Se estamos dentro de um comentário de bloco, verifica se ele termina nesta linha
+        if in_block_comment:
+            if in_block_comment in line:
+                # Verifica se há código após o marcador de fim
+                code_after = line.split(in_block_comment, 1)[1].strip()
+                return False, not code_after, None
+            return False, True, in_block_comment
+
         # Verifica comentários de linha
-        for marker in syntax['line']:
-            if line.strip().startswith(marker):
-                return False, True, None
-                
+        if self.line_markers and stripped.startswith(self.line_markers):
+            return False, True, None
+
         # Verifica comentários de bloco
-        for start, end in syntax['block']:
+        for start, end in self.blocks:
             if start in line:
+                before, rest = line.split(start, 1)
                 # Se o comentário de bloco começa e termina na mesma linha
-                if end in line.split(start, 1)[1]:
+                if end in rest:
                     # Verifica se há código antes do marcador de início ou após o marcador de fim
-                    parts = line.split(start, 1)
-                    before = parts[0].strip()
-                    after_parts = parts[1].split(end, 1)
-                    after = after_parts[1].strip() if len(after_parts) > 1 else ""
-                    return False, not (before or after), None
+                    after = rest.split(end, 1)[1]
+                    return False, not (before.strip() or after.strip()), None
                 return False, True, end
-    else:
+
+        # Se chegamos aqui, é uma linha de código
+        return False, False, None
+
+class GenericCommentScanner:
+    """
+    Classificador para extensões fora do COMMENT_SYNTAX, baseado nos padrões
+    LINE_COMMENT_PATTERNS e BLOCK_COMMENT_PATTERNS.
+
+    Os padrões de cada lista são reunidos em uma única alternativa pré-compilada,
+    de modo que uma linha de código passa por apenas duas buscas. Os grupos são
+    não capturantes: grupos nomeados impedem o re de avançar direto até o primeiro
+    caractere possível e deixam a busca muitas vezes mais lenta. Quando a linha
+    contém algum início de bloco, os padrões de bloco são testados na ordem da
+    lista, como antes, para que vença o primeiro deles encontrado na linha.
+    """
+
+    def __init__(self):
+        self.line_pattern = re.compile('|'.join(f'(?:{pattern})' for pattern in LINE_COMMENT_PATTERNS), re.IGNORECASE)
+        self.block_start_pattern = re.compile('|'.join(f'(?:{start})' for start, end in BLOCK_COMMENT_PATTERNS))
+        self.blocks = tuple((re.compile(start), re.compile(end), end) for start, end in BLOCK_COMMENT_PATTERNS)
+
+        # Os padrões genéricos começam com ^\s*; o \s de str também aceita \x1c-\x1f, \x85 e \xa0
+        self.candidates = _compilar_candidatos(
+            [pattern[len(r'^\s*'):].replace(r'\s', r'[\s\x1c-\x1f\x85\xa0]').encode('latin-1')
+             for pattern in LINE_COMMENT_PATTERNS],
+            [start.encode('latin-1') for start, end in BLOCK_COMMENT_PATTERNS],
+            re.IGNORECASE)
+
+    def classify(self, line, in_block_comment=None):
+        """
+        Classifica uma linha como em branco, comentário ou código.
+
+        Args:
+            line (str): A linha a ser processada
+            in_block_comment (str ou None): Se estiver dentro de um comentário de bloco, contém o marcador de fim
+
+        Returns:
+            tuple: (is_blank, is_comment, new_in_block_comment)
+        """
+        # Verifica se a linha está em branco (vazia ou apenas espaços)
+        if not line.strip():
+            return True, False, in_block_comment
+
+        # Se estamos dentro de um comentário de bloco, verifica se ele termina nesta linha
+        if in_block_comment:
+            if in_block_comment in line:
+                # Verifica se há código após o marcador de fim
+                code_after = line.split(in_block_comment, 1)[1].strip()
+                return False, not code_after, None
+            return False, True, in_block_comment
+
         # Usa padrões regex para tipos de arquivo desconhecidos
-        for pattern in LINE_COMMENT_PATTERNS:
-            if re.match(pattern, line, re.IGNORECASE):
-                return False, True, None
-                
-        for start_pattern, end_pattern in BLOCK_COMMENT_PATTERNS:
-            start_match = re.search(start_pattern, line)
-            if start_match:
-                # Verifica se o comentário de bloco termina na mesma linha
-                end_match = re.search(end_pattern, line[start_match.end():])
-                if end_match:
-                    # Verifica se há código antes ou depois do comentário
-                    before = line[:start_match.start()].strip()
-                    after = line[start_match.end() + end_match.end():].strip()
-                    return False, not (before or after), None
-                return False, True, end_pattern
+        if self.line_pattern.match(line):
+            return False, True, None
+
+        if self.block_start_pattern.search(line):
+            for start_regex, end_regex, end_pattern in self.blocks:
+                start_match = start_regex.search(line)
+                if start_match:
+                    # Verifica se o comentário de bloco termina na mesma linha
+                    end_match = end_regex.search(line, start_match.end())
+                    if end_match:
+                        # Verifica se há código antes ou depois do comentário
+                        before = line[:start_match.start()].strip()
+                        after = line[end_match.end():].strip()
+                        return False, not (before or after), None
+                    return False, True, end_pattern
+
+        # Se chegamos aqui, é uma linha de código
+        return False, False, None
+
+# Classificadores compilados uma única vez, por extensão
+SCANNERS = {ext: CommentScanner(syntax) for ext, syntax in COMMENT_SYNTAX.items()}
+GENERIC_SCANNER = GenericCommentScanner()
+
+# Assinaturas (magic numbers) de formatos binários comuns: imagens, PDF, zip/jar,
+# executáveis, objetos compilados, arquivos compactados, áudio e fontes. 'MZ' (PE) e
+# 'ID3' (MP3) ficam de fora: são texto comum no início de uma linha, e um executável
+# ou uma tag ID3v2 de verdade tem bytes NUL no cabeçalho, dentro da amostra
+ASSINATURAS_BINARIAS = (
+    b'\x89PNG', b'\xff\xd8\xff', b'GIF87a', b'GIF89a', b'II*\x00', b'MM\x00*', b'%PDF-',
+    b'PK\x03\x04', b'PK\x05\x06', b'\x7fELF', b'\xca\xfe\xba\xbe', b'\xcf\xfa\xed\xfe',
+    b'\xce\xfa\xed\xfe', b'\xd0\xcf\x11\xe0', b'\x1f\x8b', b'\xfd7zXZ\x00', b"7z\xbc\xaf'\x1c",
+    b'(\xb5/\xfd', b'Rar!\x1a\x07', b'OggS', b'fLaC', b'RIFF', b'wOFF', b'wOF2',
+)
+
+# Bytes do início do arquivo examinados para decidir se ele é binário
+TAMANHO_AMOSTRA = 4096
+
+# Grupo do relatório em que os arquivos binários são contados
+EXTENSAO_BINARIO = "(binário)"
+
+# Identifica as regras de comentário em uso; contagens guardadas com outras regras são descartadas
+_VERSAO_REGRAS = hashlib.sha1(repr((COMMENT_SYNTAX, LINE_COMMENT_PATTERNS, BLOCK_COMMENT_PATTERNS,
+                                    ASSINATURAS_BINARIAS, TAMANHO_AMOSTRA)).encode('utf-8')).hexdigest()
+
+def get_scanner(file_ext):
+    """
+    Obtém o classificador de linhas para a extensão.
+
+    Args:
+        file_ext (str): Extensão do arquivo
+
+    Returns:
+        CommentScanner ou GenericCommentScanner: Classificador da extensão, ou o
+        genérico quando ela não está no COMMENT_SYNTAX
+    """
+    return SCANNERS.get(file_ext.lower(), GENERIC_SCANNER)
+
+def process_line(line, file_ext, in_block_comment=None):
+    """
+    Processa uma linha para determinar se é em branco, comentário ou código.
     
-    # Se chegamos aqui, é uma linha de código
-    return False, False, None
+    Para classificar várias linhas do mesmo arquivo, prefira obter o
+    classificador uma vez com get_scanner e chamar classify diretamente.
+
+    Args:
+        line (str): A linha a ser processada
+        file_ext (str): Extensão do arquivo para determinar a sintaxe de comentário
+        in_block_comment (str ou None): Se estiver dentro de um comentário de bloco, contém o marcador de fim
+        
+    Returns:
+        tuple: (is_blank, is_comment, new_in_block_comment)
+    """
+    return get_scanner(file_ext).classify(line, in_block_comment)
+
+# Tamanho máximo lido de uma vez; arquivos maiores são processados em blocos
+TAMANHO_BLOCO = 16 * 1024 * 1024
+
+# Bytes lidos de cada arquivo pela leitura antecipada (--prefetch); o resto é lido pelo classificador
+TAMANHO_ANTECIPADO = 1024 * 1024
+
+def _ler_blocos(f, inicio=b''):
+    """
+    Lê um arquivo binário em blocos que terminam em quebra de linha.
+
+    As quebras '\r\n' e '\r' são convertidas para '\n', como na leitura em modo
+    texto. Arquivos menores que TAMANHO_BLOCO são lidos em uma única chamada.
+
+    Args:
+        f: Arquivo ou fluxo aberto em modo binário
+        inicio (bytes): Bytes do início do arquivo que já foram lidos de f
+
+    Yields:
+        bytes: Bloco com linhas completas
+    """
+    resto = inicio
+    while True:
+        dados = f.read(TAMANHO_BLOCO)
+        if not dados:
+            break
+        dados = resto + dados
+        corte = dados.rfind(b'\n') + 1
+        if corte == 0:
+            resto = dados
+            continue
+        resto = dados[corte:]
+        dados = dados[:corte]
+        if b'\r' in dados:
+            dados = dados.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        yield dados
+    if resto:
+        if b'\r' in resto:
+            resto = resto.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        yield resto
+
+def _contar_linhas(dados, inicio, fim):
+    """
+    Conta as linhas e as linhas em branco de um trecho de linhas completas.
+
+    Args:
+        dados (bytes): Bloco com quebras de linha '\n'
+        inicio (int): Início de uma linha
+        fim (int): Início de uma linha posterior ou o fim do bloco
+
+    Returns:
+        tuple: (linhas, linhas_branco)
+    """
+    if fim <= inicio:
+        return 0, 0
+    # Desconsidera a quebra final para não contar uma linha vazia a mais
+    if dados[fim - 1] == 10:
+        fim -= 1
+    trecho = dados[inicio:fim].translate(_MARCAR_CONTEUDO, _ESPACOS)
+    linhas = trecho.count(b'\n') + 1
+    linhas_com_conteudo = trecho.count(b'\nx') + trecho.startswith(b'x')
+    return linhas, linhas - linhas_com_conteudo
+
+def _contar_bloco(dados, scanner, in_block_comment):
+    """
+    Conta as linhas de um bloco de bytes sem criar um objeto por linha.
+
+    Linhas em branco e de código são contadas com operações sobre os bytes; só
+    as linhas candidatas a comentário e as que fecham um comentário de bloco são
+    decodificadas e passadas ao classificador.
+
+    Args:
+        dados (bytes): Bloco com quebras de linha '\n'
+        scanner (CommentScanner ou GenericCommentScanner): Classificador da extensão
+        in_block_comment (str ou None): Marcador de fim do bloco aberto no bloco anterior
+
+    Returns:
+        tuple: (total_lines, blank_lines, comment_lines, in_block_comment)
+    """
+    fim = len(dados)
+    total_lines, blank_lines = _contar_linhas(dados, 0, fim)
+    comment_lines = 0
+    pos = 0
+    candidatos = scanner.candidates
+    classify = scanner.classify
+
+    while pos < fim:
+        if in_block_comment:
+            # Dentro de um bloco, todas as linhas não vazias até a que contém o marcador de fim são comentário
+            achado = dados.find(in_block_comment.encode('latin-1'), pos)
+            inicio = fim if achado < 0 else dados.rfind(b'\n', 0, achado) + 1
+            linhas, linhas_branco = _contar_linhas(dados, pos, inicio)
+            comment_lines += linhas - linhas_branco
+            if achado < 0:
+                break
+        elif candidatos is None:
+            break
+        elif pos == 0 and candidatos[0] and candidatos[0].match(dados):
+            inicio = 0
+        else:
+            # A busca começa no '\n' que encerra a linha anterior
+            achado = candidatos[1].search(dados, pos - 1 if pos else 0)
+            if achado is None:
+                break
+            inicio = dados.rfind(b'\n', 0, achado.end() - 1) + 1
+
+        final = dados.find(b'\n', inicio)
+        final = fim if final < 0 else final + 1
+        is_blank, is_comment, in_block_comment = classify(dados[inicio:final].decode('latin-1'), in_block_comment)
+        if is_comment:
+            comment_lines += 1
+        pos = final
+
+    return total_lines, blank_lines, comment_lines, in_block_comment
+
+def _e_binario(amostra):
+    """
+    Indica se o início de um arquivo é de um arquivo binário.
 
-def process_file(file_path, file_ext):
+    Args:
+        amostra (bytes): Primeiros bytes do arquivo
+
+    Returns:
+        bool: True se há um byte NUL na amostra ou ela começa com uma das
+        ASSINATURAS_BINARIAS
+    """
+    return b'\x00' in amostra or amostra.startswith(ASSINATURAS_BINARIAS)
+
+def process_file(file_path, file_ext, tempos=None, antecipado=None):
     """
     Processa um arquivo para contar linhas totais, em branco e de comentário.
     
+    O arquivo é lido como bytes, em blocos; as quebras de linha são localizadas
+    com operações sobre os bytes e só as linhas que podem ser comentário chegam
+    ao classificador da extensão, obtido uma única vez por arquivo. Antes disso
+    os primeiros TAMANHO_AMOSTRA bytes, já no buffer da leitura, são examinados,
+    e um arquivo binário não é lido além deles.
+
     Args:
         file_path (str): Caminho para o arquivo
         file_ext (str): Extensão do arquivo
+        tempos (list ou None): Usado pelo --profile; tempos[0] recebe a soma dos
+            segundos gastos na classificação das linhas
+        antecipado (Future ou None): Leitura antecipada de _ler_inicio, com o
+            arquivo já aberto e o seu início já lido; um erro na abertura é
+            informado como os demais
         
     Returns:
-        tuple: (total_lines, blank_lines, comment_lines)
+        tuple ou None: (total_lines, blank_lines, comment_lines), ou None se o
+        arquivo é binário
     """
-    total_lines = 0
-    blank_lines = 0
-    comment_lines = 0
-    in_block_comment = None
-    
+    contagem = [0, 0, 0]
     try:
-        with open(file_path, 'r', encoding='latin-1') as f:
-            for line in f:
-                total_lines += 1
-                is_blank, is_comment, in_block_comment = process_line(line, file_ext, in_block_comment)
-                
-                if is_blank:
-                    blank_lines += 1
-                elif is_comment:
-                    comment_lines += 1
+        if antecipado is None:
+            with open(file_path, 'rb') as f:
+                if _e_binario(f.peek(TAMANHO_AMOSTRA)[:TAMANHO_AMOSTRA]):
+                    return None
+                _contar_blocos(_ler_blocos(f), file_ext, contagem, tempos)
+        else:
+            f, inicio = antecipado.result()
+            with f:
+                if _e_binario(inicio[:TAMANHO_AMOSTRA]):
+                    return None
+                _contar_blocos(_ler_blocos(f, inicio), file_ext, contagem, tempos)
     except Exception as e:
         print(f"Erro ao processar {file_path}: {str(e)}")
         
-    return total_lines, blank_lines, comment_lines
+    return tuple(contagem)
 
-def contar_arquivos_e_linhas(diretorio):
-    """Conta os arquivos, linhas e tamanho em um diretório dado.
+def _contar_blocos(blocos, file_ext, contagem, tempos=None):
+    """
+    Soma as linhas dos blocos de um arquivo em contagem.
 
     Args:
-        diretorio (str): Caminho completo do diretório.
+        blocos (iterable): Blocos de _ler_blocos
+        file_ext (str): Extensão do arquivo
+        contagem (list): [total_lines, blank_lines, comment_lines], atualizada a
+            cada bloco, para que um erro de leitura mantenha o que já foi contado
+        tempos (list ou None): Como em process_file
+    """
+    in_block_comment = None
+    scanner = get_scanner(file_ext)
+    for dados in blocos:
+        if tempos is not None:
+            inicio = time.perf_counter()
+        linhas, linhas_branco, linhas_comentario, in_block_comment = _contar_bloco(
+            dados, scanner, in_block_comment)
+        if tempos is not None:
+            tempos[0] += time.perf_counter() - inicio
+        contagem[0] += linhas
+        contagem[1] += linhas_branco
+        contagem[2] += linhas_comentario
+
+def _contar_fluxo(f, file_ext, tempos=None):
+    """
+    Conta as linhas de um fluxo sem posicionamento, como um membro de um pacote.
+
+    Só a amostra inicial e um bloco de cada vez ficam em memória, qualquer que
+    seja o tamanho do fluxo.
 
     Returns:
-        int: Número total de arquivos.
-        int: Número total de linhas em todos os arquivos.
-        int: Tamanho total dos arquivos em Kbytes.
-        list: Lista de detalhes dos arquivos.
-        dict: Contagem de arquivos por extensão.
-        dict: Contagem de linhas por extensão.
-        dict: Tamanho por extensão.
-        dict: Contagem de linhas em branco por extensão.
-        dict: Contagem de linhas de comentário por extensão.
+        tuple ou None: (total_lines, blank_lines, comment_lines), ou None se o
+        conteúdo é binário
     """
+    amostra = f.read(TAMANHO_AMOSTRA)
+    if _e_binario(amostra):
+        return None
+    contagem = [0, 0, 0]
+    _contar_blocos(_ler_blocos(f, amostra), file_ext, contagem, tempos)
+    return tuple(contagem)
 
-    total_arquivos = 0
-    total_linhas = 0
-    total_linhas_branco = 0
-    total_linhas_comentario = 0
-    total_tamanho = 0
-    detalhes_arquivos = []
-    
-    # Conjunto para rastrear extensões não reconhecidas
-    extensoes_nao_reconhecidas = set()
-    arquivos_nao_reconhecidos = 0
-    linhas_nao_reconhecidas = 0
-    
-    # Dicionários para contar arquivos e linhas por extensão
-    arquivos_por_extensao = defaultdict(int)
-    linhas_por_extensao = defaultdict(int)
-    linhas_branco_por_extensao = defaultdict(int)
-    linhas_comentario_por_extensao = defaultdict(int)
-    tamanho_por_extensao = defaultdict(float)
-    
-    # Processar os arquivos e coletar informações
-    for raiz, diretorios, arquivos in os.walk(diretorio):
-        for arquivo in arquivos:
-            extensao = os.path.splitext(arquivo)[1].lower()
-            if not extensao:
-                extensao = "(sem extensão)"
-                
-            caminho_completo = os.path.join(raiz, arquivo)
-            total_arquivos += 1
-            arquivos_por_extensao[extensao] += 1
-            
-            # Verificar se a extensão é reconhecida
-            if extensao.lower() not in COMMENT_SYNTAX:
-                extensoes_nao_reconhecidas.add(extensao)
-                arquivos_nao_reconhecidos += 1
+def _contar_conteudo(conteudo, file_ext, tempos=None):
+    """
+    Conta as linhas de um conteúdo já em memória, como process_file conta as de um arquivo.
 
-            try:
-                # Processar o arquivo para contar linhas totais, em branco e de comentário
-                linhas, linhas_branco, linhas_comentario = process_file(caminho_completo, extensao)
-                
-                total_linhas += linhas
-                total_linhas_branco += linhas_branco
-                total_linhas_comentario += linhas_comentario
-                
-                # Contar linhas em arquivos não reconhecidos
-                if extensao.lower() not in COMMENT_SYNTAX:
-                    linhas_nao_reconhecidas += linhas
-                
-                linhas_por_extensao[extensao] += linhas
-                linhas_branco_por_extensao[extensao] += linhas_branco
-                linhas_comentario_por_extensao[extensao] += linhas_comentario
-
-                tamanho = os.path.getsize(caminho_completo) / 1024  # tamanho em Kbytes
-                total_tamanho += tamanho
-                tamanho_por_extensao[extensao] += tamanho
-
-                caminho_relativo = os.path.relpath(caminho_completo, diretorio)
-                billable_lines_file = linhas - linhas_branco
-                detalhes_arquivos.append((caminho_relativo, extensao, round(tamanho, 2), linhas, linhas_branco, linhas_comentario, billable_lines_file))
-            except FileNotFoundError:
-                print(f"Arquivo não encontrado: {caminho_completo}")
-                continue
-            except Exception as e:
-                print(f"Erro ao processar arquivo {caminho_completo}: {str(e)}")
+    Returns:
+        tuple ou None: (total_lines, blank_lines, comment_lines), ou None se o
+        conteúdo é binário
+    """
+    if _e_binario(conteudo[:TAMANHO_AMOSTRA]):
+        return None
+    contagem = [0, 0, 0]
+    _contar_blocos(_ler_blocos(io.BytesIO(conteudo)), file_ext, contagem, tempos)
+    return tuple(contagem)
+
+class ScanCache:
+    """
+    Cache persistente (SQLite) das contagens de cada arquivo.
+
+    As contagens (linhas, em branco, de comentário) são guardadas por diretório
+    raiz e caminho relativo, junto com o tamanho e o mtime_ns do arquivo. Um
+    arquivo cujo tamanho e mtime não mudaram é respondido pelo cache sem ser
+    aberto. Na varredura de revisões git as contagens são guardadas por SHA do
+    blob e extensão, e valem para qualquer repositório e revisão. O cache é
+    descartado quando as regras de comentário mudam.
+
+    Attributes:
+        caminho (str): Arquivo SQLite do cache
+        max_entries (int ou None): Máximo de arquivos guardados; os usados há mais
+            tempo são removidos primeiro
+        hits (int): Arquivos respondidos pelo cache
+        misses (int): Arquivos processados por não estarem no cache ou terem mudado
+    """
+
+    def __init__(self, caminho, max_entries=None):
+        self.caminho = caminho
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        """Percentual de arquivos respondidos pelo cache."""
+        total = self.hits + self.misses
+        return (self.hits / total * 100) if total > 0 else 0
+
+    def _conectar(self):
+        """Abre o banco, criando as tabelas e descartando contagens de regras antigas."""
+        con = sqlite3.connect(self.caminho)
+        with con:
+            con.execute("CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT)")
+            con.execute("CREATE TABLE IF NOT EXISTS arquivos ("
+                        "raiz TEXT, caminho TEXT, tamanho INTEGER, mtime_ns INTEGER, "
+                        "linhas INTEGER, linhas_branco INTEGER, linhas_comentario INTEGER, usado_em INTEGER, "
+                        "PRIMARY KEY (raiz, caminho))")
+            con.execute("CREATE TABLE IF NOT EXISTS blobs ("
+                        "sha TEXT, extensao TEXT, linhas INTEGER, linhas_branco INTEGER, "
+                        "linhas_comentario INTEGER, usado_em INTEGER, PRIMARY KEY (sha, extensao))")
+            versao = con.execute("SELECT valor FROM meta WHERE chave = 'versao'").fetchone()
+            if versao is None or versao[0] != _VERSAO_REGRAS:
+                con.execute("DELETE FROM arquivos")
+                con.execute("DELETE FROM blobs")
+                con.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('versao', ?)", (_VERSAO_REGRAS,))
+        return con
+
+    def load(self, diretorio):
+        """
+        Carrega as contagens guardadas para um diretório.
+
+        Args:
+            diretorio (str): Diretório raiz da varredura
+
+        Returns:
+            dict: caminho relativo -> (tamanho, mtime_ns, linhas, linhas_branco, linhas_comentario)
+        """
+        with closing(self._conectar()) as con:
+            cursor = con.execute("SELECT caminho, tamanho, mtime_ns, linhas, linhas_branco, linhas_comentario "
+                                 "FROM arquivos WHERE raiz = ?", (os.path.abspath(diretorio),))
+            return {linha[0]: linha[1:] for linha in cursor}
+
+    def store(self, diretorio, novos, removidos=()):
+        """
+        Grava as contagens de uma varredura.
+
+        Args:
+            diretorio (str): Diretório raiz da varredura
+            novos (list): Lista de (caminho_relativo, tamanho, mtime_ns, linhas,
+                linhas_branco, linhas_comentario) dos arquivos processados
+            removidos (iterable): Caminhos relativos que não existem mais
+        """
+        raiz = os.path.abspath(diretorio)
+        agora = time.time_ns()
+        with closing(self._conectar()) as con, con:
+            con.executemany("INSERT OR REPLACE INTO arquivos VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            ((raiz,) + novo + (agora,) for novo in novos))
+            con.executemany("DELETE FROM arquivos WHERE raiz = ? AND caminho = ?",
+                            ((raiz, caminho) for caminho in removidos))
+            con.execute("UPDATE arquivos SET usado_em = ? WHERE raiz = ?", (agora, raiz))
+            if self.max_entries is not None:
+                excesso = con.execute("SELECT COUNT(*) FROM arquivos").fetchone()[0] - self.max_entries
+                if excesso > 0:
+                    con.execute("DELETE FROM arquivos WHERE rowid IN "
+                                "(SELECT rowid FROM arquivos ORDER BY usado_em LIMIT ?)", (excesso,))
+
+    def load_blobs(self, chaves):
+        """
+        Carrega as contagens guardadas de blobs git.
+
+        Args:
+            chaves (iterable): Pares (sha, extensao) procurados
+
+        Returns:
+            dict: (sha, extensao) -> (linhas, linhas_branco, linhas_comentario), com
+            linhas -1 para blobs binários, só dos pares encontrados
+        """
+        chaves = set(chaves)
+        shas = sorted({sha for sha, _ in chaves})
+        encontrados = {}
+        with closing(self._conectar()) as con:
+            # Em grupos, abaixo do limite de parâmetros de uma consulta do SQLite
+            for inicio in range(0, len(shas), 500):
+                grupo = shas[inicio:inicio + 500]
+                cursor = con.execute("SELECT sha, extensao, linhas, linhas_branco, linhas_comentario FROM blobs "
+                                     f"WHERE sha IN ({','.join('?' * len(grupo))})", grupo)
+                for linha in cursor:
+                    if linha[:2] in chaves:
+                        encontrados[linha[:2]] = linha[2:]
+        return encontrados
+
+    def store_blobs(self, novos):
+        """
+        Grava as contagens de blobs git.
+
+        Args:
+            novos (list): Lista de (sha, extensao, linhas, linhas_branco, linhas_comentario)
+        """
+        agora = time.time_ns()
+        with closing(self._conectar()) as con, con:
+            con.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                            (novo + (agora,) for novo in novos))
+            if self.max_entries is not None:
+                excesso = con.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] - self.max_entries
+                if excesso > 0:
+                    con.execute("DELETE FROM blobs WHERE rowid IN "
+                                "(SELECT rowid FROM blobs ORDER BY usado_em LIMIT ?)", (excesso,))
+
+    def clear(self):
+        """Remove todas as contagens guardadas."""
+        with closing(self._conectar()) as con, con:
+            con.execute("DELETE FROM arquivos")
+            con.execute("DELETE FROM blobs")
+
+# Diretórios que a varredura não percorre por padrão: controle de versão, dependências,
+# ambientes virtuais, caches de ferramentas e saídas de build
+DIRETORIOS_EXCLUIDOS = frozenset({
+    '.git', '.hg', '.svn', 'node_modules', 'bower_components', 'venv', '.venv',
+    '__pycache__', '.tox', '.mypy_cache', '.pytest_cache', 'dist', 'build', 'target',
+})
+
+def _glob_para_regex(padrao):
+    """
+    Converte um padrão do .gitignore em expressão regular.
+
+    '*' e '?' não atravessam '/', '**' atravessa qualquer número de diretórios,
+    classes como [a-z] são mantidas e '\\' escapa o caractere seguinte.
+
+    Args:
+        padrao (str): Padrão sem '!' inicial e sem '/' final
+
+    Returns:
+        str: Expressão regular equivalente, para uso com fullmatch
+    """
+    partes = []
+    i = 0
+    n = len(padrao)
+    while i < n:
+        c = padrao[i]
+        if padrao.startswith('**/', i):
+            partes.append('(?:.*/)?')
+            i += 3
+        elif padrao.startswith('**', i):
+            partes.append('.*')
+            i += 2
+        elif c == '*':
+            partes.append('[^/]*')
+            i += 1
+        elif c == '?':
+            partes.append('[^/]')
+            i += 1
+        elif c == '[':
+            # Um ']' logo após '[' ou '[!' faz parte da classe
+            j = i + 1
+            if j < n and padrao[j] in '!^':
+                j += 1
+            if j < n and padrao[j] == ']':
+                j += 1
+            fim = padrao.find(']', j)
+            if fim < 0:
+                partes.append(re.escape(c))
+                i += 1
+            else:
+                classe = padrao[i + 1:fim].replace('\\', '\\\\')
+                if classe.startswith('!'):
+                    classe = '^' + classe[1:]
+                partes.append('[' + classe + ']')
+                i = fim + 1
+        elif c == '\\' and i + 1 < n:
+            partes.append(re.escape(padrao[i + 1]))
+            i += 2
+        else:
+            partes.append(re.escape(c))
+            i += 1
+    return ''.join(partes)
+
+def _compilar_gitignore(texto):
+    """
+    Compila as regras de um arquivo .gitignore.
+
+    Args:
+        texto (str): Conteúdo do arquivo
+
+    Returns:
+        tuple ou None: (por_nome, por_caminho, regras). por_nome é uma única
+        expressão com as regras sem '/', que casam só com o nome da entrada, e
+        por_caminho outra com as regras ancoradas, que casam com o caminho relativo
+        ao .gitignore (None quando não há regras do tipo); elas descartam de uma vez
+        as entradas que nenhuma regra alcança. regras é a lista de (expressao,
+        negada, apenas_diretorios, ancorada) na ordem do arquivo. None se o arquivo
+        não tem regras.
+    """
+    regras = []
+    for linha in texto.splitlines():
+        if not linha.endswith('\\ '):
+            linha = linha.rstrip(' ')
+        if not linha or linha.startswith('#'):
+            continue
+        negada = linha.startswith('!')
+        if negada:
+            linha = linha[1:]
+        apenas_diretorios = linha.endswith('/')
+        linha = linha.rstrip('/')
+        if not linha:
+            continue
+        # Padrões com '/' no início ou no meio são relativos ao diretório do .gitignore;
+        # os demais casam com o nome em qualquer nível abaixo dele
+        ancorada = '/' in linha
+        regras.append((_glob_para_regex(linha.lstrip('/')), negada, apenas_diretorios, ancorada))
+
+    if not regras:
+        return None
+
+    def unir(expressoes):
+        return re.compile('|'.join(f'(?:{e})' for e in expressoes), re.DOTALL) if expressoes else None
+
+    por_nome = unir([expressao for expressao, _, _, ancorada in regras if not ancorada])
+    por_caminho = unir([expressao for expressao, _, _, ancorada in regras if ancorada])
+    return por_nome, por_caminho, [(re.compile(expressao, re.DOTALL), negada, apenas_diretorios, ancorada)
+                                   for expressao, negada, apenas_diretorios, ancorada in regras]
+
+class ExcludeRules:
+    """
+    Regras de poda da varredura.
+
+    Um diretório excluído é retirado do percurso antes de ser listado, então
+    nenhum arquivo abaixo dele é tocado. Os arquivos excluídos não são abertos
+    nem entram nos totais.
+
+    Attributes:
+        padroes (list): Globs do --exclude, comparados com o nome e com o caminho
+            relativo (separado por '/') de arquivos e diretórios
+        default_excludes (bool): Pula os diretórios de DIRETORIOS_EXCLUIDOS
+        gitignore (bool): Respeita os arquivos .gitignore encontrados no percurso
+        skipped_dirs (int): Diretórios podados
+        skipped_files (int): Arquivos ignorados
+    """
+
+    def __init__(self, padroes=(), default_excludes=True, gitignore=False):
+        self.padroes = list(padroes)
+        self.default_excludes = default_excludes
+        self.gitignore = gitignore
+        self.skipped_dirs = 0
+        self.skipped_files = 0
+        # Todos os globs são testados de uma vez, numa única expressão
+        flags = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+        self._globs = (re.compile('|'.join(fnmatch.translate(padrao) for padrao in self.padroes), flags)
+                       if self.padroes else None)
+
+    def exclui(self, nome, caminho, e_diretorio, gitignores=()):
+        """
+        Indica se um arquivo ou diretório deve ser pulado.
+
+        Args:
+            nome (str): Nome da entrada
+            caminho (str): Caminho relativo à raiz da varredura, separado por '/'
+            e_diretorio (bool): Se a entrada é um diretório
+            gitignores (tuple): (prefixo, por_nome, por_caminho, regras) de cada
+                .gitignore acima da entrada, do mais raso ao mais profundo
+
+        Returns:
+            bool: True se a entrada deve ser pulada
+        """
+        if e_diretorio and self.default_excludes and nome in DIRETORIOS_EXCLUIDOS:
+            return True
+        if self._globs is not None and (self._globs.match(nome) or self._globs.match(caminho)):
+            return True
+
+        # O .gitignore mais profundo tem precedência, e dentro dele vale a última regra que casa
+        for prefixo, por_nome, por_caminho, regras in reversed(gitignores):
+            relativo = caminho[len(prefixo):]
+            if not ((por_nome and por_nome.fullmatch(nome)) or (por_caminho and por_caminho.fullmatch(relativo))):
                 continue
+            for expressao, negada, apenas_diretorios, ancorada in reversed(regras):
+                if (e_diretorio or not apenas_diretorios) and expressao.fullmatch(relativo if ancorada else nome):
+                    return not negada
+        return False
 
-    # Não ordenar por tamanho para manter a ordem original de processamento
-    # detalhes_arquivos.sort(key=lambda x: x[2], reverse=True)
+    def ler_gitignore(self, caminho, prefixo, gitignores):
+        """
+        Acrescenta as regras do .gitignore de um diretório às herdadas dos diretórios acima.
 
-    return (total_arquivos, total_linhas, total_tamanho, detalhes_arquivos, 
-            arquivos_por_extensao, linhas_por_extensao, tamanho_por_extensao,
-            linhas_branco_por_extensao, linhas_comentario_por_extensao,
-            extensoes_nao_reconhecidas, arquivos_nao_reconhecidos, linhas_nao_reconhecidas)
+        Args:
+            caminho (str): Caminho do arquivo .gitignore
+            prefixo (str): Caminho relativo do diretório dele, terminado em '/'
+            gitignores (tuple): Regras herdadas
 
-if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1:
-        diretorio = sys.argv[1]
-    else:
-        diretorio = input("Digite o caminho do diretório: ")
+        Returns:
+            tuple: As regras herdadas, mais as deste arquivo se ele tiver alguma
+        """
+        try:
+            with open(caminho, 'r', encoding='utf-8', errors='replace') as f:
+                compilado = _compilar_gitignore(f.read())
+        except OSError:
+            return gitignores
+        if compilado is None:
+            return gitignores
+        return gitignores + ((prefixo,) + compilado,)
 
-    (total_arquivos, total_linhas, total_tamanho, detalhes_arquivos, 
-     arquivos_por_extensao, linhas_por_extensao, tamanho_por_extensao,
-     linhas_branco_por_extensao, linhas_comentario_por_extensao,
-     extensoes_nao_reconhecidas, arquivos_nao_reconhecidos, linhas_nao_reconhecidas) = contar_arquivos_e_linhas(diretorio)
+# Ordens de percurso aceitas por _percorrer
+ORDENS_PERCURSO = ('depth', 'breadth')
 
-    # Calcular totais de linhas em branco e de comentário
-    total_linhas_branco = sum(linhas_branco_por_extensao.values())
-    total_linhas_comentario = sum(linhas_comentario_por_extensao.values())
-    
-    # Calcular linhas de código (total - branco - comentário)
-    total_linhas_codigo = total_linhas - total_linhas_branco - total_linhas_comentario
+class WalkProgress:
+    """
+    Andamento do percurso, para uma barra de progresso enquanto a varredura roda.
 
-    # Criar tabela de resumo
-    summary_table = Table(title=None)
-    summary_table.add_column("Metric", style="cyan")
-    summary_table.add_column("Value", style="green")
-    summary_table.add_column("Percentage", style="yellow")
-    
-    # Adicionar linhas à tabela de resumo com percentuais
-    summary_table.add_row("Total Files", f"{total_arquivos:,}", "100.0%")
-    summary_table.add_row("Total Lines", f"{total_linhas:,}", "100.0%")
-    
-    # Calcular percentuais para os tipos de linhas
-    blank_percent = (total_linhas_branco / total_linhas * 100) if total_linhas > 0 else 0
-    comment_percent = (total_linhas_comentario / total_linhas * 100) if total_linhas > 0 else 0
-    code_percent = (total_linhas_codigo / total_linhas * 100) if total_linhas > 0 else 0
-    
-    summary_table.add_row("Blank Lines", f"{total_linhas_branco:,}", f"{blank_percent:.1f}%")
-    summary_table.add_row("Comment Lines", f"{total_linhas_comentario:,}", f"{comment_percent:.1f}%")
-    summary_table.add_row("Code Lines", f"{total_linhas_codigo:,}", f"{code_percent:.1f}%")
-    summary_table.add_row("Total Size", f"{total_tamanho:.2f} Kbytes", "100.0%")
-    
-    # Criar painel de resumo
-    summary_panel = Panel(summary_table, title="Summary", border_style="white")
-    
-    # Criar tabela de estatísticas por extensão
-    stats_table = Table(title=None)
-    stats_table.add_column("File Type", style="cyan")
-    stats_table.add_column("Files", style="magenta")
-    stats_table.add_column("Total Lines", style="green")
-    stats_table.add_column("Size (KB)", style="blue")
-    stats_table.add_column("% of Files", style="yellow")
-    stats_table.add_column("Blank Lines", style="cyan")
+    O percurso acontece junto com a contagem, então o total de arquivos só é
+    conhecido quando ele termina; até lá estimativa() o projeta a partir dos
+    diretórios ainda pendentes. Com jobs > 1 os atributos são atualizados pela
+    thread do pool que gera os lotes, e podem ser lidos de qualquer thread.
+
+    Attributes:
+        arquivos (int): Arquivos encontrados até agora
+        diretorios (int): Diretórios já listados
+        pendentes (int): Diretórios encontrados e ainda não listados
+        concluido (bool): O percurso terminou, e arquivos é o total exato
+        total_anterior (int): Arquivos das raízes na última varredura, segundo o cache
+    """
+
+    def __init__(self):
+        self.arquivos = 0
+        self.diretorios = 0
+        self.pendentes = 0
+        self.concluido = False
+        self.total_anterior = 0
+
+    def estimativa(self):
+        """
+        Total de arquivos esperado.
+
+        Returns:
+            int: O total exato, se o percurso terminou; senão os arquivos
+            encontrados mais os diretórios pendentes vezes a média de arquivos por
+            diretório, ou total_anterior, se for maior
+        """
+        if self.concluido:
+            return self.arquivos
+        por_diretorio = self.arquivos / self.diretorios if self.diretorios else 0
+        return max(self.total_anterior, int(self.arquivos + self.pendentes * por_diretorio))
+
+def _percorrer(diretorio, walk_order='depth', exclusoes=None, progresso=None):
+    """
+    Percorre o diretório com os.scandir, lendo cada diretório uma única vez.
+
+    Com 'depth' os arquivos saem na mesma ordem do os.walk (os arquivos de um
+    diretório e depois cada subdiretório, recursivamente); com 'breadth' todos os
+    arquivos de um nível saem antes dos do nível seguinte. Como no os.walk, links
+    simbólicos para diretórios não são seguidos e diretórios ilegíveis são ignorados.
+
+    Args:
+        diretorio (str): Caminho do diretório raiz
+        walk_order (str): 'depth' (em profundidade) ou 'breadth' (em largura)
+        exclusoes (ExcludeRules ou None): Regras de poda; os diretórios excluídos
+            não são listados e os arquivos excluídos não são devolvidos
+        progresso (WalkProgress ou None): Recebe os diretórios listados e pendentes
+
+    Yields:
+        tuple: (entrada, caminho_relativo), onde entrada é o os.DirEntry do arquivo
+    """
+    if walk_order not in ORDENS_PERCURSO:
+        raise ValueError(f"Ordem de percurso inválida: {walk_order}")
+    em_profundidade = walk_order == 'depth'
+
+    # Cada pendente guarda o caminho do diretório, o prefixo relativo dos seus arquivos
+    # (montado uma vez por diretório em vez de um os.path.relpath por arquivo) e as
+    # regras dos .gitignore acima dele
+    pendentes = deque([(diretorio, '', ())])
+    while pendentes:
+        caminho, prefixo, gitignores = pendentes.pop() if em_profundidade else pendentes.popleft()
+        try:
+            with os.scandir(caminho) as iterador:
+                entradas = list(iterador)
+        except OSError:
+            continue
+
+        # As regras comparam caminhos separados por '/', em qualquer sistema
+        prefixo_regras = prefixo if os.sep == '/' else prefixo.replace(os.sep, '/')
+        if exclusoes is not None and exclusoes.gitignore:
+            for entrada in entradas:
+                if entrada.name == '.gitignore':
+                    gitignores = exclusoes.ler_gitignore(entrada.path, prefixo_regras, gitignores)
+                    break
+
+        subdiretorios = []
+        for entrada in entradas:
+            nome = entrada.name
+            try:
+                e_diretorio = entrada.is_dir()
+            except OSError:
+                e_diretorio = False
+            if exclusoes is not None and exclusoes.exclui(nome, prefixo_regras + nome, e_diretorio, gitignores):
+                if e_diretorio:
+                    exclusoes.skipped_dirs += 1
+                else:
+                    exclusoes.skipped_files += 1
+            elif not e_diretorio:
+                yield entrada, prefixo + nome
+            elif not entrada.is_symlink():
+                subdiretorios.append((entrada.path, prefixo + nome + os.sep, gitignores))
+
+        # Na pilha o primeiro subdiretório precisa ficar no topo
+        if em_profundidade:
+            subdiretorios.reverse()
+        pendentes.extend(subdiretorios)
+        if progresso is not None:
+            progresso.diretorios += 1
+            progresso.pendentes = len(pendentes)
+
+# Quantidade de arquivos enviados a cada tarefa do pool de processos
+TAMANHO_LOTE = 256
+
+def _gerar_lotes(diretorio, lotes_enviados, entradas_cache=None, walk_order='depth', exclusoes=None, perfil=None,
+                 pacotes=None, prefetch=None, progresso=None):
+    """
+    Percorre o diretório e agrupa os arquivos em lotes de TAMANHO_LOTE.
+
+    O stat de cada arquivo é feito uma única vez, pelo os.DirEntry, e serve tanto
+    para o tamanho quanto para a assinatura do cache.
+
+    Args:
+        diretorio (str): Caminho do diretório raiz
+        lotes_enviados (deque): Recebe, para cada lote, a lista de
+            (caminho_relativo, extensao, assinatura, em_cache), na ordem, para que o
+            resultado devolvido pelo pool possa ser casado com os caminhos
+        entradas_cache (dict ou None): Contagens carregadas do ScanCache; as
+            entradas encontradas são retiradas do dicionário, que ao final contém
+            apenas os arquivos que deixaram de existir
+        walk_order (str): Ordem de percurso, 'depth' ou 'breadth'
+        exclusoes (ExcludeRules ou None): Regras de poda do percurso
+        perfil (ScanProfile ou None): Recebe os tempos do percurso e dos stat
+        pacotes (list ou None): Recebe (caminho_completo, caminho_relativo) dos
+            pacotes encontrados, que ficam fora dos lotes
+        prefetch (IOPrefetch ou None): Faz os stat nas threads de I/O, à frente
+            do percurso
+        progresso (WalkProgress ou None): Recebe os arquivos encontrados e o
+            andamento do percurso
+
+    Yields:
+        list: Lista de (caminho_completo, extensao, tamanho_bytes, contagem_em_cache)
+    """
+    lote = []
+    tarefas = []
+    arquivos = _percorrer(diretorio, walk_order, exclusoes, progresso)
+    if perfil is not None:
+        arquivos = perfil.cronometrar(arquivos, 'walk')
+    if prefetch is not None:
+        arquivos = prefetch.antecipar_stat(arquivos)
+    for entrada, caminho_relativo in arquivos:
+        if pacotes is not None and e_pacote(entrada.name):
+            pacotes.append((entrada.path, caminho_relativo))
+            continue
+        extensao = os.path.splitext(entrada.name)[1].lower()
+        if not extensao:
+            extensao = "(sem extensão)"
+        caminho_completo = entrada.path
+
+        assinatura = em_cache = None
+        if perfil is not None:
+            inicio = time.perf_counter()
+        try:
+            st = entrada.stat()
+            tamanho = st.st_size
+            assinatura = (tamanho, st.st_mtime_ns)
+        except FileNotFoundError:
+            print(f"Arquivo não encontrado: {caminho_completo}")
+            tamanho = -1
+        except Exception as e:
+            print(f"Erro ao processar arquivo {caminho_completo}: {str(e)}")
+            tamanho = -1
+        if perfil is not None:
+            perfil.fases['stat'] += time.perf_counter() - inicio
+
+        # Arquivos com o mesmo tamanho e mtime da última varredura não são abertos
+        if entradas_cache is not None:
+            anterior = entradas_cache.pop(caminho_relativo, None)
+            if anterior is not None and anterior[:2] == assinatura:
+                em_cache = anterior[2:]
+
+        lote.append((caminho_relativo, extensao, assinatura, em_cache is not None))
+        tarefas.append((caminho_completo, extensao, tamanho, em_cache))
+        if progresso is not None:
+            progresso.arquivos += 1
+        if len(tarefas) == TAMANHO_LOTE:
+            lotes_enviados.append(lote)
+            yield tarefas
+            lote = []
+            tarefas = []
+    if tarefas:
+        lotes_enviados.append(lote)
+        yield tarefas
+
+def _processar_lote(lote, tempos=None, leituras=None, espera=None):
+    """
+    Processa um lote de arquivos.
+
+    Executada tanto no processo principal quanto nos processos do pool, para
+    que as duas formas de varredura produzam exatamente os mesmos totais.
+
+    Args:
+        lote (list): Lista de (caminho_completo, extensao, tamanho_bytes, contagem_em_cache),
+            onde tamanho_bytes vem do percurso (-1 se o stat falhou, e o arquivo é
+            ignorado) e contagem_em_cache é None ou (linhas, linhas_branco,
+            linhas_comentario) já conhecida, e o arquivo não é aberto
+        tempos (array ou None): Usado pelo --profile; recebe, para cada arquivo, os
+            segundos de abertura e leitura e os de classificação
+        leituras (iterator ou None): Leituras antecipadas (veja
+            _processar_lote_antecipado), uma para cada arquivo que é aberto, na ordem
+        espera (list ou None): Com leituras, espera[0] recebe a soma dos segundos
+            em que o classificador esperou por elas
+
+    Returns:
+        array: array('q') com (linhas, linhas_branco, linhas_comentario, tamanho_bytes)
+        de cada arquivo, na ordem do lote. Tamanho -1 indica que o arquivo falhou e
+        linhas -1 que ele é binário.
+    """
+    contagens = array('q')
+    for caminho_completo, extensao, tamanho, em_cache in lote:
+        antecipado = None
+        if leituras is not None and not em_cache and tamanho >= 0:
+            antecipado = next(leituras)
+            espera[0] += _aguardar(antecipado)
+        if em_cache:
+            linhas, linhas_branco, linhas_comentario = em_cache
+        elif tamanho >= 0 and tempos is not None:
+            inicio = time.perf_counter()
+            classificacao = [0.0]
+            contagem = process_file(caminho_completo, extensao, classificacao, antecipado)
+            linhas, linhas_branco, linhas_comentario = contagem if contagem is not None else (-1, 0, 0)
+            tempos.extend((time.perf_counter() - inicio - classificacao[0], classificacao[0]))
+            contagens.extend((linhas, linhas_branco, linhas_comentario, tamanho))
+            continue
+        elif tamanho >= 0:
+            # Processar o arquivo para contar linhas totais, em branco e de comentário
+            contagem = process_file(caminho_completo, extensao, antecipado=antecipado)
+            linhas, linhas_branco, linhas_comentario = contagem if contagem is not None else (-1, 0, 0)
+        else:
+            linhas = linhas_branco = linhas_comentario = 0
+        if tempos is not None:
+            tempos.extend((0.0, 0.0))
+        contagens.extend((linhas, linhas_branco, linhas_comentario, tamanho))
+    return contagens
+
+def _processar_lote_perfilado(lote):
+    """_processar_lote que também devolve o array de tempos de cada arquivo, para o --profile."""
+    tempos = array('d')
+    return _processar_lote(lote, tempos), tempos
+
+# Pools de threads de I/O por (pid, threads); cada processo do pool de varredura cria o seu,
+# e um processo filho não pode usar o herdado do pai, cujas threads não existem nele
+_EXECUTORES_IO = {}
+
+def _executor_io(threads):
+    """Pool de threads de I/O do processo atual, criado no primeiro uso."""
+    chave = (os.getpid(), threads)
+    executor = _EXECUTORES_IO.get(chave)
+    if executor is None:
+        executor = _EXECUTORES_IO[chave] = concurrent.futures.ThreadPoolExecutor(
+            threads, thread_name_prefix='contalinha-io')
+    return executor
+
+def _aguardar(futuro):
+    """Espera uma operação das threads de I/O e devolve os segundos de espera, zero se ela já terminou."""
+    if futuro.done():
+        return 0.0
+    inicio = time.perf_counter()
+    concurrent.futures.wait((futuro,))
+    return time.perf_counter() - inicio
+
+def _ler_inicio(caminho):
+    """
+    Abre um arquivo e lê o seu início, numa thread de I/O.
+
+    Arquivos binários param na amostra, como em process_file; os demais têm até
+    TAMANHO_ANTECIPADO bytes lidos.
+
+    Returns:
+        tuple: (f, inicio), com o arquivo aberto posicionado depois de inicio
+    """
+    f = open(caminho, 'rb')
+    try:
+        inicio = f.read(TAMANHO_AMOSTRA)
+        if len(inicio) == TAMANHO_AMOSTRA and not _e_binario(inicio):
+            inicio += f.read(TAMANHO_ANTECIPADO - TAMANHO_AMOSTRA)
+    except BaseException:
+        f.close()
+        raise
+    return f, inicio
+
+def _fechar_leitura(futuro):
+    """Fecha o arquivo de uma leitura antecipada, usada ou não; fechar de novo não tem efeito."""
+    if not futuro.cancelled() and futuro.exception() is None:
+        futuro.result()[0].close()
+
+def _stat_antecipado(entrada):
+    """Faz o stat de um os.DirEntry, que guarda o resultado; um erro se repete no stat do percurso, que o informa."""
+    try:
+        entrada.stat()
+    except OSError:
+        pass
+
+def _processar_lote_antecipado(lote, profundidade, threads, perfilado=False):
+    """
+    _processar_lote com a abertura e o início da leitura de cada arquivo feitos
+    pelas threads de I/O, até profundidade arquivos à frente do classificador.
+
+    Returns:
+        tuple: (resultado, espera, lidos), onde resultado é o de _processar_lote,
+        ou o de _processar_lote_perfilado com perfilado, espera são os segundos em
+        que o classificador esperou pelos dados e lidos o número de arquivos lidos
+    """
+    executor = _executor_io(threads)
+    caminhos = [caminho for caminho, _, tamanho, em_cache in lote if not em_cache and tamanho >= 0]
+    restantes = iter(caminhos)
+    pendentes = deque(executor.submit(_ler_inicio, caminho) for caminho in islice(restantes, profundidade))
+    entregue = [None]
+
+    def leituras():
+        while pendentes:
+            futuro = pendentes.popleft()
+            caminho = next(restantes, None)
+            if caminho is not None:
+                pendentes.append(executor.submit(_ler_inicio, caminho))
+            entregue[0] = futuro
+            yield futuro
+
+    espera = [0.0]
+    tempos = array('d') if perfilado else None
+    try:
+        contagens = _processar_lote(lote, tempos, leituras(), espera)
+    finally:
+        # Se o lote foi interrompido, as leituras que o classificador não usou têm arquivos
+        # abertos; as que ainda não começaram são canceladas e as demais fecham ao terminar
+        for futuro in (entregue[0], *pendentes):
+            if futuro is not None and not futuro.cancel():
+                futuro.add_done_callback(_fechar_leitura)
+    return (contagens if tempos is None else (contagens, tempos)), espera[0], len(caminhos)
+
+class IOPrefetch:
+    """
+    Leitura antecipada para sistemas de arquivos de rede (--prefetch).
+
+    Em NFS e SMB cada stat, open e read espera uma ida e volta ao servidor, e
+    processos a mais não reduzem essa latência. Com um IOPrefetch, threads de I/O
+    fazem os stat à frente do percurso e abrem e começam a ler os arquivos à frente
+    do classificador, e as esperas de vários arquivos se sobrepõem. Os totais são
+    os mesmos da varredura sem antecipação.
+
+    Attributes:
+        profundidade (int): Quantos arquivos são lidos, e quantos stat são feitos,
+            à frente de quem os consome; cada leitura guarda até TAMANHO_ANTECIPADO
+            bytes em memória
+        threads (int): Threads de I/O de cada processo da varredura
+        espera (float): Segundos em que o classificador esperou pelos dados,
+            somados entre os processos
+        espera_stat (float): Segundos em que o percurso esperou pelos stat
+        arquivos (int): Arquivos lidos pelas threads de I/O
+    """
+
+    def __init__(self, profundidade=32, threads=8):
+        if profundidade < 1 or threads < 1:
+            raise ValueError("A profundidade e o número de threads da leitura antecipada devem ser positivos")
+        self.profundidade = profundidade
+        self.threads = threads
+        self.espera = 0.0
+        self.espera_stat = 0.0
+        self.arquivos = 0
+
+    def processar(self, perfilado=False):
+        """Função de lote, para o pool de processos, que faz a leitura antecipada (veja _processar_lote_antecipado)."""
+        return partial(_processar_lote_antecipado, profundidade=self.profundidade, threads=self.threads,
+                       perfilado=perfilado)
+
+    def antecipar_stat(self, arquivos):
+        """
+        Faz o stat das entradas do percurso nas threads de I/O, até profundidade
+        entradas à frente.
+
+        Args:
+            arquivos (iterable): (os.DirEntry, caminho_relativo) de _percorrer
+
+        Yields:
+            tuple: As mesmas entradas, na ordem, com o stat já guardado no os.DirEntry
+        """
+        executor = _executor_io(self.threads)
+        pendentes = deque()
+        for item in arquivos:
+            pendentes.append((item, executor.submit(_stat_antecipado, item[0])))
+            if len(pendentes) > self.profundidade:
+                item, futuro = pendentes.popleft()
+                self.espera_stat += _aguardar(futuro)
+                yield item
+        while pendentes:
+            item, futuro = pendentes.popleft()
+            self.espera_stat += _aguardar(futuro)
+            yield item
+
+# Registro de um arquivo devolvido por iter_file_stats. tamanho está em bytes e é -1
+# quando o arquivo não pôde ser lido; arquivos binários têm extensao EXTENSAO_BINARIO
+# e nenhuma linha.
+FileStats = namedtuple('FileStats', ['caminho', 'extensao', 'tamanho', 'linhas', 'linhas_branco', 'linhas_comentario'])
+
+# Pacotes cujos membros são contados pelo --archives
+EXTENSOES_PACOTE = ('.zip', '.jar', '.war', '.ear', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+def e_pacote(caminho):
+    """Indica, pelo nome, se o arquivo é um pacote zip, jar ou tar cujos membros podem ser contados."""
+    return caminho.lower().endswith(EXTENSOES_PACOTE)
+
+# Erros de leitura de um pacote corrompido, truncado ou criptografado (RuntimeError vem
+# de membros zip criptografados)
+ERROS_PACOTE = (OSError, EOFError, RuntimeError, zlib.error, zipfile.BadZipFile, tarfile.TarError) + \
+    ((lzma.LZMAError,) if lzma is not None else ())
+
+def _membros_pacote(caminho):
+    """
+    Percorre os arquivos de um pacote sem extraí-lo.
+
+    Os pacotes zip são lidos pelo diretório central; os tar, comprimidos ou não,
+    em modo fluxo, do início ao fim.
+
+    Yields:
+        tuple: (nome, tamanho, abrir), com o nome separado por '/', o tamanho
+        descomprimido e uma função que abre o fluxo do conteúdo, válida só até o
+        próximo membro. Um erro ao abrir ou ler o fluxo afeta só aquele membro nos
+        pacotes zip; nos tar, o erro se repete ao buscar o próximo membro.
+    """
+    if caminho.lower().endswith(('.zip', '.jar', '.war', '.ear')):
+        with zipfile.ZipFile(caminho) as pacote:
+            for info in pacote.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size, partial(pacote.open, info)
+    else:
+        with tarfile.open(caminho, 'r|*') as pacote:
+            while True:
+                membro = pacote.next()
+                if membro is None:
+                    break
+                if membro.isfile():
+                    yield membro.name, membro.size, partial(pacote.extractfile, membro)
+                # No modo fluxo o tarfile guardaria todos os membros já lidos
+                pacote.members.clear()
+
+def iter_archive_file_stats(caminho, prefixo=None, exclusoes=None, perfil=None):
+    """
+    Conta os arquivos de um pacote zip, jar ou tar sem extraí-lo, devolvendo um
+    FileStats por membro.
+
+    Cada membro passa pelo mesmo classificador de process_file direto do fluxo
+    do pacote, um bloco de cada vez, e a memória usada não depende do tamanho do
+    pacote. Pacotes dentro do pacote são contados como binários.
+
+    Como em process_file, um membro que não pode ser lido é informado e contado
+    sem linhas, e a contagem segue com os demais. Um pacote que não pode ser
+    aberto é contado como um único arquivo binário, como sem --archives.
+
+    Args:
+        caminho (str): Arquivo do pacote
+        prefixo (str ou None): Caminho relativo do pacote nos registros; por
+            padrão, o nome do arquivo
+        exclusoes (ExcludeRules ou None): Regras de exclusão aplicadas aos caminhos
+            dentro do pacote
+        perfil (ScanProfile ou None): Recebe os tempos de leitura e classificação
+            de cada membro
+
+    Yields:
+        FileStats: Registro de cada membro, com caminho '<prefixo>!/<membro>'
+    """
+    if prefixo is None:
+        prefixo = os.path.basename(caminho)
+    diretorio_excluido = {'': False}
+    membros = 0
+    try:
+        for nome, tamanho, abrir in _membros_pacote(caminho):
+            membros += 1
+            # Pacotes tar criados com 'tar c .' prefixam todos os nomes com './'
+            while nome.startswith('./'):
+                nome = nome[2:]
+            if exclusoes is not None and _excluido_por_caminho(nome, exclusoes, diretorio_excluido):
+                continue
+            extensao = os.path.splitext(nome.rpartition('/')[2])[1].lower() or "(sem extensão)"
+            if perfil is not None:
+                inicio = time.perf_counter()
+            classificacao = [0.0] if perfil is not None else None
+            try:
+                with abrir() as fluxo:
+                    contagem = _contar_fluxo(fluxo, extensao, classificacao)
+            except ERROS_PACOTE as e:
+                print(f"Erro ao processar {prefixo}!/{nome}: {str(e)}")
+                contagem = (0, 0, 0)
+            linhas, linhas_branco, linhas_comentario = contagem if contagem is not None else (0, 0, 0)
+            if contagem is None:
+                extensao = EXTENSAO_BINARIO
+            caminho_membro = f"{prefixo}!/{nome}"
+            if perfil is not None:
+                perfil.registrar_arquivo(caminho_membro, extensao, tamanho, linhas,
+                                         time.perf_counter() - inicio - classificacao[0], classificacao[0])
+            yield FileStats(caminho_membro, extensao, tamanho, linhas, linhas_branco, linhas_comentario)
+    except ERROS_PACOTE as e:
+        print(f"Erro ao processar {caminho}: {str(e)}")
+        if membros == 0:
+            try:
+                tamanho = os.path.getsize(caminho)
+            except OSError:
+                tamanho = -1
+            yield FileStats(prefixo, EXTENSAO_BINARIO, tamanho, 0, 0, 0)
+
+class FileDetails:
+    """
+    Detalhes por arquivo de uma varredura, guardados em colunas compactas.
+
+    Em vez de uma tupla com strings e números por arquivo, cada contagem fica numa
+    coluna array, a extensão e o diretório são códigos de tabelas em que cada valor
+    aparece uma única vez, e os nomes dos arquivos ficam concatenados num único
+    buffer de bytes. Um arquivo custa algumas dezenas de bytes, e os detalhes de
+    árvores com milhões de arquivos cabem em memória.
+
+    Para quem lê, o objeto se comporta como a antiga lista de detalhes: len(),
+    índices e iteração devolvem tuplas (caminho_relativo, extensao, tamanho_kb,
+    linhas, linhas_branco, linhas_comentario, billable_lines), montadas na hora.
+    """
+
+    # Colunas aceitas por sort
+    COLUNAS = ('caminho', 'extensao', 'tamanho', 'linhas', 'linhas_branco', 'linhas_comentario',
+               'linhas_codigo', 'billable_lines')
+
+    def __init__(self):
+        self._diretorios = []
+        self._codigos_diretorio = {}
+        self._extensoes = []
+        self._codigos_extensao = {}
+        self._nomes = bytearray()
+        self._fim_nome = array('q')
+        self._diretorio = array('i')
+        self._extensao = array('i')
+        self._tamanho = array('q')
+        self._linhas = array('q')
+        self._linhas_branco = array('q')
+        self._linhas_comentario = array('q')
+
+    def append(self, caminho, extensao, tamanho, linhas, linhas_branco, linhas_comentario):
+        """
+        Acrescenta um arquivo.
+
+        Args:
+            caminho (str): Caminho relativo do arquivo
+            extensao (str): Extensão (ou grupo) do arquivo
+            tamanho (int): Tamanho em bytes
+            linhas (int): Total de linhas
+            linhas_branco (int): Linhas em branco
+            linhas_comentario (int): Linhas de comentário
+        """
+        diretorio, separador, nome = caminho.rpartition(os.sep)
+        diretorio += separador
+        codigo = self._codigos_diretorio.get(diretorio)
+        if codigo is None:
+            codigo = self._codigos_diretorio[diretorio] = len(self._diretorios)
+            self._diretorios.append(diretorio)
+        self._diretorio.append(codigo)
+
+        codigo = self._codigos_extensao.get(extensao)
+        if codigo is None:
+            codigo = self._codigos_extensao[extensao] = len(self._extensoes)
+            self._extensoes.append(extensao)
+        self._extensao.append(codigo)
+
+        # surrogateescape preserva nomes que não são UTF-8 válido
+        self._nomes += nome.encode('utf-8', 'surrogateescape')
+        self._fim_nome.append(len(self._nomes))
+        self._tamanho.append(tamanho)
+        self._linhas.append(linhas)
+        self._linhas_branco.append(linhas_branco)
+        self._linhas_comentario.append(linhas_comentario)
+
+    def __len__(self):
+        return len(self._tamanho)
+
+    def _caminho(self, i):
+        inicio = self._fim_nome[i - 1] if i else 0
+        nome = self._nomes[inicio:self._fim_nome[i]].decode('utf-8', 'surrogateescape')
+        return self._diretorios[self._diretorio[i]] + nome
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("índice fora dos detalhes")
+        linhas = self._linhas[i]
+        linhas_branco = self._linhas_branco[i]
+        return (self._caminho(i), self._extensoes[self._extensao[i]], round(self._tamanho[i] / 1024, 2),
+                linhas, linhas_branco, self._linhas_comentario[i], linhas - linhas_branco)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _chave(self, coluna):
+        """Função que devolve o valor de ordenação da coluna para o índice de um arquivo."""
+        if coluna == 'caminho':
+            return self._caminho
+        if coluna == 'extensao':
+            extensoes, codigos = self._extensoes, self._extensao
+            return lambda i: extensoes[codigos[i]]
+        if coluna == 'linhas_codigo':
+            return lambda i: self._linhas[i] - self._linhas_branco[i] - self._linhas_comentario[i]
+        if coluna == 'billable_lines':
+            return lambda i: self._linhas[i] - self._linhas_branco[i]
+        if coluna in self.COLUNAS:
+            return getattr(self, '_' + coluna).__getitem__
+        raise ValueError(f"Coluna inválida: {coluna}")
+
+    def sort(self, coluna, reverse=False):
+        """
+        Ordena os arquivos por uma das COLUNAS, reorganizando todas as colunas.
+
+        A ordenação é estável: arquivos empatados mantêm a ordem anterior.
+
+        Args:
+            coluna (str): Nome da coluna
+            reverse (bool): Ordem decrescente
+        """
+        ordem = sorted(range(len(self)), key=self._chave(coluna), reverse=reverse)
+        nomes = bytearray()
+        fim_nome = array('q')
+        fim_anterior = self._fim_nome
+        for i in ordem:
+            nomes += self._nomes[fim_anterior[i - 1] if i else 0:fim_anterior[i]]
+            fim_nome.append(len(nomes))
+        self._nomes = nomes
+        self._fim_nome = fim_nome
+        for atributo in ('_diretorio', '_extensao', '_tamanho', '_linhas', '_linhas_branco', '_linhas_comentario'):
+            coluna_atual = getattr(self, atributo)
+            setattr(self, atributo, array(coluna_atual.typecode, (coluna_atual[i] for i in ordem)))
+
+    def write_csv(self, csvwriter):
+        """Escreve uma linha da seção de arquivos do CSV para cada arquivo, na ordem atual."""
+        for detalhe in self:
+            csvwriter.writerow(_linha_csv_arquivo(detalhe))
+
+class ScanProfile:
+    """
+    Tempos de uma varredura, coletados com --profile.
+
+    fases soma os segundos de cada fase: 'walk' (listagem dos diretórios e regras
+    de exclusão), 'stat', 'open_read' (abertura e leitura dos arquivos),
+    'classification' (contagem e classificação das linhas), 'csv' e 'render'
+    (painéis do rich). Com jobs > 1 as fases de leitura e classificação são somadas
+    entre os processos e podem passar do tempo total da varredura.
+
+    Sem --profile nenhum ScanProfile é criado e a varredura não mede nada.
+    """
+
+    FASES = ('walk', 'stat', 'open_read', 'classification', 'csv', 'render')
+
+    def __init__(self, top=10):
+        self.top = top
+        self.fases = dict.fromkeys(self.FASES, 0.0)
+        self.total = 0.0
+        # extensao -> [arquivos, bytes, linhas, segundos], só dos arquivos lidos
+        self.por_extensao = defaultdict(lambda: [0, 0, 0, 0.0])
+        self._mais_lentos = []
+        self._ordem = 0
+
+    def cronometrar(self, iteravel, fase):
+        """Repassa os itens do iterável somando à fase o tempo gasto para obter cada um."""
+        iterador = iter(iteravel)
+        while True:
+            inicio = time.perf_counter()
+            try:
+                item = next(iterador)
+            except StopIteration:
+                self.fases[fase] += time.perf_counter() - inicio
+                return
+            self.fases[fase] += time.perf_counter() - inicio
+            yield item
+
+    def cronometrar_chamadas(self, funcao, fase):
+        """Envolve a função para que o tempo de cada chamada seja somado à fase."""
+        def cronometrada(*args):
+            inicio = time.perf_counter()
+            funcao(*args)
+            self.fases[fase] += time.perf_counter() - inicio
+        return cronometrada
+
+    def registrar_arquivo(self, caminho, extensao, tamanho, linhas, leitura, classificacao):
+        """Registra os tempos de um arquivo lido do disco."""
+        self.fases['open_read'] += leitura
+        self.fases['classification'] += classificacao
+        segundos = leitura + classificacao
+        if extensao == EXTENSAO_BINARIO:
+            # De um arquivo binário só a amostra inicial é lida
+            tamanho = min(tamanho, TAMANHO_AMOSTRA)
+        totais = self.por_extensao[extensao]
+        totais[0] += 1
+        totais[1] += tamanho
+        totais[2] += linhas
+        totais[3] += segundos
+        if self.top > 0:
+            # A ordem de chegada desempata tempos iguais sem comparar os caminhos
+            self._ordem += 1
+            item = (segundos, -self._ordem, caminho, extensao, tamanho, linhas)
+            if len(self._mais_lentos) < self.top:
+                heapq.heappush(self._mais_lentos, item)
+            else:
+                heapq.heappushpop(self._mais_lentos, item)
+
+    def mais_lentos(self):
+        """Os arquivos mais lentos, do mais lento para o mais rápido, como (segundos, caminho, extensao, tamanho, linhas)."""
+        return [(segundos, caminho, extensao, tamanho, linhas)
+                for segundos, _, caminho, extensao, tamanho, linhas in sorted(self._mais_lentos, reverse=True)]
+
+    def as_dict(self):
+        """Resultado em dicionário, no formato gravado no JSON do --profile."""
+        extensoes = {}
+        for extensao, (arquivos, tamanho, linhas, segundos) in sorted(self.por_extensao.items()):
+            extensoes[extensao] = {
+                'files': arquivos, 'bytes': tamanho, 'lines': linhas, 'seconds': segundos,
+                'bytes_per_s': tamanho / segundos if segundos > 0 else None,
+                'lines_per_s': linhas / segundos if segundos > 0 else None,
+            }
+        return {
+            'total_seconds': self.total,
+            'phases': dict(self.fases),
+            'extensions': extensoes,
+            'slowest_files': [{'path': caminho, 'extension': extensao, 'seconds': segundos, 'bytes': tamanho, 'lines': linhas}
+                              for segundos, caminho, extensao, tamanho, linhas in self.mais_lentos()],
+        }
+
+def iter_file_stats(diretorio, jobs=1, cache=None, walk_order='depth', exclusoes=None, perfil=None, archives=False,
+                    prefetch=None, pool=None, progresso=None):
+    """
+    Percorre um diretório devolvendo um FileStats por arquivo, à medida que os
+    arquivos são processados.
+
+    Os registros saem na ordem do percurso, também com jobs > 1. Quem consome
+    pode filtrar, encadear ou parar a qualquer momento; ao fechar o gerador o pool
+    de processos é encerrado. reduce_file_stats reduz os registros aos totais por
+    extensão. Se diretorio é um pacote zip, jar ou tar, os seus membros são
+    contados (veja iter_archive_file_stats).
+
+    Args:
+        diretorio (str): Caminho do diretório raiz
+        jobs (int): Número de processos usados na varredura
+        cache (ScanCache ou None): Cache incremental. As contagens novas são
+            gravadas quando o gerador termina ou é fechado; os arquivos que deixaram
+            de existir só são removidos quando a varredura chega ao fim.
+        walk_order (str): Ordem de percurso, 'depth' ou 'breadth'
+        exclusoes (ExcludeRules ou None): Regras de poda do percurso
+        perfil (ScanProfile ou None): Recebe os tempos de cada fase e de cada arquivo
+        archives (bool): Conta os membros dos pacotes encontrados no percurso, no
+            processo principal e depois dos demais arquivos, em vez de contar cada
+            pacote como um arquivo binário
+        prefetch (IOPrefetch ou None): Antecipa os stat e as leituras em threads de
+            I/O; prefetch.espera, prefetch.espera_stat e prefetch.arquivos são
+            atualizados
+        pool (multiprocessing.Pool ou None): Pool de processos já criado, usado no
+            lugar de um novo, qualquer que seja jobs; ele não é encerrado ao fim
+        progresso (WalkProgress ou None): Acompanha o percurso, para uma barra de
+            progresso; os pacotes contados com archives não entram nele
+
+    Yields:
+        FileStats: Registro de cada arquivo
+    """
+    registros = iter_roots_file_stats([diretorio], jobs, cache, walk_order, exclusoes, perfil, archives, prefetch,
+                                      pool, progresso)
+    try:
+        for _, registro in registros:
+            yield registro
+    finally:
+        registros.close()
+
+def iter_roots_file_stats(raizes, jobs=1, cache=None, walk_order='depth', exclusoes=None, perfil=None,
+                          archives=False, prefetch=None, pool=None, progresso=None):
+    """
+    Percorre vários diretórios com um único pool de processos, devolvendo um
+    FileStats por arquivo junto com a raiz a que ele pertence.
+
+    Os lotes de todas as raízes vão para o mesmo pool, um após o outro, e os
+    processos não ficam ociosos enquanto uma raiz pequena termina. Os registros
+    saem na ordem de raizes e, dentro de cada raiz, na ordem de iter_file_stats.
+
+    Args:
+        raizes (list): Diretórios, ou pacotes, a serem percorridos
+        jobs, cache, walk_order, exclusoes, perfil, archives, prefetch, pool, progresso: Como em iter_file_stats
+
+    Yields:
+        tuple: (indice, registro), com o índice da raiz em raizes e o FileStats
+    """
+    entradas_cache = [None] * len(raizes)
+    novos_no_cache = [[] for _ in raizes]
+    pacotes = [[] for _ in raizes]
+    # Raízes anteriores a esta já tiveram todos os registros devolvidos
+    proxima = 0
+
+    lotes_enviados = deque()
+
+    def gerar_lotes():
+        for indice, raiz in enumerate(raizes):
+            if os.path.isfile(raiz) and e_pacote(raiz):
+                pacotes[indice].append((raiz, os.path.basename(raiz)))
+                continue
+            entradas_cache[indice] = cache.load(raiz) if cache else None
+            if progresso is not None and entradas_cache[indice]:
+                progresso.total_anterior += len(entradas_cache[indice])
+            enviados = deque()
+            for lote in _gerar_lotes(raiz, enviados, entradas_cache[indice], walk_order, exclusoes, perfil,
+                                     pacotes[indice] if archives else None, prefetch, progresso):
+                lotes_enviados.append((indice, enviados.popleft()))
+                yield lote
+        if progresso is not None:
+            progresso.concluido = True
+
+    def registros_pacotes(indice):
+        for caminho_completo, caminho_relativo in pacotes[indice]:
+            for registro in iter_archive_file_stats(caminho_completo, caminho_relativo, exclusoes, perfil):
+                yield indice, registro
+
+    if prefetch is not None:
+        processar = prefetch.processar(perfil is not None)
+    else:
+        processar = _processar_lote if perfil is None else _processar_lote_perfilado
+    proprio = pool is None and jobs > 1
+    if proprio:
+        pool = multiprocessing.Pool(jobs)
+    try:
+        resultados = pool.imap(processar, gerar_lotes()) if pool else map(processar, gerar_lotes())
+
+        for contagens in resultados:
+            if prefetch is not None:
+                contagens, espera, lidos = contagens
+                prefetch.espera += espera
+                prefetch.arquivos += lidos
+            if perfil is not None:
+                contagens, tempos = contagens
+            indice, lote = lotes_enviados.popleft()
+            # Os pacotes de uma raiz saem depois de todos os outros arquivos dela; quando chega o
+            # primeiro lote da raiz seguinte, o percurso da anterior já terminou
+            while proxima < indice:
+                yield from registros_pacotes(proxima)
+                proxima += 1
+            for i, (caminho_relativo, extensao, assinatura, veio_do_cache) in enumerate(lote):
+                linhas, linhas_branco, linhas_comentario, tamanho = contagens[4 * i:4 * i + 4]
+
+                if cache and tamanho >= 0:
+                    if veio_do_cache:
+                        cache.hits += 1
+                    else:
+                        cache.misses += 1
+                        if assinatura:
+                            novos_no_cache[indice].append((caminho_relativo,) + assinatura +
+                                                          (linhas, linhas_branco, linhas_comentario))
+
+                if linhas < 0:
+                    # Arquivos binários só têm o tamanho contado, num grupo próprio
+                    extensao = EXTENSAO_BINARIO
+                    linhas = 0
+                if perfil is not None and tamanho >= 0 and not veio_do_cache:
+                    perfil.registrar_arquivo(caminho_relativo, extensao, tamanho, linhas, tempos[2 * i], tempos[2 * i + 1])
+                yield indice, FileStats(caminho_relativo, extensao, tamanho, linhas, linhas_branco, linhas_comentario)
+        while proxima < len(raizes):
+            yield from registros_pacotes(proxima)
+            proxima += 1
+    finally:
+        if proprio:
+            pool.terminate()
+        if cache:
+            for indice, raiz in enumerate(raizes):
+                if entradas_cache[indice] is None:
+                    continue
+                # O que sobrou das entradas carregadas são arquivos que não existem mais, mas
+                # numa varredura interrompida eles podem apenas não ter sido alcançados
+                cache.store(raiz, novos_no_cache[indice], entradas_cache[indice] if indice < proxima else ())
+
+def _executar_git(repositorio, *argumentos):
+    """
+    Executa um comando do git no repositório e devolve a saída.
+
+    Raises:
+        ValueError: Se o git não está disponível ou o comando falha
+    """
+    try:
+        return subprocess.run(['git', '-C', repositorio, *argumentos], capture_output=True, check=True).stdout
+    except FileNotFoundError:
+        raise ValueError("git não encontrado no PATH")
+    except subprocess.CalledProcessError as e:
+        raise ValueError(f"Falha no git {argumentos[0]}: {e.stderr.decode(errors='replace').strip()}")
+
+def _listar_revisao_git(repositorio, revisao):
+    """
+    Lista os arquivos de uma revisão com git ls-tree, sem checkout.
+
+    Como no git, a listagem se limita ao diretório informado quando ele é um
+    subdiretório do repositório. Submódulos e links simbólicos são ignorados.
+
+    Yields:
+        tuple: (caminho, sha, tamanho), com o caminho relativo separado por '/'
+
+    Raises:
+        ValueError: Se o git não está disponível ou a revisão não existe
+    """
+    for registro in _executar_git(repositorio, 'ls-tree', '-r', '-l', '-z', revisao).split(b'\0'):
+        if not registro:
+            continue
+        cabecalho, _, caminho = registro.partition(b'\t')
+        modo, tipo, sha, tamanho = cabecalho.split()
+        if tipo != b'blob' or modo == b'120000':
+            continue
+        yield os.fsdecode(caminho), sha.decode('ascii'), int(tamanho)
+
+def _mudancas_git(repositorio, desde, ate=None):
+    """
+    Lista os arquivos alterados desde uma revisão, com git diff --name-status.
+
+    Renomeações aparecem como uma remoção e uma adição. Sem ate a comparação é
+    com a árvore de trabalho, e os arquivos não versionados (e não ignorados)
+    também são considerados alterados.
+
+    Args:
+        repositorio (str): Repositório git, ou um subdiretório dele, ao qual a
+            listagem se limita
+        desde (str): Revisão de referência
+        ate (str ou None): Revisão final
+
+    Returns:
+        tuple: (alterados, removidos), listas de caminhos relativos separados por '/'
+
+    Raises:
+        ValueError: Se o git não está disponível ou uma revisão não existe
+    """
+    argumentos = ['diff', '--name-status', '-z', '--no-renames', '--relative', desde]
+    if ate is not None:
+        argumentos.append(ate)
+    campos = _executar_git(repositorio, *argumentos).split(b'\0')
+    alterados = []
+    removidos = []
+    for situacao, caminho in zip(campos[0::2], campos[1::2]):
+        (removidos if situacao == b'D' else alterados).append(os.fsdecode(caminho))
+    if ate is None:
+        nao_versionados = _executar_git(repositorio, 'ls-files', '--others', '--exclude-standard', '-z')
+        alterados.extend(os.fsdecode(caminho) for caminho in nao_versionados.split(b'\0') if caminho)
+    return alterados, removidos
+
+def _excluido_por_caminho(caminho, exclusoes, diretorio_excluido):
+    """
+    Aplica as regras de exclusão a um caminho listado pelo git ou dentro de um pacote.
+
+    Cada diretório é avaliado uma vez; como no percurso, só o diretório excluído
+    mais alto é contado em exclusoes.skipped_dirs.
+
+    Args:
+        caminho (str): Caminho relativo separado por '/'
+        exclusoes (ExcludeRules): Regras de exclusão por nome e caminho
+        diretorio_excluido (dict): Decisões já tomadas para cada diretório,
+            compartilhado entre as chamadas e iniciado com {'': False}
+
+    Returns:
+        bool: True se o arquivo ou um diretório acima dele é excluído
+    """
+    diretorio, _, nome = caminho.rpartition('/')
+    if diretorio not in diretorio_excluido:
+        partes = diretorio.split('/')
+        for fim in range(1, len(partes) + 1):
+            atual = '/'.join(partes[:fim])
+            if atual not in diretorio_excluido:
+                pai = '/'.join(partes[:fim - 1])
+                excluido = diretorio_excluido[pai] or exclusoes.exclui(partes[fim - 1], atual, True)
+                if excluido and not diretorio_excluido[pai]:
+                    exclusoes.skipped_dirs += 1
+                diretorio_excluido[atual] = excluido
+    if diretorio_excluido[diretorio]:
+        return True
+    if exclusoes.exclui(nome, caminho, False):
+        exclusoes.skipped_files += 1
+        return True
+    return False
+
+def _ler_blobs(repositorio, shas):
+    """
+    Lê o conteúdo de blobs com um único git cat-file --batch.
+
+    Os SHAs são escritos por uma thread enquanto as respostas são lidas, para que
+    nenhum dos dois lados fique bloqueado com o pipe cheio.
+
+    Args:
+        repositorio (str): Diretório do repositório
+        shas (list): SHAs dos blobs, na ordem em que serão consumidos
+
+    Yields:
+        bytes: Conteúdo de cada blob, na ordem de shas
+    """
+    processo = subprocess.Popen(['git', '-C', repositorio, 'cat-file', '--batch'],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def escrever():
+        try:
+            for sha in shas:
+                processo.stdin.write(sha.encode('ascii') + b'\n')
+            processo.stdin.close()
+        except OSError:
+            pass  # O git terminou antes; a leitura informa o erro
+
+    escritor = threading.Thread(target=escrever, daemon=True)
+    escritor.start()
+    try:
+        for sha in shas:
+            cabecalho = processo.stdout.readline().split()
+            if len(cabecalho) != 3:
+                raise ValueError(f"Blob {sha} não encontrado pelo git cat-file")
+            conteudo = processo.stdout.read(int(cabecalho[2]))
+            processo.stdout.read(1)  # Quebra de linha depois do conteúdo
+            yield conteudo
+    finally:
+        if processo.poll() is None:
+            processo.kill()
+        processo.stdout.close()
+        processo.wait()
+        escritor.join()
+
+def iter_git_file_stats(repositorio, revisao, cache=None, exclusoes=None, perfil=None, caminhos=None):
+    """
+    Percorre os arquivos de uma revisão de um repositório git, sem checkout,
+    devolvendo um FileStats por arquivo.
+
+    Os blobs são lidos com git cat-file --batch e contados pelo mesmo
+    classificador da varredura de diretórios. Cada par (SHA do blob, extensão)
+    é lido uma única vez: arquivos idênticos na revisão e blobs já contados em
+    outras revisões, quando há cache, não são lidos de novo.
+
+    Args:
+        repositorio (str): Repositório git, ou um subdiretório dele
+        revisao (str): Commit, tag ou branch
+        cache (ScanCache ou None): Cache das contagens por blob. cache.hits conta
+            os arquivos que não precisaram ser lidos.
+        exclusoes (ExcludeRules ou None): Regras de exclusão por nome e caminho;
+            os .gitignore não são consultados, pois só arquivos versionados são listados
+        perfil (ScanProfile ou None): Recebe os tempos da listagem, da leitura e da
+            classificação de cada blob
+        caminhos (set ou None): Conta só estes caminhos relativos, separados por '/'
+
+    Yields:
+        FileStats: Registro de cada arquivo, na ordem do git ls-tree
+
+    Raises:
+        ValueError: Se o git não está disponível ou a revisão não existe
+    """
+    if perfil is not None:
+        inicio = time.perf_counter()
+    arquivos = []
+    diretorio_excluido = {'': False}
+    for caminho, sha, tamanho in _listar_revisao_git(repositorio, revisao):
+        if caminhos is not None and caminho not in caminhos:
+            continue
+        if exclusoes is not None and _excluido_por_caminho(caminho, exclusoes, diretorio_excluido):
+            continue
+        extensao = os.path.splitext(caminho.rpartition('/')[2])[1].lower() or "(sem extensão)"
+        arquivos.append((caminho if os.sep == '/' else caminho.replace('/', os.sep), extensao, sha, tamanho))
+    if perfil is not None:
+        perfil.fases['walk'] += time.perf_counter() - inicio
+
+    contagens = cache.load_blobs((sha, extensao) for _, extensao, sha, _ in arquivos) if cache else {}
+    # Um blob é pedido ao git na primeira vez que aparece com cada extensão
+    pedidos = []
+    pedidos_vistos = set(contagens)
+    for _, extensao, sha, _ in arquivos:
+        if (sha, extensao) not in pedidos_vistos:
+            pedidos_vistos.add((sha, extensao))
+            pedidos.append(sha)
+
+    novos_no_cache = []
+    blobs = _ler_blobs(repositorio, pedidos)
+    try:
+        for caminho_relativo, extensao, sha, tamanho in arquivos:
+            contagem = contagens.get((sha, extensao))
+            if contagem is None:
+                if perfil is not None:
+                    inicio = time.perf_counter()
+                    classificacao = [0.0]
+                    conteudo = next(blobs)
+                    leitura = time.perf_counter() - inicio
+                    contagem = _contar_conteudo(conteudo, extensao, classificacao) or (-1, 0, 0)
+                else:
+                    contagem = _contar_conteudo(next(blobs), extensao) or (-1, 0, 0)
+                contagens[(sha, extensao)] = contagem
+                novos_no_cache.append((sha, extensao) + contagem)
+                if cache:
+                    cache.misses += 1
+                lido = True
+            else:
+                if cache:
+                    cache.hits += 1
+                lido = False
+
+            linhas, linhas_branco, linhas_comentario = contagem
+            if linhas < 0:
+                # Blobs binários só têm o tamanho contado, num grupo próprio
+                extensao = EXTENSAO_BINARIO
+                linhas = 0
+            if perfil is not None and lido:
+                perfil.registrar_arquivo(caminho_relativo, extensao, tamanho, linhas, leitura, classificacao[0])
+            yield FileStats(caminho_relativo, extensao, tamanho, linhas, linhas_branco, linhas_comentario)
+    finally:
+        blobs.close()
+        if cache:
+            cache.store_blobs(novos_no_cache)
+
+def reduce_file_stats(registros, on_file=None, detalhes=None):
+    """
+    Reduz registros FileStats aos totais por extensão.
+
+    Args:
+        registros (iterable): Registros de iter_file_stats, possivelmente filtrados
+        on_file (callable ou None): Recebe o detalhe de cada arquivo em vez de ele
+            ser guardado na lista de detalhes
+        detalhes (FileDetails ou None): Recebe os detalhes no lugar de um
+            FileDetails novo, como uma subclasse com consultas próprias
+
+    Returns:
+        tuple: Os mesmos 12 valores devolvidos por contar_arquivos_e_linhas.
+    """
+
+    total_arquivos = 0
+    total_linhas = 0
+    detalhes_arquivos = FileDetails() if detalhes is None else detalhes
+    
+    # Conjunto para rastrear extensões não reconhecidas
+    extensoes_nao_reconhecidas = set()
+    arquivos_nao_reconhecidos = 0
+    linhas_nao_reconhecidas = 0
+    
+    # Dicionários para contar arquivos e linhas por extensão
+    arquivos_por_extensao = defaultdict(int)
+    linhas_por_extensao = defaultdict(int)
+    linhas_branco_por_extensao = defaultdict(int)
+    linhas_comentario_por_extensao = defaultdict(int)
+    tamanho_por_extensao = defaultdict(float)
+    # Tamanhos somados em bytes (inteiros) para que a ordem de soma não altere o total
+    bytes_por_extensao = defaultdict(int)
+
+    # Processar os arquivos e coletar informações
+    for caminho_relativo, extensao, tamanho, linhas, linhas_branco, linhas_comentario in registros:
+        total_arquivos += 1
+        total_linhas += linhas
+        arquivos_por_extensao[extensao] += 1
+        linhas_por_extensao[extensao] += linhas
+        linhas_branco_por_extensao[extensao] += linhas_branco
+        linhas_comentario_por_extensao[extensao] += linhas_comentario
+
+        # Verificar se a extensão é reconhecida
+        if extensao not in COMMENT_SYNTAX and extensao != EXTENSAO_BINARIO:
+            extensoes_nao_reconhecidas.add(extensao)
+            arquivos_nao_reconhecidos += 1
+            linhas_nao_reconhecidas += linhas
+
+        if tamanho < 0:
+            continue
+
+        bytes_por_extensao[extensao] += tamanho
+        if on_file is None:
+            detalhes_arquivos.append(caminho_relativo, extensao, tamanho, linhas, linhas_branco, linhas_comentario)
+        else:
+            billable_lines_file = linhas - linhas_branco
+            on_file((caminho_relativo, extensao, round(tamanho / 1024, 2), linhas, linhas_branco, linhas_comentario, billable_lines_file))
+
+    for extensao, tamanho in bytes_por_extensao.items():
+        tamanho_por_extensao[extensao] = tamanho / 1024  # tamanho em Kbytes
+    total_tamanho = sum(bytes_por_extensao.values()) / 1024
+
+    # Não ordenar por tamanho para manter a ordem original de processamento
+    # detalhes_arquivos.sort(key=lambda x: x[2], reverse=True)
+
+    return (total_arquivos, total_linhas, total_tamanho, detalhes_arquivos, 
+            arquivos_por_extensao, linhas_por_extensao, tamanho_por_extensao,
+            linhas_branco_por_extensao, linhas_comentario_por_extensao,
+            extensoes_nao_reconhecidas, arquivos_nao_reconhecidos, linhas_nao_reconhecidas)
+
+def contar_arquivos_e_linhas(diretorio, jobs=1, cache=None, walk_order='depth', exclusoes=None, on_file=None,
+                             perfil=None, git_rev=None, archives=False, prefetch=None, pool=None):
+    """Conta os arquivos, linhas e tamanho em um diretório dado.
+
+    Args:
+        diretorio (str): Caminho completo do diretório.
+        jobs (int): Número de processos usados na varredura. Com 1 os arquivos
+            são processados no próprio processo; com mais de 1 os lotes de
+            arquivos são distribuídos em um pool de processos.
+        cache (ScanCache ou None): Cache incremental; os arquivos inalterados
+            desde a última varredura não são abertos, e as contagens novas são
+            gravadas ao final. cache.hits e cache.misses são atualizados.
+        walk_order (str): Ordem de percurso dos diretórios: 'depth' (em
+            profundidade, a mesma do os.walk) ou 'breadth' (em largura).
+        exclusoes (ExcludeRules ou None): Regras de poda; diretórios excluídos não
+            são percorridos. exclusoes.skipped_dirs e exclusoes.skipped_files são
+            atualizados.
+        on_file (callable ou None): Recebe o detalhe de cada arquivo assim que ele
+            é concluído. Quando informado, os detalhes não são guardados e a lista
+            devolvida fica vazia, então a memória usada depende só do número de
+            extensões.
+        perfil (ScanProfile ou None): Recebe os tempos de cada fase, a vazão por
+            extensão e os arquivos mais lentos; perfil.total recebe a duração da
+            varredura.
+        git_rev (str ou None): Conta os arquivos desta revisão do repositório git
+            em diretorio, lidos do git sem checkout (veja iter_git_file_stats); jobs
+            e walk_order não se aplicam.
+        archives (bool): Conta os membros dos pacotes zip, jar e tar encontrados
+            (veja iter_file_stats)
+        prefetch (IOPrefetch ou None): Leitura antecipada em threads de I/O, para
+            sistemas de arquivos de rede; não se aplica com git_rev.
+        pool (multiprocessing.Pool ou None): Pool de processos já criado, usado no
+            lugar de um novo (veja iter_file_stats); não se aplica com git_rev.
+
+    Returns:
+        int: Número total de arquivos.
+        int: Número total de linhas em todos os arquivos.
+        int: Tamanho total dos arquivos em Kbytes.
+        FileDetails: Detalhes dos arquivos (vazio quando on_file é informado).
+        dict: Contagem de arquivos por extensão.
+        dict: Contagem de linhas por extensão.
+        dict: Tamanho por extensão.
+        dict: Contagem de linhas em branco por extensão.
+        dict: Contagem de linhas de comentário por extensão.
+    """
+    if git_rev is not None:
+        registros = iter_git_file_stats(diretorio, git_rev, cache, exclusoes, perfil)
+    else:
+        registros = iter_file_stats(diretorio, jobs, cache, walk_order, exclusoes, perfil, archives, prefetch, pool)
+    if perfil is None:
+        return reduce_file_stats(registros, on_file)
+    inicio = time.perf_counter()
+    if on_file is not None:
+        on_file = perfil.cronometrar_chamadas(on_file, 'csv')
+    resultado = reduce_file_stats(registros, on_file)
+    perfil.total += time.perf_counter() - inicio
+    return resultado
+
+def combinar_resultados(resultados):
+    """
+    Soma os resultados de várias varreduras, extensão a extensão.
+
+    Args:
+        resultados (list): Tuplas de 12 valores de contar_arquivos_e_linhas
+
+    Returns:
+        tuple: Os mesmos 12 valores, somados; os detalhes por arquivo ficam com
+        cada resultado, e o FileDetails combinado é vazio.
+    """
+    por_extensao = [defaultdict(int), defaultdict(int), defaultdict(float), defaultdict(int), defaultdict(int)]
+    extensoes_nao_reconhecidas = set()
+    for resultado in resultados:
+        for combinado, dicionario in zip(por_extensao, resultado[4:9]):
+            for ext, valor in dicionario.items():
+                combinado[ext] += valor
+        extensoes_nao_reconhecidas.update(resultado[9])
+    (arquivos_por_extensao, linhas_por_extensao, tamanho_por_extensao,
+     linhas_branco_por_extensao, linhas_comentario_por_extensao) = por_extensao
+    return (sum(resultado[0] for resultado in resultados), sum(resultado[1] for resultado in resultados),
+            sum(resultado[2] for resultado in resultados), FileDetails(),
+            arquivos_por_extensao, linhas_por_extensao, tamanho_por_extensao,
+            linhas_branco_por_extensao, linhas_comentario_por_extensao,
+            extensoes_nao_reconhecidas, sum(resultado[10] for resultado in resultados),
+            sum(resultado[11] for resultado in resultados))
+
+def contar_raizes(raizes, jobs=1, cache=None, walk_order='depth', exclusoes=None, archives=False, prefetch=None):
+    """
+    Conta vários diretórios numa única varredura, com um único pool de processos.
+
+    Args:
+        raizes (list): Diretórios, ou pacotes, a serem contados
+        jobs, cache, walk_order, exclusoes, archives, prefetch: Como em contar_arquivos_e_linhas
+
+    Returns:
+        tuple: (resultados, combinado), onde resultados tem os 12 valores de
+        contar_arquivos_e_linhas de cada raiz, na ordem de raizes, e combinado é a
+        soma deles (veja combinar_resultados), sem as raízes repetidas ou contidas
+        em outra (veja raizes_sobrepostas), cujos arquivos já estão na soma
+    """
+    resultados = [None] * len(raizes)
+    registros = iter_roots_file_stats(raizes, jobs, cache, walk_order, exclusoes, archives=archives, prefetch=prefetch)
+    for indice, grupo in groupby(registros, key=itemgetter(0)):
+        resultados[indice] = reduce_file_stats(registro for _, registro in grupo)
+    # Raízes sem nenhum arquivo não aparecem nos registros
+    resultados = [resultado or reduce_file_stats(()) for resultado in resultados]
+    sobrepostas = raizes_sobrepostas(raizes)
+    return resultados, combinar_resultados([resultado for indice, resultado in enumerate(resultados)
+                                            if indice not in sobrepostas])
+
+def raizes_sobrepostas(raizes):
+    """
+    Encontra as raízes cujos arquivos já fazem parte de outra raiz da lista.
+
+    Os caminhos são comparados depois de os.path.realpath. Uma raiz é sobreposta
+    quando repete uma raiz anterior ou está dentro de outra raiz, anterior ou
+    posterior.
+
+    Args:
+        raizes (list): Diretórios, ou pacotes
+
+    Returns:
+        dict: índice da raiz sobreposta -> raiz que já a contém
+    """
+    reais = [os.path.realpath(raiz) for raiz in raizes]
+    sobrepostas = {}
+    for indice, real in enumerate(reais):
+        for outro, real_outro in enumerate(reais):
+            if outro == indice:
+                continue
+            if real == real_outro:
+                if outro < indice:
+                    sobrepostas[indice] = raizes[outro]
+                    break
+            elif real.startswith(real_outro.rstrip(os.sep) + os.sep):
+                sobrepostas[indice] = raizes[outro]
+                break
+    return sobrepostas
+
+def ler_manifesto(caminho):
+    """
+    Lê um manifesto de raízes para o --roots-file.
+
+    Há um caminho por linha; linhas vazias e iniciadas por '#' são ignoradas, e
+    caminhos relativos são relativos ao diretório do manifesto.
+
+    Returns:
+        list: Caminhos das raízes, na ordem do manifesto
+    """
+    base = os.path.dirname(os.path.abspath(caminho))
+    with open(caminho, encoding='utf-8') as f:
+        linhas = [linha.strip() for linha in f]
+    return [os.path.join(base, os.path.expanduser(linha)) for linha in linhas if linha and not linha.startswith('#')]
+
+CABECALHO_RESUMO_CSV = ["Extensão", "Arquivos", "Linhas", "Tamanho (KB)", "Linhas em Branco", "Linhas de Comentário", "Linhas de Código", "Billable Lines"]
+CABECALHO_DETALHES_CSV = ["Relative Path", "File Type", "File Size (Kbytes)", "Total of Lines", "Blank Lines", "Comment Lines", "Code Lines", "Billable Lines"]
+
+def _escrever_resumo_csv(csvwriter, extensoes, arquivos_por_extensao, linhas_por_extensao, tamanho_por_extensao,
+                         linhas_branco_por_extensao, linhas_comentario_por_extensao):
+    """Escreve a seção de estatísticas por extensão do CSV, na ordem de extensoes."""
+    csvwriter.writerow(["Estatísticas por extensão"])
+    csvwriter.writerow(CABECALHO_RESUMO_CSV)
+
+    for ext in extensoes:
+        linhas_codigo = linhas_por_extensao[ext] - linhas_branco_por_extensao[ext] - linhas_comentario_por_extensao[ext]
+        billable_lines_ext = linhas_por_extensao[ext] - linhas_branco_por_extensao[ext]
+        csvwriter.writerow([
+            ext, 
+            arquivos_por_extensao[ext], 
+            linhas_por_extensao[ext], 
+            round(tamanho_por_extensao[ext], 2),
+            linhas_branco_por_extensao[ext],
+            linhas_comentario_por_extensao[ext],
+            linhas_codigo,
+            billable_lines_ext
+        ])
+
+# Última linha de um resultado: o início da varredura, em ISO 8601 e em nanossegundos desde a
+# época, com que o --delta sem --since reconhece os arquivos modificados depois dela
+MARCA_INICIO_CSV = "Início da varredura"
+
+def _escrever_inicio_csv(csvwriter, inicio_ns):
+    """Escreve, depois de uma linha em branco, a linha com o início da varredura."""
+    csvwriter.writerow([])
+    csvwriter.writerow([MARCA_INICIO_CSV,
+                        datetime.datetime.fromtimestamp(inicio_ns / 1e9).isoformat(timespec='seconds'), inicio_ns])
+
+CABECALHO_RAIZES_CSV = ["Raiz", "Arquivos", "Linhas", "Tamanho (KB)", "Linhas em Branco", "Linhas de Comentário", "Linhas de Código", "Billable Lines", "Resultado"]
+
+def _escrever_resultado_csv(caminho, resultado, inicio_ns=None):
+    """
+    Grava um resultado no CSV de uma varredura: estatísticas por extensão, os
+    arquivos e, com inicio_ns, o início da varredura.
+    """
+    arquivos_por_extensao = resultado[4]
+    extensoes = sorted(arquivos_por_extensao, key=lambda ext: arquivos_por_extensao[ext], reverse=True)
+    with open(caminho, 'w', newline='', encoding='utf-8') as f:
+        csvwriter = csv.writer(f)
+        _escrever_resumo_csv(csvwriter, extensoes, *resultado[4:9])
+        csvwriter.writerow([])
+        csvwriter.writerow(CABECALHO_DETALHES_CSV)
+        resultado[3].write_csv(csvwriter)
+        if inicio_ns is not None:
+            _escrever_inicio_csv(csvwriter, inicio_ns)
+
+def _linha_csv_arquivo(detalhe):
+    """Converte o detalhe de um arquivo na linha da seção de arquivos do CSV."""
+    caminho, ext, tamanho, linhas, linhas_branco, linhas_comentario, billable_lines_file = detalhe
+    linhas_codigo = linhas - linhas_branco - linhas_comentario
+    return [caminho, ext, tamanho, linhas, linhas_branco, linhas_comentario, linhas_codigo, billable_lines_file]
+
+def ler_resultado_csv(caminho):
+    """
+    Lê a seção de arquivos de um CSV gravado pelo contalinha, com ou sem --stream-csv.
+
+    Args:
+        caminho (str): Arquivo CSV
+
+    Returns:
+        dict: caminho relativo -> FileStats, na ordem do CSV. O tamanho em bytes é
+        reconstruído dos Kbytes do CSV, arredondados a duas casas.
+
+    Raises:
+        ValueError: Se o arquivo não tem a seção de arquivos
+    """
+    return _ler_resultado_csv(caminho)[0]
+
+def _ler_resultado_csv(caminho):
+    """
+    Lê a seção de arquivos e o início da varredura de um CSV gravado pelo contalinha.
+
+    Returns:
+        tuple: (registros, inicio_ns), com os registros de ler_resultado_csv e o
+        início da varredura em nanossegundos, ou None se o CSV não o registra
+
+    Raises:
+        ValueError: Se o arquivo não tem a seção de arquivos
+    """
+    registros = {}
+    inicio_ns = None
+    secao = None
+    with open(caminho, newline='', encoding='utf-8') as f:
+        for linha in csv.reader(f):
+            if linha == CABECALHO_DETALHES_CSV:
+                secao = 'arquivos'
+            elif secao == 'arquivos' and not linha:
+                # No --stream-csv as estatísticas por extensão vêm depois dos arquivos
+                secao = 'fim'
+            elif secao == 'arquivos':
+                caminho_relativo, extensao, tamanho, linhas, linhas_branco, linhas_comentario = linha[:6]
+                registros[caminho_relativo] = FileStats(caminho_relativo, extensao, round(float(tamanho) * 1024),
+                                                        int(linhas), int(linhas_branco), int(linhas_comentario))
+            elif len(linha) >= 3 and linha[0] == MARCA_INICIO_CSV:
+                inicio_ns = int(linha[2])
+    if secao is None:
+        raise ValueError(f"{caminho} não tem a seção de arquivos de um resultado do contalinha")
+    return registros, inicio_ns
+
+def _contar_arquivos_alterados(diretorio, caminhos):
+    """
+    Conta os arquivos indicados de um diretório, sem percorrê-lo.
+
+    Args:
+        diretorio (str): Caminho do diretório raiz
+        caminhos (iterable): Caminhos relativos dos arquivos
+
+    Returns:
+        dict: caminho relativo -> FileStats, só dos arquivos que existem. Um
+        arquivo que some antes de ser lido, ou durante a leitura, fica de fora,
+        como um arquivo removido
+    """
+    lote = []
+    for caminho_relativo in caminhos:
+        caminho_completo = os.path.join(diretorio, caminho_relativo)
+        try:
+            if not os.path.isfile(caminho_completo):
+                continue
+            tamanho = os.path.getsize(caminho_completo)
+        except OSError:
+            # Removido entre o isfile e o getsize
+            continue
+        extensao = os.path.splitext(caminho_relativo)[1].lower() or "(sem extensão)"
+        lote.append((caminho_relativo, caminho_completo, extensao, tamanho))
+
+    contagens = _processar_lote([(caminho_completo, extensao, tamanho, None)
+                                 for _, caminho_completo, extensao, tamanho in lote])
+    registros = {}
+    for i, (caminho_relativo, caminho_completo, extensao, _) in enumerate(lote):
+        if not os.path.isfile(caminho_completo):
+            # Sumiu depois do stat: process_file já informou o erro, e a contagem não vale
+            continue
+        linhas, linhas_branco, linhas_comentario, tamanho = contagens[4 * i:4 * i + 4]
+        if linhas < 0:
+            extensao = EXTENSAO_BINARIO
+            linhas = 0
+        registros[caminho_relativo] = FileStats(caminho_relativo, extensao, tamanho, linhas, linhas_branco,
+                                                linhas_comentario)
+    return registros
+
+def contar_delta(diretorio, anterior, desde=None, git_rev=None, cache=None, exclusoes=None, on_file=None):
+    """
+    Atualiza um resultado anterior processando só os arquivos alterados.
+
+    Os arquivos adicionados ou modificados são contados de novo, os removidos
+    saem do resultado e os demais vêm do CSV anterior sem serem abertos. Com
+    desde, as alterações vêm do git diff; sem ele, são alterados os arquivos
+    novos, os de tamanho diferente e os modificados a partir do início da
+    varredura registrado no CSV anterior, o que exige percorrer o diretório,
+    mas não ler os arquivos. Um CSV que não registra o início da varredura tem
+    todos os arquivos contados de novo.
+
+    O CSV guarda os tamanhos em Kbytes com duas casas; os arquivos que não são
+    recontados têm o tamanho exato lido do percurso, do git ou de um stat, e os
+    totais são os mesmos de uma varredura nova. As diferenças de tamanho por
+    extensão têm a precisão do CSV anterior.
+
+    Args:
+        diretorio (str): Caminho do diretório raiz, ou do repositório git
+        anterior (str): CSV de um resultado anterior do mesmo diretório
+        desde (str ou None): Revisão git em que o resultado anterior foi gerado
+        git_rev (str ou None): Revisão git do novo resultado; sem ela, a árvore de
+            trabalho. Exige desde.
+        cache (ScanCache ou None): Cache das contagens por blob, com git_rev
+        exclusoes (ExcludeRules ou None): Regras de exclusão aplicadas aos arquivos alterados
+        on_file (callable ou None): Como em reduce_file_stats
+
+    Returns:
+        tuple: (resultado, delta_por_extensao, alteracoes), onde resultado são os
+        mesmos 12 valores devolvidos por contar_arquivos_e_linhas,
+        delta_por_extensao é um dicionário extensão -> [arquivos, linhas,
+        linhas_branco, linhas_comentario, bytes] com as diferenças em relação ao
+        resultado anterior e alteracoes conta os arquivos 'adicionados',
+        'modificados' e 'removidos'.
+
+    Raises:
+        ValueError: Se o CSV anterior não é um resultado do contalinha ou o git falha
+    """
+    registros, inicio_anterior = _ler_resultado_csv(anterior)
+    if desde is not None:
+        alterados, removidos = _mudancas_git(diretorio, desde, git_rev)
+        if exclusoes is not None:
+            # Alterados que agora estão excluídos saem do resultado, como os removidos
+            diretorio_excluido = {'': False}
+            excluidos = {caminho for caminho in alterados
+                         if _excluido_por_caminho(caminho, exclusoes, diretorio_excluido)}
+            if excluidos:
+                removidos = removidos + [caminho for caminho in alterados if caminho in excluidos]
+                alterados = [caminho for caminho in alterados if caminho not in excluidos]
+        if git_rev is not None:
+            novos = {registro.caminho: registro for registro in
+                     iter_git_file_stats(diretorio, git_rev, cache, caminhos=set(alterados))}
+            # Os arquivos inalterados têm na nova revisão o mesmo blob de desde
+            tamanhos = {caminho.replace('/', os.sep): tamanho
+                        for caminho, _, tamanho in _listar_revisao_git(diretorio, desde)}
+        else:
+            # Os arquivos inalterados da árvore de trabalho têm o tamanho lido por um stat
+            tamanhos = None
+        if os.sep != '/':
+            alterados = [caminho.replace('/', os.sep) for caminho in alterados]
+            removidos = [caminho.replace('/', os.sep) for caminho in removidos]
+        if git_rev is None:
+            novos = _contar_arquivos_alterados(diretorio, alterados)
+    elif git_rev is not None:
+        raise ValueError("O delta de uma revisão git precisa da revisão do resultado anterior (--since)")
+    else:
+        if inicio_anterior is None:
+            print(f"{anterior} não registra o início da varredura; todos os arquivos serão contados de novo")
+        existentes = set()
+        alterados = []
+        tamanhos = {}
+        for entrada, caminho_relativo in _percorrer(diretorio, exclusoes=exclusoes):
+            existentes.add(caminho_relativo)
+            registro = registros.get(caminho_relativo)
+            try:
+                st = entrada.stat()
+            except OSError:
+                continue
+            tamanhos[caminho_relativo] = st.st_size
+            # Um arquivo gravado durante a varredura anterior pode ter sido lido antes da gravação
+            if (registro is None or inicio_anterior is None or st.st_mtime_ns >= inicio_anterior
+                    or round(st.st_size / 1024, 2) != round(registro.tamanho / 1024, 2)):
+                alterados.append(caminho_relativo)
+        removidos = [caminho for caminho in registros if caminho not in existentes]
+        novos = _contar_arquivos_alterados(diretorio, alterados)
+
+    delta_por_extensao = defaultdict(lambda: [0, 0, 0, 0, 0])
+    alteracoes = {'adicionados': 0, 'modificados': 0, 'removidos': 0}
+
+    def acumular(registro, sinal):
+        delta = delta_por_extensao[registro.extensao]
+        delta[0] += sinal
+        delta[1] += sinal * registro.linhas
+        delta[2] += sinal * registro.linhas_branco
+        delta[3] += sinal * registro.linhas_comentario
+        # Na precisão do CSV anterior, para que um arquivo só renomeado não mude de tamanho
+        delta[4] += sinal * round(round(registro.tamanho / 1024, 2) * 1024)
+
+    # Alterados que não puderam ser contados (apagados ou excluídos) também saem do resultado
+    for caminho in set(removidos).union(alterados).difference(novos):
+        registro = registros.pop(caminho, None)
+        if registro is not None:
+            acumular(registro, -1)
+            alteracoes['removidos'] += 1
+    for caminho, registro in novos.items():
+        if caminho in registros:
+            acumular(registros[caminho], -1)
+            alteracoes['modificados'] += 1
+        else:
+            alteracoes['adicionados'] += 1
+        acumular(registro, 1)
+        registros[caminho] = registro
+
+    for caminho, registro in registros.items():
+        if caminho in novos:
+            continue
+        if tamanhos is not None:
+            tamanho = tamanhos.get(caminho)
+        else:
+            try:
+                tamanho = os.path.getsize(os.path.join(diretorio, caminho))
+            except OSError:
+                tamanho = None
+        if tamanho is not None and tamanho != registro.tamanho:
+            registros[caminho] = registro._replace(tamanho=tamanho)
+
+    resultado = reduce_file_stats(registros.values(), on_file)
+    return resultado, dict(delta_por_extensao), alteracoes
+
+# Eventos do inotify (linux/inotify.h) usados pelo TreeWatcher
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+class _Inotify:
+    """Acesso mínimo ao inotify do Linux pela libc, com ctypes."""
+
+    MASCARA = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+
+    def adicionar(self, caminho):
+        """Observa um diretório e devolve o descritor do watch."""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(caminho), self.MASCARA)
+        if wd < 0:
+            erro = ctypes.get_errno()
+            raise OSError(erro, os.strerror(erro), caminho)
+        return wd
+
+    def remover(self, wd):
+        """Deixa de observar um diretório; o kernel pode já ter removido o watch."""
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def ler(self, timeout):
+        """
+        Espera eventos por até timeout segundos.
+
+        Returns:
+            list: (wd, mascara, nome) de cada evento, vazia se nada aconteceu
+        """
+        prontos, _, _ = select.select([self.fd], [], [], timeout)
+        if not prontos:
+            return []
+        dados = os.read(self.fd, 64 * 1024)
+        eventos = []
+        pos = 0
+        # struct inotify_event: int wd; uint32 mask, cookie, len; char name[len]
+        while pos < len(dados):
+            wd, mascara, _, tamanho = struct.unpack_from('iIII', dados, pos)
+            nome = dados[pos + 16:pos + 16 + tamanho].rstrip(b'\0')
+            eventos.append((wd, mascara, os.fsdecode(nome)))
+            pos += 16 + tamanho
+        return eventos
+
+    def close(self):
+        os.close(self.fd)
+
+class TreeWatcher:
+    """
+    Mantém os totais de um diretório atualizados enquanto os arquivos mudam.
+
+    Depois de uma varredura inicial, as contagens de cada arquivo e de cada
+    extensão ficam em memória, e cada alteração reprocessa só o arquivo afetado.
+    No Linux as alterações vêm do inotify; nos demais sistemas, ou quando o
+    inotify não pode ser usado, de um percurso periódico que compara o tamanho e
+    o mtime dos arquivos sem abri-los. Os totais podem ser lidos a qualquer
+    momento, de qualquer thread.
+
+    Attributes:
+        diretorio (str): Diretório observado
+        exclusoes (ExcludeRules ou None): Regras de exclusão, aplicadas também aos
+            arquivos e diretórios criados depois da varredura inicial
+        intervalo (float): Segundos entre os percursos da verificação periódica
+        on_change (callable ou None): Recebe (adicionados, modificados, removidos)
+            depois de cada lote de alterações aplicado
+        modo (str): 'inotify' ou 'polling', definido por scan
+    """
+
+    # Espera por mais eventos antes de processar um lote, para agrupar as gravações de um salvamento
+    ESPERA_LOTE = 0.2
+
+    def __init__(self, diretorio, exclusoes=None, intervalo=2.0, on_change=None):
+        self.diretorio = diretorio
+        self.exclusoes = exclusoes
+        self.intervalo = intervalo
+        self.on_change = on_change
+        self.modo = None
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._registros = {}
+        self._por_extensao = defaultdict(lambda: [0, 0, 0, 0, 0])
+        self._assinaturas = {}
+        self._inotify = None
+        # wd -> caminho relativo do diretório, e caminho relativo -> (wd, regras dos .gitignore)
+        self._watches = {}
+        self._diretorios = {}
+        # Argumentos de scan, reaproveitados quando a varredura inicial é refeita
+        self._jobs = 1
+        self._cache = None
+
+    def scan(self, jobs=1, cache=None):
+        """
+        Faz a varredura inicial e passa a registrar as alterações.
+
+        Os watches do inotify (ou as assinaturas da verificação periódica) são
+        obtidos antes das contagens, para que um arquivo alterado durante a
+        varredura seja reprocessado depois dela.
+
+        Args:
+            jobs (int): Número de processos usados na varredura inicial
+            cache (ScanCache ou None): Cache incremental da varredura inicial
+        """
+        self._jobs = jobs
+        self._cache = cache
+        try:
+            self._inotify = _Inotify()
+            self._observar(self.diretorio, '', ())
+            self.modo = 'inotify'
+        except (OSError, AttributeError, TypeError):
+            # Fora do Linux não há inotify na libc; no Linux o limite de watches pode ter sido atingido
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+            self._watches.clear()
+            self._diretorios.clear()
+            self._assinaturas = self._assinar()
+            self.modo = 'polling'
+
+        with self._trava:
+            self._registros.clear()
+            self._por_extensao.clear()
+            for registro in iter_file_stats(self.diretorio, jobs, cache, exclusoes=self.exclusoes):
+                if registro.tamanho >= 0:
+                    self._registros[registro.caminho] = registro
+                    self._acumular(registro, 1)
+
+    def totals(self):
+        """
+        Totais atuais, sem esperar nenhuma varredura.
+
+        Returns:
+            dict: 'arquivos', 'linhas', 'linhas_branco', 'linhas_comentario', 'bytes'
+            e 'por_extensao', um dicionário extensão -> [arquivos, linhas,
+            linhas_branco, linhas_comentario, bytes]
+        """
+        with self._trava:
+            por_extensao = {ext: list(valores) for ext, valores in self._por_extensao.items() if valores[0]}
+        totais = [sum(coluna) for coluna in zip(*por_extensao.values())] or [0, 0, 0, 0, 0]
+        return dict(zip(('arquivos', 'linhas', 'linhas_branco', 'linhas_comentario', 'bytes'), totais),
+                    por_extensao=por_extensao)
+
+    def records(self):
+        """Cópia dos registros FileStats atuais, para reduce_file_stats ou um CSV."""
+        with self._trava:
+            return list(self._registros.values())
+
+    def run(self):
+        """Aplica as alterações até stop ser chamado."""
+        while not self._parar.is_set():
+            if self._inotify is not None:
+                self._processar_eventos()
+            elif not self._parar.wait(self.intervalo):
+                atuais = self._assinar()
+                alterados = [caminho for caminho, assinatura in atuais.items()
+                             if self._assinaturas.get(caminho) != assinatura]
+                alterados.extend(caminho for caminho in self._assinaturas if caminho not in atuais)
+                self._assinaturas = atuais
+                self._atualizar(alterados)
+
+    def start(self):
+        """Executa run numa thread em segundo plano."""
+        self._parar.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Interrompe run e libera o inotify."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _acumular(self, registro, sinal):
+        valores = self._por_extensao[registro.extensao]
+        valores[0] += sinal
+        valores[1] += sinal * registro.linhas
+        valores[2] += sinal * registro.linhas_branco
+        valores[3] += sinal * registro.linhas_comentario
+        valores[4] += sinal * registro.tamanho
+
+    def _assinar(self):
+        """Percorre o diretório e devolve caminho relativo -> (tamanho, mtime_ns), sem abrir os arquivos."""
+        assinaturas = {}
+        for entrada, caminho_relativo in _percorrer(self.diretorio, exclusoes=self.exclusoes):
+            try:
+                st = entrada.stat()
+            except OSError:
+                continue
+            assinaturas[caminho_relativo] = (st.st_size, st.st_mtime_ns)
+        return assinaturas
+
+    def _observar(self, caminho, relativo, gitignores):
+        """
+        Observa um diretório e os subdiretórios não excluídos.
+
+        Returns:
+            list: Caminhos relativos dos arquivos não excluídos encontrados
+        """
+        arquivos = []
+        pendentes = [(caminho, relativo, gitignores)]
+        while pendentes:
+            caminho, relativo, gitignores = pendentes.pop()
+            # O watch vem antes da listagem, para que nada criado entre as duas se perca
+            try:
+                wd = self._inotify.adicionar(caminho)
+                with os.scandir(caminho) as iterador:
+                    entradas = list(iterador)
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+            prefixo = relativo + os.sep if relativo else ''
+            prefixo_regras = prefixo if os.sep == '/' else prefixo.replace(os.sep, '/')
+            if self.exclusoes is not None and self.exclusoes.gitignore:
+                for entrada in entradas:
+                    if entrada.name == '.gitignore':
+                        gitignores = self.exclusoes.ler_gitignore(entrada.path, prefixo_regras, gitignores)
+                        break
+            self._watches[wd] = relativo
+            self._diretorios[relativo] = (wd, gitignores)
+            for entrada in entradas:
+                try:
+                    e_diretorio = entrada.is_dir() and not entrada.is_symlink()
+                except OSError:
+                    continue
+                if self._excluido(relativo, entrada.name, e_diretorio):
+                    continue
+                if e_diretorio:
+                    pendentes.append((entrada.path, prefixo + entrada.name, gitignores))
+                else:
+                    arquivos.append(prefixo + entrada.name)
+        return arquivos
+
+    def _excluido(self, diretorio, nome, e_diretorio):
+        """Aplica as regras de exclusão a uma entrada de um diretório observado."""
+        if self.exclusoes is None:
+            return False
+        caminho = os.path.join(diretorio, nome)
+        if os.sep != '/':
+            caminho = caminho.replace(os.sep, '/')
+        return self.exclusoes.exclui(nome, caminho, e_diretorio, self._diretorios[diretorio][1])
+
+    def _esquecer(self, diretorio):
+        """Deixa de observar um diretório removido ou movido e tudo abaixo dele."""
+        prefixo = diretorio + os.sep
+        for relativo in [d for d in self._diretorios if d == diretorio or d.startswith(prefixo)]:
+            wd, _ = self._diretorios.pop(relativo)
+            if self._watches.pop(wd, None) is not None:
+                self._inotify.remover(wd)
+        return [caminho for caminho in self._registros if caminho.startswith(prefixo)]
+
+    def _processar_eventos(self):
+        """Lê um lote de eventos do inotify e atualiza os arquivos afetados."""
+        eventos = self._inotify.ler(0.5)
+        if not eventos:
+            return
+        while True:
+            mais = self._inotify.ler(self.ESPERA_LOTE)
+            if not mais:
+                break
+            eventos.extend(mais)
+
+        alterados = set()
+        for wd, mascara, nome in eventos:
+            if mascara & IN_Q_OVERFLOW:
+                # Eventos foram perdidos: só uma nova varredura garante os totais
+                self._recomecar()
+                return
+            if mascara & IN_IGNORED:
+                diretorio = self._watches.pop(wd, None)
+                if diretorio is not None:
+                    self._diretorios.pop(diretorio, None)
+                continue
+            diretorio = self._watches.get(wd)
+            if diretorio is None or not nome:
+                continue
+            caminho = os.path.join(diretorio, nome)
+            if mascara & IN_ISDIR:
+                if mascara & (IN_DELETE | IN_MOVED_FROM):
+                    alterados.update(self._esquecer(caminho))
+                elif not self._excluido(diretorio, nome, True):
+                    try:
+                        alterados.update(self._observar(os.path.join(self.diretorio, caminho), caminho,
+                                                        self._diretorios[diretorio][1]))
+                    except OSError:
+                        self._recomecar()
+                        return
+            elif not self._excluido(diretorio, nome, False):
+                alterados.add(caminho)
+        self._atualizar(alterados)
+
+    def _recomecar(self):
+        """Refaz a varredura inicial, depois de eventos perdidos."""
+        for wd in list(self._watches):
+            self._inotify.remover(wd)
+        self._inotify.close()
+        self._inotify = None
+        self._watches.clear()
+        self._diretorios.clear()
+        self.scan(self._jobs, self._cache)
+        if self.on_change is not None:
+            self.on_change(0, 0, 0)
+
+    def _atualizar(self, caminhos):
+        """Reprocessa os arquivos indicados; os que não existem mais saem dos totais."""
+        if not caminhos:
+            return
+        novos = _contar_arquivos_alterados(self.diretorio, caminhos)
+        adicionados = modificados = removidos = 0
+        with self._trava:
+            for caminho in caminhos:
+                anterior = self._registros.pop(caminho, None)
+                if anterior is not None:
+                    self._acumular(anterior, -1)
+                novo = novos.get(caminho)
+                if novo is not None:
+                    self._registros[caminho] = novo
+                    self._acumular(novo, 1)
+                if anterior is None and novo is not None:
+                    adicionados += 1
+                elif novo is None and anterior is not None:
+                    removidos += 1
+                elif novo is not None:
+                    modificados += 1
+        if self.on_change is not None and (adicionados or modificados or removidos):
+            self.on_change(adicionados, modificados, removidos)
+
+class ScanService:
+    """
+    Resultados de varreduras mantidos em memória entre as consultas do --serve.
+
+    Cada diretório é varrido na primeira consulta e o resultado é reaproveitado
+    até ficar mais velho que ttl segundos; a nova varredura usa o cache
+    incremental e só relê os arquivos alterados. Consultas simultâneas ao mesmo
+    diretório esperam uma única varredura.
+
+    Com jobs > 1 o pool de processos é criado uma única vez, no construtor, e
+    compartilhado por todas as varreduras: as consultas chegam em threads, e criar
+    um pool a cada consulta faria um fork de um processo com várias threads, que
+    pode travar se outra thread segura uma trava nesse momento. O serviço deve,
+    portanto, ser criado antes das threads que o consultam, e encerrado com close.
+
+    Attributes:
+        jobs (int): Número de processos do pool compartilhado
+        cache_path (str ou None): Arquivo do ScanCache compartilhado pelas varreduras
+        cache_max_entries (int ou None): Como em ScanCache
+        walk_order (str): Ordem de percurso
+        exclusoes (ExcludeRules ou None): Modelo das regras de exclusão; cada
+            varredura usa uma cópia, com contadores próprios
+        archives (bool): Conta os membros dos pacotes encontrados
+        ttl (float): Segundos em que um resultado é servido sem nova varredura
+        max_results (int): Máximo de diretórios mantidos em memória; os consultados
+            há mais tempo são descartados primeiro
+    """
+
+    def __init__(self, jobs=1, cache_path=None, cache_max_entries=None, walk_order='depth', exclusoes=None,
+                 archives=False, ttl=60.0, max_results=16):
+        self.jobs = jobs
+        self.cache_path = cache_path
+        self.cache_max_entries = cache_max_entries
+        self.walk_order = walk_order
+        self.exclusoes = exclusoes
+        self.archives = archives
+        self.ttl = ttl
+        self.max_results = max_results
+        self._trava = threading.Lock()
+        self._resultados = OrderedDict()
+        # diretório -> [trava, consultas que a seguram ou esperam por ela]; a trava é descartada
+        # quando a última consulta termina, e nunca enquanto outra pode usá-la
+        self._travas_diretorio = {}
+        self._pool = multiprocessing.Pool(jobs) if jobs > 1 else None
+
+    def close(self):
+        """Encerra o pool de processos compartilhado."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def result(self, diretorio, refresh=False):
+        """
+        Devolve o resultado de um diretório, varrendo-o se necessário.
+
+        Args:
+            diretorio (str): Diretório, ou pacote, a ser contado
+            refresh (bool): Varre de novo mesmo que o resultado em memória seja recente
+
+        Returns:
+            dict: 'resultado' (os 12 valores de contar_arquivos_e_linhas),
+            'escaneado_em' (time.time() do fim da varredura), 'duracao' e 'cache'
+            (acertos e falhas do cache incremental nessa varredura)
+        """
+        diretorio = os.path.abspath(diretorio)
+        with self._trava:
+            trava = self._travas_diretorio.get(diretorio)
+            if trava is None:
+                trava = self._travas_diretorio[diretorio] = [threading.Lock(), 0]
+            trava[1] += 1
+        try:
+            with trava[0]:
+                with self._trava:
+                    entrada = self._resultados.get(diretorio)
+                    if entrada is not None:
+                        self._resultados.move_to_end(diretorio)
+                if entrada is not None and not refresh and time.time() - entrada['escaneado_em'] < self.ttl:
+                    return entrada
+
+                cache = ScanCache(self.cache_path, self.cache_max_entries) if self.cache_path else None
+                exclusoes = (ExcludeRules(self.exclusoes.padroes, self.exclusoes.default_excludes, self.exclusoes.gitignore)
+                             if self.exclusoes is not None else None)
+                inicio = time.perf_counter()
+                resultado = contar_arquivos_e_linhas(diretorio, self.jobs, cache, self.walk_order, exclusoes,
+                                                     archives=self.archives, pool=self._pool)
+                entrada = {
+                    'resultado': resultado,
+                    'escaneado_em': time.time(),
+                    'duracao': time.perf_counter() - inicio,
+                    'cache': {'hits': cache.hits, 'misses': cache.misses} if cache else None,
+                }
+                with self._trava:
+                    self._resultados[diretorio] = entrada
+                    self._resultados.move_to_end(diretorio)
+                    while len(self._resultados) > self.max_results:
+                        self._resultados.popitem(last=False)
+                return entrada
+        finally:
+            with self._trava:
+                trava[1] -= 1
+                if trava[1] == 0:
+                    del self._travas_diretorio[diretorio]
+
+def _json_totais(diretorio, entrada):
+    """Resposta de /totals: os totais de uma varredura."""
+    total_arquivos, total_linhas, total_tamanho = entrada['resultado'][:3]
+    linhas_branco = sum(entrada['resultado'][7].values())
+    linhas_comentario = sum(entrada['resultado'][8].values())
+    return {
+        'path': diretorio,
+        'files': total_arquivos,
+        'lines': total_linhas,
+        'blank_lines': linhas_branco,
+        'comment_lines': linhas_comentario,
+        'code_lines': total_linhas - linhas_branco - linhas_comentario,
+        'billable_lines': total_linhas - linhas_branco,
+        'size_kb': round(total_tamanho, 2),
+        'scanned_at': datetime.datetime.fromtimestamp(entrada['escaneado_em']).isoformat(timespec='seconds'),
+        'scan_seconds': round(entrada['duracao'], 3),
+        'cache': entrada['cache'],
+    }
+
+def _json_extensoes(diretorio, entrada):
+    """Resposta de /extensions: as estatísticas por extensão, como no painel do CLI."""
+    (_, _, _, _, arquivos_por_extensao, linhas_por_extensao, tamanho_por_extensao,
+     linhas_branco_por_extensao, linhas_comentario_por_extensao, extensoes_nao_reconhecidas, _, _) = entrada['resultado']
+    extensoes = []
+    for ext in sorted(arquivos_por_extensao, key=lambda ext: arquivos_por_extensao[ext], reverse=True):
+        linhas = linhas_por_extensao[ext]
+        linhas_branco = linhas_branco_por_extensao[ext]
+        linhas_comentario = linhas_comentario_por_extensao[ext]
+        extensoes.append({
+            'extension': ext,
+            'files': arquivos_por_extensao[ext],
+            'lines': linhas,
+            'size_kb': round(tamanho_por_extensao[ext], 2),
+            'blank_lines': linhas_branco,
+            'comment_lines': linhas_comentario,
+            'code_lines': linhas - linhas_branco - linhas_comentario,
+            'billable_lines': linhas - linhas_branco,
+            'recognized': ext not in extensoes_nao_reconhecidas,
+        })
+    return {'path': diretorio, 'extensions': extensoes}
+
+# Arquivos por página de /files
+PAGINA_PADRAO = 100
+PAGINA_MAXIMA = 1000
+
+def _json_arquivos(diretorio, entrada, pagina, por_pagina):
+    """Resposta de /files: uma página dos detalhes por arquivo, na ordem da varredura."""
+    detalhes = entrada['resultado'][3]
+    inicio = (pagina - 1) * por_pagina
+    arquivos = [dict(zip(('path', 'extension', 'size_kb', 'lines', 'blank_lines', 'comment_lines', 'billable_lines'),
+                         detalhe))
+                for detalhe in detalhes[inicio:inicio + por_pagina]]
+    return {'path': diretorio, 'page': pagina, 'page_size': por_pagina, 'total_files': len(detalhes),
+            'pages': (len(detalhes) + por_pagina - 1) // por_pagina, 'files': arquivos}
+
+class _ServeHandler(http.server.BaseHTTPRequestHandler):
+    """Atende GET /totals, /extensions e /files com ?path=DIRETORIO, em JSON."""
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        parametros = urllib.parse.parse_qs(url.query)
+        if url.path not in ('/totals', '/extensions', '/files'):
+            return self._responder(404, {'error': f"Caminho desconhecido: {url.path}"})
+        diretorio = parametros.get('path', [''])[0]
+        if not diretorio:
+            return self._responder(400, {'error': "Informe o diretório em ?path="})
+        if not (os.path.isdir(diretorio) or (os.path.isfile(diretorio) and e_pacote(diretorio))):
+            return self._responder(400, {'error': f"Diretório não encontrado: {diretorio}"})
+        try:
+            pagina = int(parametros.get('page', ['1'])[0])
+            por_pagina = min(int(parametros.get('page_size', [str(PAGINA_PADRAO)])[0]), PAGINA_MAXIMA)
+        except ValueError:
+            return self._responder(400, {'error': "page e page_size devem ser números inteiros"})
+        if pagina < 1 or por_pagina < 1:
+            return self._responder(400, {'error': "page e page_size devem ser maiores que zero"})
+
+        entrada = self.server.servico.result(diretorio, parametros.get('refresh', ['0'])[0] not in ('', '0'))
+        diretorio = os.path.abspath(diretorio)
+        if url.path == '/totals':
+            corpo = _json_totais(diretorio, entrada)
+        elif url.path == '/extensions':
+            corpo = _json_extensoes(diretorio, entrada)
+        else:
+            corpo = _json_arquivos(diretorio, entrada, pagina, por_pagina)
+        self._responder(200, corpo)
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+# Cache incremental padrão do --serve, na pasta do usuário como o do contalinha-ui
+CACHE_SERVE = os.path.join(os.path.expanduser("~"), ".contalinha-serve-cache.sqlite")
+
+class ScanServer(http.server.HTTPServer):
+    """
+    Servidor HTTP do --serve, que atende as conexões num pool de threads de tamanho fixo.
+
+    Conexões além do número de workers esperam na fila do pool, que guarda no
+    máximo fila conexões; as seguintes recebem 503 e são fechadas na hora.
+    """
+
+    # Resposta às conexões que não cabem na fila
+    RESPOSTA_OCUPADO = json.dumps({'error': "Servidor ocupado; tente de novo"}).encode('utf-8')
+
+    def __init__(self, endereco, servico, workers=4, fila=16):
+        super().__init__(endereco, _ServeHandler)
+        self.servico = servico
+        self._pool = concurrent.futures.ThreadPoolExecutor(workers)
+        self._vagas = threading.BoundedSemaphore(workers + fila)
+
+    def process_request(self, request, client_address):
+        if not self._vagas.acquire(blocking=False):
+            self._recusar(request)
+            return
+        self._pool.submit(self._atender, request, client_address)
+
+    def _recusar(self, request):
+        try:
+            request.sendall(b'HTTP/1.0 503 Service Unavailable\r\n'
+                            b'Content-Type: application/json; charset=utf-8\r\n'
+                            b'Content-Length: %d\r\nConnection: close\r\n\r\n' % len(self.RESPOSTA_OCUPADO)
+                            + self.RESPOSTA_OCUPADO)
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._vagas.release()
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+def _painel_raizes(raizes, resultados):
+    """Monta o painel do modo lote: os totais de cada raiz."""
+    raizes_table = Table(title=None)
+    raizes_table.add_column("Root", style="cyan")
+    raizes_table.add_column("Files", style="magenta")
+    raizes_table.add_column("Total Lines", style="green")
+    raizes_table.add_column("Size (KB)", style="blue")
+    raizes_table.add_column("Billable Lines", style="blue")
+    for raiz, resultado in zip(raizes, resultados):
+        total_arquivos, total_linhas, total_tamanho = resultado[:3]
+        billable = total_linhas - sum(resultado[7].values())
+        raizes_table.add_row(raiz, f"{total_arquivos:,}", f"{total_linhas:,}", f"{total_tamanho:.2f}", f"{billable:,}")
+    return Panel(raizes_table, title="Roots", border_style="white")
+
+def _painel_delta(delta_por_extensao, alteracoes):
+    """Monta o painel do --delta: diferenças por extensão em relação ao resultado anterior."""
+    delta_table = Table(title=None)
+    delta_table.add_column("File Type", style="cyan")
+    delta_table.add_column("Files", style="magenta")
+    delta_table.add_column("Total Lines", style="green")
+    delta_table.add_column("Size (KB)", style="blue")
+    delta_table.add_column("Code Lines", style="green")
+    delta_table.add_column("Billable Lines", style="blue")
+    totais = [0, 0, 0, 0, 0]
+    ordenadas = sorted(delta_por_extensao.items(), key=lambda item: abs(item[1][1] - item[1][2]), reverse=True)
+    for ext, (arquivos, linhas, linhas_branco, linhas_comentario, tamanho) in ordenadas:
+        if not any((arquivos, linhas, linhas_branco, linhas_comentario, tamanho)):
+            continue
+        totais = [total + valor for total, valor in zip(totais, (arquivos, linhas, linhas_branco, linhas_comentario, tamanho))]
+        delta_table.add_row(ext, f"{arquivos:+,}", f"{linhas:+,}", f"{tamanho / 1024:+.2f}",
+                            f"{linhas - linhas_branco - linhas_comentario:+,}", f"{linhas - linhas_branco:+,}")
+    arquivos, linhas, linhas_branco, linhas_comentario, tamanho = totais
+    delta_table.add_row("Total", f"{arquivos:+,}", f"{linhas:+,}", f"{tamanho / 1024:+.2f}",
+                        f"{linhas - linhas_branco - linhas_comentario:+,}", f"{linhas - linhas_branco:+,}",
+                        style="bold")
+    subtitulo = (f"{alteracoes['adicionados']:,} added, {alteracoes['modificados']:,} modified, "
+                 f"{alteracoes['removidos']:,} removed")
+    return Panel(delta_table, title="Delta", subtitle=subtitulo, border_style="white")
+
+def _painel_perfil(perfil):
+    """Monta o painel do --profile: fases, vazão por extensão e arquivos mais lentos."""
+    fases_table = Table(title=None)
+    fases_table.add_column("Phase", style="cyan")
+    fases_table.add_column("Seconds", style="green")
+    fases_table.add_column("% of Scan", style="yellow")
+    for fase, segundos in perfil.fases.items():
+        porcentagem = segundos / perfil.total * 100 if perfil.total > 0 else 0
+        fases_table.add_row(fase, f"{segundos:.3f}", f"{porcentagem:.1f}%")
+    fases_table.add_row("scan (wall)", f"{perfil.total:.3f}", "100.0%")
+
+    extensoes_table = Table(title=None)
+    extensoes_table.add_column("File Type", style="cyan")
+    extensoes_table.add_column("Files Read", style="magenta")
+    extensoes_table.add_column("Seconds", style="green")
+    extensoes_table.add_column("MB/s", style="blue")
+    extensoes_table.add_column("Lines/s", style="yellow")
+    ordenadas = sorted(perfil.por_extensao.items(), key=lambda item: item[1][3], reverse=True)
+    for ext, (arquivos, tamanho, linhas, segundos) in ordenadas:
+        mb_por_segundo = f"{tamanho / 1024 / 1024 / segundos:,.1f}" if segundos > 0 else "-"
+        linhas_por_segundo = f"{linhas / segundos:,.0f}" if segundos > 0 else "-"
+        extensoes_table.add_row(ext, f"{arquivos:,}", f"{segundos:.3f}", mb_por_segundo, linhas_por_segundo)
+
+    lentos_table = Table(title=None)
+    lentos_table.add_column("Slowest Files", style="cyan")
+    lentos_table.add_column("Seconds", style="green")
+    lentos_table.add_column("Size (KB)", style="blue")
+    lentos_table.add_column("Lines", style="magenta")
+    for segundos, caminho, ext, tamanho, linhas in perfil.mais_lentos():
+        lentos_table.add_row(caminho, f"{segundos:.4f}", f"{tamanho / 1024:.2f}", f"{linhas:,}")
+
+    return Panel(Group(fases_table, extensoes_table, lentos_table), title="Profile", border_style="white")
+
+if __name__ == "__main__":
+    print("""
+VERSÃO DESCONTINUADA! UTILIZE O SCRIPT CONTALINHA-UI.PY
+""")
+    if console is None:
+        raise SystemExit("O contalinha.py precisa da biblioteca rich: pip install -r requirements.txt")
+
+    parser = argparse.ArgumentParser(description="Conta arquivos, linhas e tamanho de um diretório.")
+    parser.add_argument("diretorio", nargs="*",
+                        help="Diretório a ser analisado; com mais de um, todos são contados numa única varredura, "
+                             "com um resultado por diretório e um combinado")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Número de processos usados na varredura (padrão: 1; 0 usa todos os núcleos)")
+    parser.add_argument("--cache", metavar="ARQUIVO",
+                        help="Arquivo SQLite do cache incremental; arquivos inalterados não são relidos")
+    parser.add_argument("--clear-cache", action="store_true", help="Esvazia o cache antes da varredura")
+    parser.add_argument("--cache-max-entries", type=int, metavar="N",
+                        help="Máximo de arquivos guardados no cache; os usados há mais tempo são descartados")
+    parser.add_argument("--walk-order", choices=ORDENS_PERCURSO, default="depth",
+                        help="Ordem de percurso dos diretórios: em profundidade (padrão) ou em largura")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="Pula arquivos e diretórios cujo nome ou caminho relativo casa com o glob (pode ser repetido)")
+    parser.add_argument("--no-default-excludes", action="store_true",
+                        help="Percorre também .git, node_modules, venv, dist, build, target e similares")
+    parser.add_argument("--gitignore", action="store_true", help="Pula os caminhos ignorados pelos arquivos .gitignore")
+    parser.add_argument("--stream-csv", action="store_true",
+                        help="Grava cada arquivo no CSV assim que ele é processado, sem guardá-los em memória; "
+                             "as estatísticas por extensão vão para o final do arquivo")
+    parser.add_argument("--git-rev", metavar="REVISAO",
+                        help="Conta os arquivos de um commit, tag ou branch do repositório git informado, "
+                             "lidos do git sem checkout; blobs idênticos são contados uma única vez")
+    parser.add_argument("--roots-file", metavar="MANIFESTO",
+                        help="Arquivo com os diretórios a serem contados, um por linha, somados aos informados na "
+                             "linha de comando; linhas vazias e iniciadas por '#' são ignoradas")
+    parser.add_argument("--archives", action="store_true",
+                        help="Conta os arquivos dentro dos pacotes .zip, .jar e .tar(.gz, .bz2, .xz) encontrados, "
+                             "sem extraí-los, em vez de contar cada pacote como binário")
+    parser.add_argument("--delta", metavar="CSV_ANTERIOR",
+                        help="Atualiza um resultado anterior lendo só os arquivos alterados e exibe a diferença "
+                             "por extensão; sem --since, são alterados os arquivos modificados depois do início da varredura "
+                             "registrado no CSV")
+    parser.add_argument("--since", metavar="REVISAO",
+                        help="Com --delta, revisão git do resultado anterior; as alterações vêm do git diff")
+    parser.add_argument("--watch", action="store_true",
+                        help="Depois da varredura, continua observando o diretório e atualiza os totais a cada "
+                             "alteração, reprocessando só os arquivos afetados (Ctrl+C encerra)")
+    parser.add_argument("--watch-interval", type=float, default=2.0, metavar="SEGUNDOS",
+                        help="Intervalo da verificação periódica do --watch quando o inotify não está disponível "
+                             "(padrão: 2)")
+    parser.add_argument("--serve", type=int, metavar="PORTA",
+                        help="Em vez de varrer um diretório, atende consultas HTTP/JSON em 127.0.0.1:PORTA "
+                             "(/totals, /extensions e /files?path=DIRETORIO), mantendo os resultados em memória")
+    parser.add_argument("--serve-workers", type=int, default=4, metavar="N",
+                        help="Consultas atendidas ao mesmo tempo pelo --serve (padrão: 4)")
+    parser.add_argument("--serve-queue", type=int, default=16, metavar="N",
+                        help="Conexões que o --serve deixa esperando por um worker; as demais recebem 503 "
+                             "(padrão: 16)")
+    parser.add_argument("--serve-ttl", type=float, default=60.0, metavar="SEGUNDOS",
+                        help="Por quanto tempo o --serve responde com um resultado sem varrer de novo (padrão: 60)")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="Abre e começa a ler até N arquivos à frente da contagem, em threads de I/O, "
+                             "sobrepondo as esperas de NFS e SMB; 0 desliga (padrão)")
+    parser.add_argument("--io-threads", type=int, default=8, metavar="N",
+                        help="Threads de I/O de cada processo com --prefetch (padrão: 8)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Mede o tempo de cada fase, a vazão por extensão e os arquivos mais lentos; "
+                             "o resultado é exibido num painel e gravado em profile_<data>.json")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N",
+                        help="Quantidade de arquivos mais lentos listados pelo --profile (padrão: 10)")
+    args = parser.parse_args()
+    if args.since and not args.delta:
+        parser.error("--since só se aplica com --delta")
+    if args.delta and args.profile:
+        parser.error("--profile não se aplica com --delta")
+    if args.watch and (args.delta or args.git_rev or args.archives or args.stream_csv or args.profile):
+        parser.error("--watch não se combina com --delta, --git-rev, --archives, --stream-csv ou --profile")
+    if args.serve is not None and (args.diretorio or args.roots_file or args.watch or args.delta or args.git_rev or args.stream_csv or args.profile):
+        parser.error("--serve recebe o diretório em cada consulta e não se combina com --watch, --delta, "
+                     "--git-rev, --stream-csv ou --profile")
+    if args.serve is not None and (args.serve_workers < 1 or args.serve_queue < 0):
+        parser.error("--serve-workers deve ser positivo e --serve-queue não pode ser negativo")
+    if args.prefetch < 0 or args.io_threads < 1:
+        parser.error("--prefetch não pode ser negativo e --io-threads deve ser positivo")
+    if args.prefetch and (args.serve is not None or args.watch or args.delta or args.git_rev):
+        parser.error("--prefetch não se aplica com --serve, --watch, --delta ou --git-rev")
+
+    if args.serve is not None:
+        jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+        # O cache incremental fica sempre ligado, para que as varreduras depois do ttl só releiam o que mudou
+        caminho_cache = args.cache or CACHE_SERVE
+        if args.clear_cache:
+            ScanCache(caminho_cache).clear()
+        servico = ScanService(jobs, caminho_cache, args.cache_max_entries, args.walk_order,
+                              ExcludeRules(args.exclude, not args.no_default_excludes, args.gitignore),
+                              args.archives, args.serve_ttl)
+        servidor = ScanServer(('127.0.0.1', args.serve), servico, args.serve_workers, args.serve_queue)
+        console.print(f"Atendendo em http://127.0.0.1:{servidor.server_port} com {args.serve_workers} workers; "
+                      f"cache em {caminho_cache}; Ctrl+C encerra")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
+            servico.close()
+        raise SystemExit(0)
+
+    raizes = list(args.diretorio)
+    if args.roots_file:
+        try:
+            raizes.extend(ler_manifesto(args.roots_file))
+        except OSError as e:
+            parser.error(str(e))
+    lote_raizes = len(raizes) > 1 or bool(args.roots_file)
+    if lote_raizes:
+        if args.delta or args.watch or args.git_rev or args.stream_csv or args.profile:
+            parser.error("Vários diretórios não se combinam com --delta, --watch, --git-rev, --stream-csv ou --profile")
+        ausentes = [raiz for raiz in raizes if not os.path.exists(raiz)]
+        if ausentes or not raizes:
+            parser.error(f"Diretórios não encontrados: {', '.join(ausentes)}" if ausentes else "O manifesto está vazio")
+        # Uma raiz repetida, ou dentro de outra, contaria os mesmos arquivos duas vezes no total combinado
+        sobrepostas = raizes_sobrepostas(raizes)
+        for indice, contida_em in sorted(sobrepostas.items()):
+            console.print(f"[yellow]Raiz ignorada: {raizes[indice]} já é contada em {contida_em}[/]")
+        raizes = [raiz for indice, raiz in enumerate(raizes) if indice not in sobrepostas]
+
+    if raizes:
+        diretorio = raizes[0]
+    else:
+        diretorio = input("Digite o caminho do diretório: ")
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+
+    cache = ScanCache(args.cache, args.cache_max_entries) if args.cache else None
+    if cache and args.clear_cache:
+        cache.clear()
+    exclusoes = ExcludeRules(args.exclude, not args.no_default_excludes, args.gitignore)
+    perfil = ScanProfile(args.profile_top) if args.profile else None
+    prefetch = IOPrefetch(args.prefetch, args.io_threads) if args.prefetch else None
+
+    if args.watch:
+        observador = TreeWatcher(diretorio, exclusoes, args.watch_interval)
+        observador.scan(jobs, cache)
+
+        def exibir_totais(adicionados=0, modificados=0, removidos=0):
+            totais = observador.totals()
+            billable = totais['linhas'] - totais['linhas_branco']
+            console.print(f"[{datetime.datetime.now():%H:%M:%S}] +{adicionados} ~{modificados} -{removidos}  "
+                          f"{totais['arquivos']:,} arquivos, {totais['linhas']:,} linhas, "
+                          f"{billable:,} billable lines, {totais['bytes'] / 1024:.2f} Kbytes")
+
+        console.print(f"Observando {diretorio} ({observador.modo}); Ctrl+C encerra")
+        exibir_totais()
+        observador.on_change = exibir_totais
+        try:
+            observador.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            observador.stop()
+        raise SystemExit(0)
+
+    # Obter a data e hora atual
+    now = datetime.datetime.now()
+    timestamp = now.strftime("%Y-%m-%d-%H-%M")
+    filename = f'result_{timestamp}.csv'
+
+    # No modo streaming a seção de arquivos é gravada durante a varredura
+    csv_streaming = None
+    on_file = None
+    if args.stream_csv:
+        csv_streaming = open(filename, 'w', newline='', encoding='utf-8')
+        csvwriter = csv.writer(csv_streaming)
+        csvwriter.writerow(CABECALHO_DETALHES_CSV)
+        on_file = lambda detalhe: csvwriter.writerow(_linha_csv_arquivo(detalhe))
+
+    inicio_varredura = time.time_ns()
+    try:
+        if args.delta:
+            resultado, delta_por_extensao, alteracoes = contar_delta(diretorio, args.delta, args.since, args.git_rev,
+                                                                     cache, exclusoes, on_file)
+        elif lote_raizes:
+            resultados_raizes, resultado = contar_raizes(raizes, jobs, cache, args.walk_order, exclusoes, args.archives,
+                                                         prefetch)
+        else:
+            resultado = contar_arquivos_e_linhas(diretorio, jobs, cache, args.walk_order, exclusoes, on_file,
+                                                 perfil, args.git_rev, args.archives, prefetch)
+    except (ValueError, OSError) as e:
+        # Só a leitura de uma revisão git (--git-rev, --since) ou do CSV anterior (--delta) falha desta forma
+        if csv_streaming:
+            csv_streaming.close()
+        parser.error(str(e))
+    (total_arquivos, total_linhas, total_tamanho, detalhes_arquivos, 
+     arquivos_por_extensao, linhas_por_extensao, tamanho_por_extensao,
+     linhas_branco_por_extensao, linhas_comentario_por_extensao,
+     extensoes_nao_reconhecidas, arquivos_nao_reconhecidos, linhas_nao_reconhecidas) = resultado
+    inicio_exibicao = time.perf_counter()
+
+    # Calcular totais de linhas em branco e de comentário
+    total_linhas_branco = sum(linhas_branco_por_extensao.values())
+    total_linhas_comentario = sum(linhas_comentario_por_extensao.values())
+    
+    # Calcular linhas de código (total - branco - comentário)
+    total_linhas_codigo = total_linhas - total_linhas_branco - total_linhas_comentario
+
+    # Criar tabela de resumo
+    summary_table = Table(title=None)
+    summary_table.add_column("Metric", style="cyan")
+    summary_table.add_column("Value", style="green")
+    summary_table.add_column("Percentage", style="yellow")
+    
+    # Adicionar linhas à tabela de resumo com percentuais
+    summary_table.add_row("Total Files", f"{total_arquivos:,}", "100.0%")
+    summary_table.add_row("Total Lines", f"{total_linhas:,}", "100.0%")
+    
+    # Calcular percentuais para os tipos de linhas
+    blank_percent = (total_linhas_branco / total_linhas * 100) if total_linhas > 0 else 0
+    comment_percent = (total_linhas_comentario / total_linhas * 100) if total_linhas > 0 else 0
+    code_percent = (total_linhas_codigo / total_linhas * 100) if total_linhas > 0 else 0
+    
+    summary_table.add_row("Blank Lines", f"{total_linhas_branco:,}", f"{blank_percent:.1f}%")
+    summary_table.add_row("Comment Lines", f"{total_linhas_comentario:,}", f"{comment_percent:.1f}%")
+    summary_table.add_row("Code Lines", f"{total_linhas_codigo:,}", f"{code_percent:.1f}%")
+    summary_table.add_row("Total Size", f"{total_tamanho:.2f} Kbytes", "100.0%")
+    
+    # Criar painel de resumo
+    summary_panel = Panel(summary_table, title="Summary", border_style="white")
+    
+    # Criar tabela de estatísticas por extensão
+    stats_table = Table(title=None)
+    stats_table.add_column("File Type", style="cyan")
+    stats_table.add_column("Files", style="magenta")
+    stats_table.add_column("Total Lines", style="green")
+    stats_table.add_column("Size (KB)", style="blue")
+    stats_table.add_column("% of Files", style="yellow")
+    stats_table.add_column("Blank Lines", style="cyan")
     stats_table.add_column("Comment Lines", style="magenta")
     stats_table.add_column("Code Lines", style="green")
     stats_table.add_column("Billable Lines", style="blue")
@@ -419,6 +3474,21 @@ if __name__ == "__main__":
     # Exibir os painéis
     console.print(summary_panel)
     console.print(stats_panel)
+    if args.delta:
+        console.print(_painel_delta(delta_por_extensao, alteracoes))
+    if lote_raizes:
+        console.print(_painel_raizes(raizes, resultados_raizes))
+
+    if cache:
+        console.print(f"Cache: {cache.hits:,} de {cache.hits + cache.misses:,} arquivos respondidos pelo cache "
+                      f"({cache.hit_rate:.1f}%)")
+    if prefetch:
+        console.print(f"Leitura antecipada: {prefetch.arquivos:,} arquivos lidos por {prefetch.threads} threads de I/O; "
+                      f"a contagem esperou {prefetch.espera:.2f} s pelos dados e o percurso "
+                      f"{prefetch.espera_stat:.2f} s pelos stat")
+    if exclusoes.skipped_dirs or exclusoes.skipped_files:
+        console.print(f"Ignorados pelas regras de exclusão: {exclusoes.skipped_dirs:,} diretórios "
+                      f"e {exclusoes.skipped_files:,} arquivos")
     
     # Exibir aviso sobre extensões não reconhecidas
     if extensoes_nao_reconhecidas:
@@ -440,45 +3510,70 @@ if __name__ == "__main__":
             title="[bold yellow]AVISO: Extensões Não Reconhecidas[/]",
             border_style="yellow"
         ))
+    inicio_csv = time.perf_counter()
     
-    # Obter a data e hora atual
-    now = datetime.datetime.now()
-    timestamp = now.strftime("%Y-%m-%d-%H-%M")
-    
-    # Salvar em CSV com timestamp
-    filename = f'result_{timestamp}.csv'
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        csvwriter = csv.writer(csvfile)
-        
-        # Adicionar estatísticas por extensão no início do arquivo
-        csvwriter.writerow(["Estatísticas por extensão"])
-        csvwriter.writerow(["Extensão", "Arquivos", "Linhas", "Tamanho (KB)", "Linhas em Branco", "Linhas de Comentário", "Linhas de Código", "Billable Lines"])
-        
-        for ext in extensoes_ordenadas:
-            linhas_codigo = linhas_por_extensao[ext] - linhas_branco_por_extensao[ext] - linhas_comentario_por_extensao[ext]
-            billable_lines_ext = linhas_por_extensao[ext] - linhas_branco_por_extensao[ext]
-            csvwriter.writerow([
-                ext, 
-                arquivos_por_extensao[ext], 
-                linhas_por_extensao[ext], 
-                round(tamanho_por_extensao[ext], 2),
-                linhas_branco_por_extensao[ext],
-                linhas_comentario_por_extensao[ext],
-                linhas_codigo,
-                billable_lines_ext
-            ])
-        
-        # Adicionar linha em branco para separar as seções
-        csvwriter.writerow([])
-        
-        # Adicionar detalhes dos arquivos
-        csvwriter.writerow(["Relative Path", "File Type", "File Size (Kbytes)", "Total of Lines", "Blank Lines", "Comment Lines", "Code Lines", "Billable Lines"])
-        
-        # Adicionar cada arquivo com suas estatísticas
-        for arquivo in detalhes_arquivos:
-            caminho, ext, tamanho, linhas, linhas_branco, linhas_comentario, billable_lines_file = arquivo # Unpack new value
-            linhas_codigo = linhas - linhas_branco - linhas_comentario
-            csvwriter.writerow([caminho, ext, tamanho, linhas, linhas_branco, linhas_comentario, linhas_codigo, billable_lines_file])
+    if csv_streaming:
+        # Os arquivos já foram gravados; as estatísticas por extensão vão para o final
+        with csv_streaming:
+            csvwriter.writerow([])
+            _escrever_resumo_csv(csvwriter, extensoes_ordenadas, arquivos_por_extensao, linhas_por_extensao,
+                                 tamanho_por_extensao, linhas_branco_por_extensao, linhas_comentario_por_extensao)
+            _escrever_inicio_csv(csvwriter, inicio_varredura)
+    else:
+        # Salvar em CSV com timestamp
+        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+            csvwriter = csv.writer(csvfile)
+            
+            # Adicionar estatísticas por extensão no início do arquivo
+            _escrever_resumo_csv(csvwriter, extensoes_ordenadas, arquivos_por_extensao, linhas_por_extensao,
+                                 tamanho_por_extensao, linhas_branco_por_extensao, linhas_comentario_por_extensao)
+            
+            # Adicionar linha em branco para separar as seções
+            csvwriter.writerow([])
+            
+            if lote_raizes:
+                # No modo lote cada raiz tem o seu CSV completo, numa pasta com o nome deste
+                pasta_raizes = os.path.splitext(filename)[0]
+                os.makedirs(pasta_raizes, exist_ok=True)
+                csvwriter.writerow(CABECALHO_RAIZES_CSV)
+                for indice, (raiz, resultado_raiz) in enumerate(zip(raizes, resultados_raizes), 1):
+                    nome = re.sub(r'[^\w.-]', '_', os.path.basename(os.path.normpath(os.path.abspath(raiz))))
+                    arquivo_raiz = os.path.join(pasta_raizes, f"{indice:03d}_{nome}.csv")
+                    _escrever_resultado_csv(arquivo_raiz, resultado_raiz, inicio_varredura)
+                    linhas, linhas_branco, linhas_comentario = (resultado_raiz[1], sum(resultado_raiz[7].values()),
+                                                                sum(resultado_raiz[8].values()))
+                    csvwriter.writerow([raiz, resultado_raiz[0], linhas, round(resultado_raiz[2], 2), linhas_branco,
+                                        linhas_comentario, linhas - linhas_branco - linhas_comentario,
+                                        linhas - linhas_branco, arquivo_raiz])
+            else:
+                # Adicionar detalhes dos arquivos
+                csvwriter.writerow(CABECALHO_DETALHES_CSV)
+                
+                # Adicionar cada arquivo com suas estatísticas
+                detalhes_arquivos.write_csv(csvwriter)
+            _escrever_inicio_csv(csvwriter, inicio_varredura)
+
+    if args.delta:
+        # As diferenças vão para um CSV próprio; o resultado completo pode ser o anterior do próximo --delta
+        arquivo_delta = f'delta_{timestamp}.csv'
+        with open(arquivo_delta, 'w', newline='', encoding='utf-8') as f:
+            csvwriter = csv.writer(f)
+            csvwriter.writerow([f"Diferença em relação a {args.delta}"])
+            csvwriter.writerow(CABECALHO_RESUMO_CSV)
+            for ext, (arquivos, linhas, linhas_branco, linhas_comentario, tamanho) in sorted(delta_por_extensao.items()):
+                if any((arquivos, linhas, linhas_branco, linhas_comentario, tamanho)):
+                    csvwriter.writerow([ext, arquivos, linhas, round(tamanho / 1024, 2), linhas_branco, linhas_comentario,
+                                        linhas - linhas_branco - linhas_comentario, linhas - linhas_branco])
+        print(f"Diferença salva em {arquivo_delta}")
+
+    if perfil:
+        perfil.fases['render'] += inicio_csv - inicio_exibicao
+        perfil.fases['csv'] += time.perf_counter() - inicio_csv
+        console.print(_painel_perfil(perfil))
+        arquivo_perfil = f'profile_{timestamp}.json'
+        with open(arquivo_perfil, 'w', encoding='utf-8') as f:
+            json.dump(dict(directory=os.path.abspath(diretorio), jobs=jobs, **perfil.as_dict()), f, indent=2, ensure_ascii=False)
+        print(f"Perfil salvo em {arquivo_perfil}")
     
     # Exibir resultado formatado como no exemplo
 #    print("\nResultado formatado:")
@@ -487,3 +3582,5 @@ if __name__ == "__main__":
 #        print(f"{i:4d}   │ {caminho},{tipo},{tamanho},{linhas}")
 
     print(f"\nResultado salvo em {filename}")
+    if lote_raizes:
+        print(f"Resultados por diretório salvos em {pasta_raizes}")
@@ -0,0 +1,153 @@
+"""
+Parity tests for GenericCommentScanner, the classifier of extensions that are
+not in COMMENT_SYNTAX.
+
+The scanner merges LINE_COMMENT_PATTERNS and BLOCK_COMMENT_PATTERNS into
+precompiled alternations and prefilters the lines directly on the bytes. These
+tests check it against the original per-pattern loop of process_line, kept
+below as the baseline, on fixed edge cases and on seeded random lines, with the
+block comment state carried from line to line.
+"""
+
+import io
+import os
+import re
+import sys
+import random
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import contalinha
+
+# Extension that is not in COMMENT_SYNTAX, so the generic scanner is used
+UNKNOWN_EXT = '.parity-unknown'
+
+def baseline_process_line(line, in_block_comment=None):
+    """The generic branch of process_line before the patterns were merged."""
+    if not line.strip():
+        return True, False, in_block_comment
+
+    if in_block_comment:
+        end_marker = in_block_comment
+        if end_marker in line:
+            code_after = line.split(end_marker, 1)[1].strip()
+            return False, not bool(code_after), None
+        return False, True, in_block_comment
+
+    for pattern in contalinha.LINE_COMMENT_PATTERNS:
+        if re.match(pattern, line, re.IGNORECASE):
+            return False, True, None
+
+    for start_pattern, end_pattern in contalinha.BLOCK_COMMENT_PATTERNS:
+        start_match = re.search(start_pattern, line)
+        if start_match:
+            end_match = re.search(end_pattern, line[start_match.end():])
+            if end_match:
+                before = line[:start_match.start()].strip()
+                after = line[start_match.end() + end_match.end():].strip()
+                return False, not (before or after), None
+            return False, True, end_pattern
+
+    return False, False, None
+
+def baseline_count(text):
+    """(total, blank, comment) of a latin-1 text, read line by line like the original process_file."""
+    total = blank = comment = 0
+    state = None
+    for line in io.StringIO(text, newline=None):
+        total += 1
+        is_blank, is_comment, state = baseline_process_line(line, state)
+        if is_blank:
+            blank += 1
+        elif is_comment:
+            comment += 1
+    return total, blank, comment
+
+# Fragments that exercise every pattern, the whitespace that str.strip removes and
+# the literal end markers that the baseline looks for inside a block
+FRAGMENTS = [
+    '#', '//', ';', '--', '*', 'REM ', 'rem\t', 'Rem', '::', '%', '!',
+    '/*', '*/', '(*', '*)', '"""', "'''", '<!--', '-->', '{-', '-}',
+    '=begin', '=end', '=pod', '=cut', '<#', '#>', '#=', '=#',
+    '\\*/', '\\*\\)', '-\\}',
+    'x', 'code()', '= 1', '"', "'", 'é', ' ', '  ', '\t', '\x0b', '\x0c', '\xa0', '\x85', '\x1c', '\x1f',
+]
+
+def random_line(rng):
+    return ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 6))) + '\n'
+
+class GenericScannerParityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.assertNotIn(UNKNOWN_EXT, contalinha.COMMENT_SYNTAX)
+        self.scanner = contalinha.get_scanner(UNKNOWN_EXT)
+        self.assertIsInstance(self.scanner, contalinha.GenericCommentScanner)
+
+    def assert_same_sequence(self, lines):
+        """Classify the lines with both versions, each one carrying its own block state."""
+        state = baseline_state = None
+        for number, line in enumerate(lines, 1):
+            result = self.scanner.classify(line, state)
+            expected = baseline_process_line(line, baseline_state)
+            self.assertEqual(result, expected, f"line {number}: {line!r} (state {baseline_state!r})")
+            self.assertEqual(contalinha.process_line(line, UNKNOWN_EXT, state), expected)
+            state, baseline_state = result[2], expected[2]
+
+    def test_blank_lines(self):
+        self.assert_same_sequence(['\n', '', '   \n', '\t\x0b\x0c\n', '\xa0\n', '\x85\x1c\x1f\n'])
+
+    def test_line_comments(self):
+        self.assert_same_sequence([
+            '# c\n', '  // c\n', '; c\n', '-- c\n', ' * c\n', '\t:: c\n', '% c\n', '! c\n',
+            'REM c\n', 'rem c\n', 'Rem\tc\n', 'REM\n', 'remark\n', 'x # c\n', '\xa0# c\n', '\x1c// c\n',
+        ])
+
+    def test_block_on_one_line(self):
+        self.assert_same_sequence([
+            '/* c */\n', 'x /* c */\n', '/* c */ x\n', '(* c *)\n', '<!-- c -->\n', '"""doc"""\n',
+            "'''doc'''\n", '{- c -}\n', '<# c #>\n', 'x = """doc""" + y\n',
+        ])
+
+    def test_block_state_across_lines(self):
+        self.assert_same_sequence([
+            '/* open\n', 'inside\n', '\n', '\\*/ still inside\n', 'inside */\n',
+            'code\n',
+            '<!-- open\n', 'inside\n', 'end --> x\n',
+            'x = """\n', 'doc\n', '"""\n',
+            '=begin\n', 'text\n', '=end\n',
+            '<# open\n', 'end #>\n',
+        ])
+
+    def test_first_pattern_in_list_wins(self):
+        # '/*' comes before '(*' and '"""' in BLOCK_COMMENT_PATTERNS, wherever they are in the line
+        self.assert_same_sequence(['(* a /* b\n', 'inside\n'])
+        self.assert_same_sequence(['""" <!-- /* x\n', 'inside\n'])
+        self.assert_same_sequence(['<!-- (* x\n', 'inside\n'])
+        # The line patterns are tried before any block pattern
+        self.assert_same_sequence(['#= julia =#\n', '-- {- x\n', '* /* x\n', 'x\n'])
+
+    def test_random_lines(self):
+        rng = random.Random(20240501)
+        self.assert_same_sequence([random_line(rng) for _ in range(20000)])
+
+    def test_file_counts(self):
+        """process_file's byte path, with its prefilter, against the original line loop."""
+        rng = random.Random(7)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sample' + UNKNOWN_EXT)
+            for newline in ('\n', '\r\n', '\r'):
+                for _ in range(50):
+                    text = ''.join(random_line(rng) for _ in range(rng.randint(0, 200))).replace('\n', newline)
+                    if rng.random() < 0.3:
+                        # Last line without a line break
+                        text = text.rstrip('\r\n')
+                    content = text.encode('latin-1')
+                    with open(path, 'wb') as f:
+                        f.write(content)
+                    self.assertEqual(contalinha.process_file(path, UNKNOWN_EXT),
+                                     baseline_count(content.decode('latin-1')), repr(text[:200]))
+
+if __name__ == '__main__':
+    unittest.main()